@@ -0,0 +1,313 @@
+"""
+apidocs.py — RakshaNet
+Uses: functools + html + json + hashlib (standard library)
+
+Route metadata for the Flask app, kept next to the routes themselves:
+
+  @app.route("/sos", methods=["POST"])
+  @describe("Emergency", "Trigger SOS …",
+            body={"userId": ("string", True, "user@email.com"),
+                  "lat":    ("number", False, 19.076)})
+  def sos(): …
+
+describe() attaches the tag, description and JSON body schema to the view
+and, when a body schema is given, checks request.json against it before the
+handler runs: a missing or mistyped field is a 400 naming the field instead
+of a KeyError 500 inside the handler.
+
+ApiRegistry(app) walks app.url_map once, after every route is registered,
+so the docs list exactly the routes Flask serves (an undecorated route still
+shows up, described by its docstring). The /api-docs page and the OpenAPI
+document are rendered once per base URL and kept with their ETag, so a hit
+is a dict lookup.
+
+Body schema: {field: (kind, required, example[, (low, high)])}, kind one of
+"string", "integer", "number", "boolean", "array", "object". Optional fields
+may be absent or null. Numbers must be finite and, given a range, within it
+(inclusive); numeric strings are accepted and converted to int / float in
+the request's JSON before the handler reads it.
+"""
+
+import functools
+import hashlib
+import html
+import json
+import math
+import re
+
+from flask import jsonify, request
+
+TAGS = {   # display order and colour of each tag
+    "Info":      "#4a8eff",
+    "Timer":     "#f5a623",
+    "Emergency": "#e8193c",
+    "Logs":      "#1dd882",
+    "Stats":     "#a259ff",
+    "Contacts":  "#4a8eff",
+    "Location":  "#4a8eff",
+    "Spatial":   "#ff7a45",
+    "Live":      "#e8193c",
+    "Export":    "#1dd882",
+    "Ops":       "#9aa0a6",
+    "Other":     "#6e6e82",
+}
+METHOD_COLORS = {"GET": "#1dd882", "POST": "#f5a623", "DELETE": "#e8193c"}
+PATH_EXAMPLES = {"user_id": "test%40email.com", "date_str": "2025-06-15", "alert_id": "1"}
+CONVERTER_TYPES = {"int": "integer", "float": "number"}
+
+_ARG_RE = re.compile(r"<(?:(\w+)(?:\([^>]*\))?:)?(\w+)>")
+_INT_RE = re.compile(r"[+-]?[0-9]+")   # what int() accepts, minus "_" separators and non-ASCII digits
+
+
+def _is_int(v):
+    if isinstance(v, str):
+        return _INT_RE.fullmatch(v.strip()) is not None
+    if isinstance(v, float):
+        return v.is_integer()
+    return isinstance(v, int) and not isinstance(v, bool)
+
+
+def _is_number(v):
+    if isinstance(v, str):
+        try:
+            v = float(v)
+        except ValueError:
+            return False
+    return isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v)
+
+
+# Numbers sent as numeric strings are accepted; coerce_body() converts them.
+CHECKS = {
+    "string":  lambda v: isinstance(v, str),
+    "integer": _is_int,
+    "number":  _is_number,
+    "boolean": lambda v: isinstance(v, bool),
+    "array":   lambda v: isinstance(v, list),
+    "object":  lambda v: isinstance(v, dict),
+}
+ARTICLES = {"integer": "an integer", "array": "a list", "object": "an object"}
+CONVERT  = {"integer": int, "number": float}
+
+
+def body_errors(schema, data):
+    """Problems with a JSON body against a describe() schema; [] when it's fine."""
+    required = [name for name, (_, req, *_) in schema.items() if req]
+    if data is None and not required:
+        return []
+    if not isinstance(data, dict):
+        return ["request body must be a JSON object"]
+    errors = []
+    for name, (kind, req, _, *bounds) in schema.items():
+        value = data.get(name)
+        if value is None or (req and kind == "string" and not str(value).strip()):
+            if req:
+                errors.append(f"'{name}' is required")
+        elif not CHECKS[kind](value):
+            errors.append(f"'{name}' must be {ARTICLES.get(kind, 'a ' + kind)}")
+        elif bounds and not bounds[0][0] <= CONVERT[kind](value) <= bounds[0][1]:
+            errors.append(f"'{name}' must be between {bounds[0][0]} and {bounds[0][1]}")
+    return errors
+
+
+def coerce_body(schema, data):
+    """Convert a checked body's integer / number fields to int / float, in place."""
+    for name, (kind, *_) in schema.items():
+        if kind in CONVERT and data.get(name) is not None:
+            data[name] = CONVERT[kind](data[name])
+
+
+def describe(tag, desc, body=None, example=None):
+    """Record docs for a route; with `body`, reject bad JSON bodies with a 400."""
+    if tag not in TAGS:
+        raise ValueError(f"unknown API tag {tag!r}; add it to apidocs.TAGS")
+    for name, (kind, _, _, *bounds) in (body or {}).items():
+        if kind not in CHECKS:
+            raise ValueError(f"unknown kind {kind!r} for body field {name!r}")
+        if bounds and kind not in CONVERT:
+            raise ValueError(f"a range only applies to numbers, not body field {name!r}")
+
+    def wrap(view):
+        if body:
+            @functools.wraps(view)
+            def checked(*args, **kwargs):
+                data   = request.get_json(silent=True)   # cached: the view gets this same dict
+                errors = body_errors(body, data)
+                if errors:
+                    return jsonify({"error": "; ".join(errors)}), 400
+                if data is not None:
+                    coerce_body(body, data)
+                return view(*args, **kwargs)
+        else:
+            checked = view
+        checked.api = {"tag": tag, "desc": desc, "body": body, "example": example}
+        return checked
+    return wrap
+
+
+def _example_body(body, example):
+    if example is not None:
+        return example
+    if body:
+        return json.dumps({name: ex for name, (_, _, ex, *_) in body.items() if ex is not None})
+    return None
+
+
+def _schema(body):
+    props = {}
+    for name, (kind, _, ex, *bounds) in body.items():
+        prop = {"type": kind}
+        if bounds:
+            prop["minimum"], prop["maximum"] = bounds[0]
+        if kind == "array":
+            first = ex[0] if isinstance(ex, list) and ex else None
+            prop["items"] = {"type": "object"} if isinstance(first, dict) else {"type": "string"}
+        if ex is not None:
+            prop["example"] = ex
+        props[name] = prop
+    out = {"type": "object", "properties": props}
+    required = [name for name, (_, req, *_) in body.items() if req]
+    if required:
+        out["required"] = required
+    return out
+
+
+class ApiRegistry:
+    """Every documented route of `app`, collected once; docs rendered once per base URL."""
+
+    def __init__(self, app, generated_at="", title="RakshaNet API", version="1.0"):
+        self.title        = title
+        self.version      = version
+        self.generated_at = generated_at
+        self.routes       = []
+        for rule in app.url_map.iter_rules():
+            if rule.endpoint == "static":
+                continue
+            view    = app.view_functions[rule.endpoint]
+            meta    = getattr(view, "api", None)
+            if meta is None:
+                doc  = (view.__doc__ or "").strip().split("\n\n")[0]
+                meta = {"tag": "Other", "desc": " ".join(doc.split()), "body": None, "example": None}
+                print(f"⚠️  API docs: {rule.rule} has no @describe, using its docstring")
+            params  = [(name, CONVERTER_TYPES.get(conv, "string")) for conv, name in _ARG_RE.findall(rule.rule)]
+            self.routes.append({
+                "endpoint": rule.endpoint,
+                "path":     _ARG_RE.sub(r"{\2}", rule.rule),
+                "methods":  [m for m in ("GET", "POST", "PUT", "PATCH", "DELETE") if m in rule.methods],
+                "params":   params,
+                **meta,
+            })
+        order = list(TAGS)
+        self.routes.sort(key=lambda r: order.index(r["tag"]))   # stable: registration order within a tag
+        self.html    = functools.lru_cache(maxsize=16)(self._html)      # keyed by base URL (the Host header),
+        self.openapi = functools.lru_cache(maxsize=16)(self._openapi)   # bounded so odd hosts can't grow it
+
+    def __len__(self):
+        return len(self.routes)
+
+    # ── OpenAPI 3.0 ────────────────────────
+    def spec(self, base):
+        paths = {}
+        for r in self.routes:
+            ops = paths.setdefault(r["path"], {})
+            for method in r["methods"]:
+                op = {
+                    "operationId": r["endpoint"] if len(r["methods"]) == 1 else f"{r['endpoint']}_{method.lower()}",
+                    "tags":        [r["tag"]],
+                    "summary":     r["desc"].split(". ")[0].rstrip("."),
+                    "description": r["desc"],
+                    "responses":   {"200": {"description": "OK"}},
+                }
+                if r["params"]:
+                    op["parameters"] = [{"name": name, "in": "path", "required": True,
+                                         "schema": {"type": kind}} for name, kind in r["params"]]
+                if r["body"] and method != "GET":
+                    op["requestBody"] = {"required": any(req for _, req, *_ in r["body"].values()),
+                                         "content": {"application/json": {"schema": _schema(r["body"])}}}
+                    op["responses"]["400"] = {"description": "Missing or invalid body field"}
+                ops[method.lower()] = op
+        return {"openapi": "3.0.3",
+                "info":    {"title": self.title, "version": self.version},
+                "servers": [{"url": base}],
+                "tags":    [{"name": t} for t in TAGS if any(r["tag"] == t for r in self.routes)],
+                "paths":   paths}
+
+    def _openapi(self, base):
+        body = json.dumps(self.spec(base), indent=2, ensure_ascii=False).encode()
+        return body, hashlib.blake2b(body, digest_size=12).hexdigest()
+
+    # ── HTML page ──────────────────────────
+    def _card(self, r, base):
+        e      = html.escape
+        color  = TAGS[r["tag"]]
+        badges = "".join(
+            f'<span class="mth" style="background:{METHOD_COLORS.get(m, "#6e6e82")}22;'
+            f'color:{METHOD_COLORS.get(m, "#6e6e82")}">{m}</span>' for m in r["methods"])
+        sample = _example_body(r["body"], r["example"])
+        bd     = (f'<div class="ep-body"><div class="bl">Request body</div><pre>{e(sample)}</pre></div>'
+                  if sample else "")
+        tr     = ""
+        if "GET" in r["methods"]:
+            try_path = r["path"]
+            for name, _ in r["params"]:
+                try_path = try_path.replace("{" + name + "}", PATH_EXAMPLES.get(name, name))
+            tr = f'<a class="try" href="{e(base + try_path)}" target="_blank">↗ Try</a>'
+        return f"""<div class="ep">
+  <div class="ep-top">
+    {badges}
+    <code class="pth">{e(r["path"])}</code>
+    <span class="tag" style="border-color:{color}44;color:{color}">{r["tag"]}</span>
+    {tr}
+  </div>
+  <div class="dsc">{e(r["desc"])}</div>
+  {bd}
+</div>"""
+
+    def _html(self, base):
+        cards = "".join(self._card(r, base) for r in self.routes)
+        page  = PAGE.format(title=html.escape(self.title), version=html.escape(self.version),
+                            base=html.escape(base), count=len(self.routes), cards=cards,
+                            generated=html.escape(self.generated_at))
+        body  = page.encode()
+        return body, hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+PAGE = """<!DOCTYPE html>
+<html lang="en"><head>
+<meta charset="utf-8"/><meta name="viewport" content="width=device-width,initial-scale=1"/>
+<link href="https://fonts.googleapis.com/css2?family=Bebas+Neue&family=Nunito:wght@400;600;700;800&display=swap" rel="stylesheet">
+<title>API Docs — RakshaNet</title>
+<style>
+:root{{--bg:#0c0c0e;--card:#17171b;--card2:#1e1e24;--b:rgba(255,255,255,.07);--b2:rgba(255,255,255,.12);--t:#f2f2f6;--m:#6e6e82;--m2:#9898b0}}
+*{{box-sizing:border-box;margin:0;padding:0}}
+body{{background:var(--bg);color:var(--t);font-family:'Nunito',sans-serif;padding:40px 24px 80px}}
+.w{{max-width:780px;margin:0 auto}}
+h1{{font-family:'Bebas Neue',sans-serif;font-size:38px;letter-spacing:.05em;margin-bottom:6px}}
+.meta{{font-size:12px;color:var(--m);margin-bottom:10px}}
+.meta a{{color:#4a8eff;text-decoration:none}}
+.base{{background:var(--card2);border:1px solid var(--b2);border-radius:10px;padding:10px 16px;
+       font-family:monospace;font-size:13px;color:var(--m2);margin-bottom:32px;display:inline-block}}
+.base span{{color:#1dd882;font-weight:700}}
+.sl{{font-size:10px;font-weight:800;text-transform:uppercase;letter-spacing:.12em;color:var(--m);
+     margin:28px 0 14px;display:flex;align-items:center;gap:10px}}
+.sl::after{{content:'';flex:1;height:1px;background:var(--b)}}
+.ep{{background:var(--card);border:1px solid var(--b);border-radius:16px;padding:18px 20px;margin-bottom:10px}}
+.ep-top{{display:flex;align-items:center;gap:10px;flex-wrap:wrap;margin-bottom:8px}}
+.mth{{font-size:11px;font-weight:800;padding:3px 10px;border-radius:6px;letter-spacing:.04em;flex-shrink:0}}
+.pth{{font-family:monospace;font-size:13px;color:var(--t);font-weight:600}}
+.tag{{font-size:10px;font-weight:700;padding:2px 9px;border-radius:20px;border:1px solid;flex-shrink:0}}
+.try{{margin-left:auto;font-size:12px;color:#4a8eff;text-decoration:none;font-weight:700}}
+.try:hover{{text-decoration:underline}}
+.dsc{{font-size:13px;color:var(--m2);line-height:1.55;margin-bottom:6px}}
+.ep-body{{background:var(--card2);border-radius:10px;padding:12px 14px;margin-top:8px}}
+.bl{{font-size:10px;color:var(--m);text-transform:uppercase;letter-spacing:.08em;margin-bottom:6px;font-weight:700}}
+pre{{font-family:monospace;font-size:12px;color:var(--m2);white-space:pre-wrap}}
+.foot{{font-size:11px;color:var(--m);text-align:right;margin-top:28px}}
+</style></head>
+<body><div class="w">
+<h1>{title}</h1>
+<div class="meta">Generated from the Flask routes · SQLite3 backend · <a href="{base}/openapi.json">OpenAPI JSON</a></div>
+<div class="base">Base URL: <span>{base}</span></div>
+<div class="sl">All Endpoints ({count})</div>
+{cards}
+<div class="foot">Generated {generated} IST &nbsp;·&nbsp; RakshaNet v{version}</div>
+</div></body></html>"""
@@ -7,218 +7,810 @@ Demonstrates:
   ✅ csv module       — alert export to downloadable CSV file
 """
 
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
-from threading import Timer
 from datetime import datetime, timedelta
-import pytz, os, csv, io
-
-from notifier import send_email_alert, send_sms_alert
+from functools import lru_cache
+import os, csv, io, base64, json, time, zlib
+from urllib.parse import urlencode
+
+from notifier import dispatcher, notification_stats
+from config import (TRAIL_MAX_POINTS, TRAIL_SOS_MINUTES,
+                    NEARBY_MAX_RADIUS_KM, NEARBY_MAX_LIMIT, HOTSPOT_CELL_KM,
+                    METRICS_ADMIN_TOKEN, SSE_HEARTBEAT,
+                    SOS_DEDUP_WINDOW, TIMER_RATE_PER_MIN, TIMER_MAX_MINUTES)
+from apidocs import ApiRegistry, describe
+from events import bus, sse_format
+from maintenance import Maintenance
+from metrics import profiler
+from ratelimit import SosCoalescer, TokenBuckets
+from scheduler import DurableTimers
+import clock
 import database
+import metrics
 
 # ── Setup ──────────────────────────────
 app    = Flask(__name__)
 CORS(app)
 database.create_table()
-IST    = pytz.timezone("Asia/Kolkata")
-timers = {}
+IST    = clock.IST
 
 # ── Datetime helpers ───────────────────
+# A handler takes one clock.now() and reads every field it needs off it.
 def now_ist():
-    return datetime.now(IST)
+    return clock.now().dt
 
 def fmt(dt):
-    return dt.strftime("%d-%m-%Y %H:%M:%S")
+    return clock.at(dt).display
 
-def deadline_str(minutes):
-    return (now_ist() + timedelta(minutes=minutes)).strftime("%H:%M:%S")
+def deadline_str(minutes, at=None):
+    return ((at or clock.now()) + timedelta(minutes=minutes)).time
 
 # ── Auto-SOS ───────────────────────────
+def route_link(points, max_stops=10):
+    """Google Maps directions URL through up to `max_stops` evenly sampled trail points."""
+    if len(points) > max_stops:
+        step   = (len(points) - 1) / (max_stops - 1)
+        points = [points[round(i * step)] for i in range(max_stops)]
+    stops = "/".join(f"{lat:.5f},{lng:.5f}" for _, lat, lng in points)
+    return f"https://www.google.com/maps/dir/{stops}"
+
+def trail_lines(user_id, minutes=TRAIL_SOS_MINUTES):
+    """Last-seen + recent-route lines for alert messages ([] if we have no trail)."""
+    last = database.last_position(user_id)
+    if last is None:
+        return [], None
+    seen  = clock.at(last["ts"] / 1000)
+    lines = [f"Last seen: https://maps.google.com/?q={last['latitude']},{last['longitude']}"
+             f" at {seen.time}"]
+    since  = (clock.now() - timedelta(minutes=minutes)).ms
+    recent = database.fetch_trail(user_id, since_ms=since)
+    if len(recent) > 1:
+        lines.append(f"Route    : {route_link(recent)}  ({len(recent)} points, last {minutes} min)")
+    return lines, last
+
 def auto_sos(user_id):
-    triggered_at = now_ist()
-    timestamp    = triggered_at.strftime("%d-%m-%Y %H:%M:%S")
-    weekday      = triggered_at.strftime("%A")
-    week_num     = triggered_at.isocalendar()[1]
+    at = clock.now()
 
-    database.insert_alert(user_id, "Check-in timer expired")
-    database.log_session(user_id, "timer_expired")
+    trail, last = trail_lines(user_id)
+    alert_id = database.record_event(
+        user_id, "Check-in timer expired", "timer_expired",
+        lat=last and last["latitude"], lng=last and last["longitude"], at=at)
 
     msg = (
         f"🚨 RakshaNet Emergency Alert!\n"
         f"User     : {user_id}\n"
         f"Reason   : Safety timer expired — no check-in received\n"
-        f"Triggered: {timestamp}  ({weekday}, Week {week_num})\n"
+        f"Triggered: {at.display}  ({at.weekday}, Week {at.week})\n"
+        + "".join(line + "\n" for line in trail) +
         f"Please check on this person immediately."
     )
-    send_email_alert(msg)
-    for phone in database.get_contacts(user_id):
-        send_sms_alert(msg, phone)
-
-    print(f"✅ Auto-SOS fired for {user_id} at {timestamp}")
+    dispatcher.notify_alert(alert_id, user_id, msg, database.get_contacts(user_id))
+
+    print(f"✅ Auto-SOS fired for {user_id} at {at.display}")
+
+
+# Deadlines persist in SQLite; one worker at a time sweeps expired ones.
+timers = DurableTimers(auto_sos)
+timers.start()
+dispatcher.start()
+
+# Retention rollover, WAL checkpoints, vacuum and ANALYZE on one elected worker.
+maintenance = Maintenance()
+maintenance.start()
+
+# Repeated SOS presses join the open alert; timer re-arms are rate limited.
+sos_bursts   = SosCoalescer()
+timer_limits = TokenBuckets()
+
+# ── Metrics ────────────────────────────
+HTTP_SECONDS = metrics.histogram("http_request_seconds", "Route latency (to response headers)",
+                                 ["route", "method", "status"])
+
+@app.before_request
+def start_timing():
+    g.started = time.perf_counter()
+
+@app.after_request
+def record_timing(response):
+    started = g.pop("started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_SECONDS.observe(time.perf_counter() - started, route, request.method, response.status_code)
+    return response
+
+def pool_connections():
+    s = database.pool_stats()   # summed over every shard's pool
+    return {"open": s["open"], "idle": s["idle"], "in_use": s["open"] - s["idle"]}
+
+metrics.gauge("db_connections", "SQLite pool connections", pool_connections, ["state"])
+metrics.gauge("timers_pending", "Timers armed in this process",
+              lambda: {"safety": len(timers.scheduler), "retries": len(dispatcher._retries)},
+              ["scheduler"])
+metrics.gauge("sse_clients", "Open /stream connections", lambda: bus.clients)
+metrics.gauge("burst_control", "SOS coalescing and /start-timer rate limiting",
+              lambda: {**{("sos", k): v for k, v in sos_bursts.stats().items()},
+                       **{("start-timer", k): v for k, v in timer_limits.stats().items()}},
+              ["limiter", "stat"])
+metrics.gauge("db_file_bytes", "alerts.db size, free pages and WAL size",
+              lambda: {k: v for k, v in database.file_stats().items() if k.endswith("bytes")},
+              ["file"])
+metrics.gauge("notify_queue_depth", "Deliveries waiting for a notification worker", dispatcher.depth)
+metrics.gauge("contacts_cache", "Contacts cache counters",
+              lambda: {k: v for k, v in database.contacts_cache.stats().items() if k != "ttl"},
+              ["stat"])
+
+def shutdown_background():
+    """Stop the timer leader, maintenance and notification workers, then flush queued writes."""
+    timers.shutdown()
+    maintenance.shutdown()
+    dispatcher.shutdown()
+    database.writer.flush()
 
 
 #  ROUTES
 
 
 @app.route("/")
+@describe("Info", "Server status, current IST time, weekday and ISO week number.")
 def home():
-    now = now_ist()
+    now = clock.now()
     return jsonify({
         "status":   "RakshaNet backend ✅",
-        "time_ist": fmt(now),
-        "day":      now.strftime("%A"),
-        "week":     now.isocalendar()[1],
-        "docs":     "/api-docs"
+        "time_ist": now.display,
+        "day":      now.weekday,
+        "week":     now.week,
+        "docs":     "/api-docs",
+        "openapi":  "/openapi.json"
     })
 
 @app.route("/start-timer", methods=["POST"])
+@describe("Timer", f"Start a safety timer. Auto-fires SOS + email + SMS if no check-in. "
+          f"429 + Retry-After beyond {TIMER_RATE_PER_MIN} starts/min per user.",
+          body={"userId":  ("string", True, "user@email.com"),
+                "minutes": ("integer", False, 30, (1, TIMER_MAX_MINUTES))})
 def start_timer():
     data    = request.json
     user_id = data["userId"]
     minutes = int(data.get("minutes", 1))
+    at      = clock.now()
 
-    if user_id in timers:
-        timers[user_id].cancel()
+    wait = timer_limits.take(user_id)
+    if wait:
+        resp = jsonify({"error": "Too many timer starts — try again shortly",
+                        "retry_after": round(wait, 1)})
+        resp.headers["Retry-After"] = str(int(wait) + 1)
+        return resp, 429
 
-    fires_at = deadline_str(minutes)
-    t = Timer(minutes * 60, auto_sos, args=[user_id])
-    timers[user_id] = t
-    t.start()
+    fires_at = deadline_str(minutes, at)
+    timers.arm(user_id, minutes)   # replaces any armed timer
 
-    database.log_session(user_id, "timer_started")
-    return jsonify({"message": "Safety timer started", "started_at": fmt(now_ist()), "fires_at": fires_at})
+    database.log_session(user_id, "timer_started", at=at)
+    return jsonify({"message": "Safety timer started", "started_at": at.display, "fires_at": fires_at})
 
 @app.route("/check-in", methods=["POST"])
+@describe("Timer", "Cancel the active timer — user arrived safely.",
+          body={"userId": ("string", True, "user@email.com")})
 def check_in():
     data    = request.json
     user_id = data["userId"]
+    at      = clock.now()
 
-    if user_id in timers:
-        timers[user_id].cancel()
-        del timers[user_id]
+    timers.cancel(user_id)
+    sos_bursts.forget(user_id)   # safe again: the next SOS is a new emergency
 
-    database.insert_alert(user_id, "User checked in safely")
-    database.log_session(user_id, "checkin")
-    return jsonify({"message": "Timer cancelled — safe!", "checked_in": fmt(now_ist())})
+    database.record_event(user_id, "User checked in safely", "checkin", at=at)
+    return jsonify({"message": "Timer cancelled — safe!", "checked_in": at.display})
 
 @app.route("/sos", methods=["POST"])
+@describe("Emergency", f"Trigger SOS immediately with optional GPS coordinates. Presses within "
+          f"{SOS_DEDUP_WINDOW} s of the last one update that alert (location, repeat_count) "
+          f"instead of re-notifying contacts.",
+          body={"userId": ("string", True, "user@email.com"),
+                "lat":    ("number", False, 19.076, (-90, 90)),
+                "lng":    ("number", False, 72.877, (-180, 180))})
 def sos():
     data    = request.json
     user_id = data["userId"]
     lat     = data.get("lat")
     lng     = data.get("lng")
+    at      = clock.now()
 
-    database.insert_alert(user_id, "SOS button triggered", lat=lat, lng=lng)
-    database.log_session(user_id, "sos")
+    alert_id, count = sos_bursts.submit(user_id, lambda: database.record_event(
+        user_id, "SOS button triggered", "sos", lat=lat, lng=lng, wait=False, at=at))
+
+    maps = f"https://maps.google.com/?q={lat},{lng}" if lat is not None and lng is not None else "No location"
+    if count > 1:
+        # Same emergency, pressed again: move the alert, don't re-notify.
+        repeats = database.coalesce_alert(alert_id, user_id, lat, lng, at)
+        return jsonify({"message": "SOS already sent — location updated", "alert_id": alert_id,
+                        "repeat_count": repeats, "time": at.display, "location": maps})
 
-    maps = f"https://maps.google.com/?q={lat},{lng}" if lat else "No location"
     msg  = (
         f"🚨 SOS ALERT — RakshaNet\n"
         f"User    : {user_id}\n"
-        f"Time    : {fmt(now_ist())} ({now_ist().strftime('%A')})\n"
+        f"Time    : {at.display} ({at.weekday})\n"
         f"Location: {maps}"
     )
-    send_email_alert(msg)
-    for phone in database.get_contacts(user_id):
-        send_sms_alert(msg, phone)
-
-    return jsonify({"message": "SOS sent", "time": fmt(now_ist()), "location": maps})
+    # Alert is committed; email/SMS go out on the notification workers.
+    dispatcher.notify_alert(alert_id, user_id, msg, database.get_contacts(user_id))
+
+    return jsonify({"message": "SOS sent", "alert_id": alert_id,
+                    "time": at.display, "location": maps})
+
+LOGS_MAX_LIMIT   = 500
+DASHBOARD_ALERTS = 100
+
+#  CONDITIONAL GET
+#  Per-user reads carry a weak ETag built from the user's version stamp
+#  (bumped with every new alert), so an unchanged poll costs one primary-key
+#  lookup and returns 304 without reading or serializing any alert rows.
+
+def user_validators(user_id, daily=False):
+    """(etag, last_modified) for this request's view of user_id's data."""
+    v       = database.get_user_version(user_id)
+    changed = datetime.fromisoformat(v["changed_at"]) if v["changed_at"] else None
+    key     = f"{request.full_path}|{v['version']}|{v['changed_at']}"
+    if daily:   # today / this-week counts also change at IST midnight
+        midnight = now_ist().replace(hour=0, minute=0, second=0, microsecond=0)
+        key     += f"|{midnight.date()}"
+        changed  = max(changed, midnight) if changed else midnight
+    return f"{v['version']}-{zlib.crc32(key.encode()):08x}", changed
+
+def not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return bool(since and last_modified and last_modified.replace(microsecond=0) <= since)
+
+def conditional(user_id, build, daily=False):
+    """
+    304 if the client's copy is current, else build(). The version is read
+    before the body is built, so a concurrent write can only make the tag
+    older than the body (one extra 200 later), never newer.
+    """
+    etag, last_modified = user_validators(user_id, daily)
+    resp = Response(status=304) if not_modified(etag, last_modified) else build()
+    resp.set_etag(etag, weak=True)
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+def encode_cursor(alert_id):
+    return base64.urlsafe_b64encode(f"id:{alert_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(token):
+    raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+    if not raw.startswith("id:"):
+        raise ValueError(token)
+    return int(raw[3:])
+
+def valid_date(value):
+    datetime.strptime(value, "%Y-%m-%d")
+    return value
+
+def day_span_ms(date_from, date_to):
+    """YYYY-MM-DD bounds (IST, inclusive; None = open) as an epoch-ms range."""
+    since = clock.at(datetime.fromisoformat(date_from)).ms if date_from else None
+    until = clock.at(datetime.fromisoformat(date_to) + timedelta(days=1)).ms - 1 if date_to else None
+    return since, until
+
+def page_args():
+    """
+    Parse ?before=&limit=&fields=&from=&to= for the /logs endpoints.
+    Raises ValueError with a client-facing message on bad input.
+    """
+    args = request.args
+    opts = {}
+    if "limit" in args:
+        try:
+            opts["limit"] = min(max(int(args["limit"]), 1), LOGS_MAX_LIMIT)
+        except ValueError:
+            raise ValueError("limit must be an integer")
+    if "before" in args:
+        try:
+            opts["before"] = decode_cursor(args["before"])
+        except Exception:
+            raise ValueError("Invalid cursor")
+    if "fields" in args:
+        fields = [f.strip() for f in args["fields"].split(",") if f.strip()]
+        unknown = [f for f in fields if f not in database.ALERT_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown fields: {', '.join(unknown) or '(none)'}; "
+                             f"choose from {', '.join(database.ALERT_FIELDS)}")
+        opts["fields"] = fields
+    for arg, key in (("from", "date_from"), ("to", "date_to")):
+        if arg in args:
+            try:
+                opts[key] = valid_date(args[arg])
+            except ValueError:
+                raise ValueError("Use YYYY-MM-DD format")
+    return opts
+
+def next_page_headers(resp, next_before):
+    if next_before is not None:
+        cursor = encode_cursor(next_before)
+        params = request.args.to_dict()
+        params["before"] = cursor
+        resp.headers["X-Next-Cursor"] = cursor
+        resp.headers["Link"] = f'<{request.base_url}?{urlencode(params)}>; rel="next"'
+    return resp
+
+def logs_response(user_id, **opts):
+    def build():
+        rows, next_before = database.fetch_alerts_history(user_id, **opts)
+        return next_page_headers(jsonify(rows), next_before)
+    return conditional(user_id, build)
 
 @app.route("/logs/<user_id>", methods=["GET"])
+@describe("Logs", "Alerts for a user, newest first. Optional ?limit=&before= keyset paging (next cursor in "
+          "X-Next-Cursor), ?fields=reason,time projection and ?from=&to= date range (a range past "
+          "the retention window reads the monthly archive).")
 def logs(user_id):
-    return jsonify(database.fetch_alerts_for_user(user_id))
+    try:
+        opts = page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return logs_response(user_id, **opts)
 
 @app.route("/logs/<user_id>/date/<date_str>", methods=["GET"])
+@describe("Logs", "Filter alerts by date (YYYY-MM-DD). Uses datetime.strptime for validation. "
+          "Accepts the same ?limit=&before=&fields= options.")
 def logs_by_date(user_id, date_str):
     try:
-        datetime.strptime(date_str, "%Y-%m-%d")
+        valid_date(date_str)
     except ValueError:
         return jsonify({"error": "Use YYYY-MM-DD format"}), 400
-    return jsonify(database.fetch_alerts_by_date(user_id, date_str))
+    try:
+        opts = page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    opts["date_from"] = opts["date_to"] = date_str
+    return logs_response(user_id, **opts)
 
 @app.route("/stats/<user_id>", methods=["GET"])
+@describe("Stats", "Total alerts, today count, this week count, first/last alert, current day & week "
+          "number. Supports If-None-Match / If-Modified-Since (304).")
 def stats(user_id):
-    return jsonify(database.get_user_stats(user_id))
+    return conditional(user_id, lambda: jsonify(database.get_user_stats(user_id)), daily=True)
+
+@app.route("/dashboard/<user_id>", methods=["GET"])
+@describe("Stats", "Stats + latest ?limit= alerts (default 100) in one round trip. Sends a weak ETag; "
+          "If-None-Match returns 304 until a new alert.")
+def dashboard(user_id):
+    """Stats + latest ?limit= alerts in one round trip, one read snapshot."""
+    try:
+        limit = min(max(int(request.args.get("limit", DASHBOARD_ALERTS)), 1), LOGS_MAX_LIMIT)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    def build():
+        d = database.get_dashboard(user_id, limit)
+        body = {"stats": d["stats"], "alerts": d["alerts"], "version": d["version"]}
+        if d["next_before"] is not None:
+            body["next_cursor"] = encode_cursor(d["next_before"])
+        return jsonify(body)
+    return conditional(user_id, build, daily=True)
+
+#  SPATIAL QUERIES
+
+def since_hours_arg(default=24):
+    """?hours= → aware datetime cutoff (0 = no time limit)."""
+    hours = float(request.args.get("hours", default))
+    if hours < 0:
+        raise ValueError
+    return now_ist() - timedelta(hours=hours) if hours else None
+
+@app.route("/alerts/nearby", methods=["GET"])
+@describe("Spatial", "Alerts within ?radius_km= of ?lat=&lng= in the last ?hours= (default 24), nearest "
+          "first. R*Tree prefilter + haversine.")
+def alerts_nearby():
+    """Alerts within ?radius_km= of ?lat=&lng= in the last ?hours=, nearest first."""
+    args = request.args
+    try:
+        lat, lng = float(args["lat"]), float(args["lng"])
+        radius   = float(args.get("radius_km", 5))
+        limit    = min(max(int(args.get("limit", 100)), 1), NEARBY_MAX_LIMIT)
+        since    = since_hours_arg()
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180 and 0 < radius <= NEARBY_MAX_RADIUS_KM):
+            raise ValueError
+    except (KeyError, ValueError):
+        return jsonify({"error": f"Need lat (-90..90), lng (-180..180); optional radius_km "
+                                 f"(0..{NEARBY_MAX_RADIUS_KM}), hours (>= 0), limit"}), 400
+    alerts = database.nearby_alerts(lat, lng, radius, since, limit)
+    for a in alerts:
+        a["maps"] = f"https://maps.google.com/?q={a['latitude']},{a['longitude']}"
+    return jsonify({"center": [lat, lng], "radius_km": radius,
+                    "since": fmt(since) if since else None,
+                    "count": len(alerts), "alerts": alerts})
+
+@app.route("/alerts/hotspots", methods=["GET"])
+@describe("Spatial", "Alert counts per ~?cell_km= grid cell in the last ?hours=, optional "
+          "?bbox=minLat,minLng,maxLat,maxLng.")
+def alerts_hotspots():
+    """Alert counts per ~?cell_km= grid cell in the last ?hours=, optional ?bbox=minLat,minLng,maxLat,maxLng."""
+    args = request.args
+    try:
+        cell  = float(args.get("cell_km", HOTSPOT_CELL_KM))
+        limit = min(max(int(args.get("limit", 20)), 1), NEARBY_MAX_LIMIT)
+        since = since_hours_arg()
+        bbox  = None
+        if "bbox" in args:
+            bbox = tuple(float(v) for v in args["bbox"].split(","))
+            if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+                raise ValueError
+        if not 0.01 <= cell <= 1000:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "Optional cell_km (0.01..1000), hours (>= 0), limit, "
+                                 "bbox=minLat,minLng,maxLat,maxLng"}), 400
+    cells = database.alert_hotspots(cell, since, bbox, limit)
+    return jsonify({"cell_km": cell, "since": fmt(since) if since else None,
+                    "count": len(cells), "hotspots": cells})
+
+#  LIVE STREAM (SSE)
+
+def last_event_id(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+def stream_hello(user_id):
+    """First bytes of every stream: reconnect delay + a snapshot of the timer state."""
+    timer = database.get_timer(user_id)
+    snapshot = {"timer": timer and {"state": "armed", "fires_at": timer["fires_at"],
+                                    "minutes": timer["minutes"]},
+                "server_time": time.time()}
+    return f"retry: 3000\nevent: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.route("/stream/<user_id>", methods=["GET"])
+@describe("Live", "Server-Sent Events: alert, timer (armed/cancelled/fired) and delivery status as they "
+          "happen. Starts with a timer snapshot; supports Last-Event-ID.")
+def stream(user_id):
+    """
+    Live alert / timer / delivery events for one user (text/event-stream).
+    This is the threaded fallback; asgi.py serves the same stream without
+    holding a thread per connection.
+    """
+    sub = bus.subscribe(user_id, last_event_id=last_event_id(request.headers.get("Last-Event-ID")))
+    if sub is None:
+        return jsonify({"error": "Too many open streams"}), 503
+
+    def generate():
+        try:
+            yield stream_hello(user_id)
+            while True:
+                batch = sub.get(SSE_HEARTBEAT)
+                yield "".join(map(sse_format, batch)) or ": ping\n\n"
+        finally:
+            bus.unsubscribe(sub)
+    return Response(generate(), mimetype="text/event-stream", headers=SSE_HEADERS)
 
 @app.route("/add-contact", methods=["POST"])
+@describe("Contacts", "Save an emergency phone number.",
+          body={"userId": ("string", True, "user@email.com"),
+                "phone":  ("string", True, "+91XXXXXXXXXX")})
 def add_contact():
     d = request.json
     database.add_contact(d["userId"], d["phone"])
-    return jsonify({"message": "Contact saved", "added_at": fmt(now_ist())})
+    return jsonify({"message": "Contact saved", "added_at": clock.now().display})
 
 @app.route("/delete-contact", methods=["POST"])
+@describe("Contacts", "Remove an emergency contact.",
+          body={"userId": ("string", True, "user@email.com"),
+                "phone":  ("string", True, "+91XXXXXXXXXX")})
 def delete_contact():
     d = request.json
     database.delete_contact(d["userId"], d["phone"])
     return jsonify({"message": "Contact removed"})
 
 @app.route("/contacts/<user_id>", methods=["GET"])
+@describe("Contacts", "List all saved emergency contacts for a user.")
 def get_contacts(user_id):
     contacts = database.get_contacts(user_id)
-    return jsonify({"contacts": contacts, "count": len(contacts), "fetched_at": fmt(now_ist())})
+    return jsonify({"contacts": contacts, "count": len(contacts), "fetched_at": clock.now().display})
+
+@app.route("/deliveries/<int:alert_id>", methods=["GET"])
+@describe("Emergency", "Email / SMS delivery status (attempts, last error) of every contact notified for an alert.")
+def deliveries(alert_id):
+    rows = database.get_deliveries(alert_id)
+    return jsonify({"alert_id": alert_id, "deliveries": rows, "count": len(rows)})
+
+@app.route("/cache/stats", methods=["GET"])
+@describe("Ops", "Contacts cache size, hit rate and eviction counters.")
+def cache_stats():
+    return jsonify({"contacts": database.contacts_cache.stats()})
+
+@app.route("/notifications/stats", methods=["GET"])
+@describe("Ops", "Notification queue depth and SMTP session pool stats.")
+def notifications_stats():
+    return jsonify(notification_stats())
+
+@app.route("/metrics", methods=["GET"])
+@describe("Ops", "Prometheus metrics: route latency, per-function SQLite time, pool connections, timer "
+          "lateness, notification queue and send errors.")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+def admin_allowed():
+    if METRICS_ADMIN_TOKEN:
+        return request.headers.get("X-Admin-Token") == METRICS_ADMIN_TOKEN
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+@app.route("/debug/profile", methods=["GET", "POST"])
+@describe("Ops", "Start/stop the sampling profiler (localhost or X-Admin-Token). GET shows its status, "
+          "?format=folded for flamegraph stacks.",
+          body={"action": ("string", False, "start")})
+def debug_profile():
+    """
+    POST {"action": "start" | "stop"} toggles the sampling profiler.
+    GET returns its status, or ?format=folded for flamegraph input.
+    """
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    if request.method == "POST":
+        action = (request.get_json(silent=True) or {}).get("action")
+        if action not in ("start", "stop"):
+            return jsonify({"error": "action must be 'start' or 'stop'"}), 400
+        changed = profiler.start() if action == "start" else profiler.stop()
+        return jsonify({**profiler.status(), "changed": changed})
+    if request.args.get("format") == "folded":
+        limit = request.args.get("limit", type=int)
+        return Response(profiler.folded(limit) + "\n", mimetype="text/plain")
+    return jsonify(profiler.status())
+
+@app.route("/admin/maintenance", methods=["GET", "POST"])
+@describe("Ops", "Run retention rollover, WAL checkpoint, incremental vacuum or ANALYZE now (localhost "
+          "or X-Admin-Token). GET shows last runs and file sizes.",
+          body={"tasks": ("array", False, ["rollover", "checkpoint"])})
+def admin_maintenance():
+    """
+    GET: maintenance status (last runs, due tasks, file sizes, archive horizons).
+    POST {"tasks": ["rollover", "checkpoint", "vacuum", "analyze"]} runs them now.
+    """
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    if request.method == "POST":
+        tasks = (request.get_json(silent=True) or {}).get("tasks") or list(maintenance.TASKS)
+        unknown = [t for t in tasks if t not in maintenance.TASKS]
+        if unknown:
+            return jsonify({"error": f"Unknown tasks: {', '.join(map(str, unknown))}; "
+                                     f"choose from {', '.join(maintenance.TASKS)}"}), 400
+        return jsonify(maintenance.run(tasks))
+    return jsonify(maintenance.status())
+
+@app.route("/admin/shards")
+@describe("Ops", "Shard layout and users / alerts / bytes per SQLite shard (localhost or "
+          "X-Admin-Token). Rebalance with `python database.py rebalance N`.")
+def admin_shards():
+    """Shard layout (count, id generation, rebalance target) and users / alerts / bytes per shard."""
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(database.shard_stats())
+
+def timer_json(row):
+    return {
+        "user":      row["user"],
+        "minutes":   row["minutes"],
+        "armed_at":  row["armed_at"],
+        "fires_at":  clock.at(row["fires_at"]).display,
+        "remaining": max(0, int(row["fires_at"] - time.time())),
+    }
+
+@app.route("/timers", methods=["GET"])
+@describe("Timer", "Every armed safety timer with its deadline and seconds remaining.")
+def list_timers():
+    pending = [timer_json(r) for r in database.list_timers()]
+    return jsonify({"pending": pending, "count": len(pending), "fetched_at": clock.now().display})
+
+@app.route("/timers/<user_id>", methods=["GET"])
+@describe("Timer", "The user's armed safety timer; 404 if none.")
+def get_timer(user_id):
+    row = database.get_timer(user_id)
+    if row is None:
+        return jsonify({"error": "No active timer"}), 404
+    return jsonify(timer_json(row))
+
+#  LOCATION TRAIL
+
+def position_json(ts_ms, lat, lng):
+    return {"ts": ts_ms, "time": clock.at(ts_ms / 1000).display,
+            "latitude": lat, "longitude": lng}
+
+def epoch_ms_arg(name):
+    """?from= / ?to= as epoch milliseconds or an ISO-8601 timestamp (IST if naive)."""
+    raw = request.args.get(name)
+    if raw is None:
+        return None
+    if raw.lstrip("-").isdigit():
+        return int(raw)
+    dt = datetime.fromisoformat(raw)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=IST)
+    return int(dt.timestamp() * 1000)
+
+@app.route("/location/<user_id>", methods=["POST"])
+@describe("Location", f"Batched live-location ingest (at most {TRAIL_MAX_POINTS} points); points are "
+          f"delta-packed per 10-minute bucket. ts is epoch ms, default now.",
+          body={"points": ("array", True, [{"lat": 19.076, "lng": 72.877, "ts": 1718000000000}])})
+def ingest_location(user_id):
+    """
+    Batched live-location ingest:
+      { "points": [ { "lat": 19.07, "lng": 72.87, "ts": 1718000000000 }, … ] }
+    ts is epoch milliseconds (defaults to now).
+    """
+    d      = request.get_json(silent=True) or {}
+    points = d.get("points")
+    if not isinstance(points, list) or not points:
+        return jsonify({"error": "'points' must be a non-empty list"}), 400
+    if len(points) > TRAIL_MAX_POINTS:
+        return jsonify({"error": f"At most {TRAIL_MAX_POINTS} points per request"}), 413
+
+    now_ms = clock.now().ms
+    parsed = []
+    try:
+        for p in points:
+            lat, lng = float(p["lat"]), float(p["lng"])
+            ts = int(p.get("ts", now_ms))
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                raise ValueError
+            parsed.append((ts, lat, lng))
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return jsonify({"error": "Each point needs numeric lat (-90..90), lng (-180..180), optional ts (ms)"}), 400
+
+    stored = database.append_locations(user_id, parsed)
+    return jsonify({"accepted": stored, "received_at": clock.now().display})
+
+@app.route("/location/<user_id>/last", methods=["GET"])
+@describe("Location", "Last known position (single indexed lookup).")
+def location_last(user_id):
+    last = database.last_position(user_id)
+    if last is None:
+        return jsonify({"error": "No location yet"}), 404
+    body = position_json(last["ts"], last["latitude"], last["longitude"])
+    body["maps"] = f"https://maps.google.com/?q={last['latitude']},{last['longitude']}"
+    return jsonify(body)
+
+@app.route("/location/<user_id>/trail", methods=["GET"])
+@describe("Location", "Trail between ?from= and ?to= (epoch ms or ISO-8601), default last hour.")
+def location_trail(user_id):
+    """Trail between ?from= and ?to= (epoch ms or ISO); defaults to the last hour."""
+    try:
+        since = epoch_ms_arg("from")
+        until = epoch_ms_arg("to")
+    except ValueError:
+        return jsonify({"error": "from/to must be epoch milliseconds or ISO-8601"}), 400
+    if since is None:
+        since = (clock.now() - timedelta(hours=1)).ms
+    points = database.fetch_trail(user_id, since, until, limit=TRAIL_MAX_POINTS * 10)
+    return jsonify({"user": user_id, "from": since, "to": until, "count": len(points),
+                    "points": [[ts, lat, lng] for ts, lat, lng in points]})
+
+CONTACTS_SYNC_MAX = 5000   # numbers per sync request
+
+@app.route("/contacts/<user_id>/sync", methods=["POST"])
+@describe("Contacts", "Bulk sync in one transaction: full list replaces, or add/remove diff. Returns the "
+          "resulting list.",
+          body={"contacts": ("array", False, ["+91XXXXXXXXXX", "+91YYYYYYYYYY"]),
+                "add":      ("array", False, None),
+                "remove":   ("array", False, None)},
+          example='{ "contacts": ["+91XXXXXXXXXX", "+91YYYYYYYYYY"] }  or  { "add": [...], "remove": [...] }')
+def sync_contacts(user_id):
+    """
+    Full:  { "contacts": ["+91…", …] }               → replace the whole list
+    Diff:  { "add": ["+91…"], "remove": ["+91…"] }   → apply changes
+    One transaction either way; returns the resulting list.
+    """
+    d = request.get_json(silent=True) or {}
+
+    def phones(key):
+        value = d.get(key, [])
+        if not isinstance(value, list) or not all(isinstance(p, str) for p in value):
+            raise ValueError(f"'{key}' must be a list of phone numbers")
+        return [p.strip() for p in value if p.strip()]
+
+    try:
+        if "contacts" in d:
+            lists = {"contacts": phones("contacts")}
+        else:
+            lists = {"add": phones("add"), "remove": phones("remove")}
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if sum(len(v) for v in lists.values()) > CONTACTS_SYNC_MAX:
+        return jsonify({"error": f"At most {CONTACTS_SYNC_MAX} numbers per sync"}), 413
+
+    contacts, added, removed = database.sync_contacts(user_id, **lists)
+    return jsonify({"contacts": contacts, "count": len(contacts),
+                    "added": added, "removed": removed, "synced_at": clock.now().display})
 
 #  CSV EXPORT
 #  Uses: csv module + datetime + sqlite3
 
-@app.route("/export/csv/<user_id>", methods=["GET"])
-def export_csv(user_id):
+CSV_HEADER = ["No.", "User", "Reason",
+              "Date", "Time (IST)",
+              "Latitude", "Longitude", "Google Maps Link"]
+CSV_FLUSH_ROWS = 500   # rows per yielded chunk
+
+@lru_cache(maxsize=4096)
+def csv_date(date_only):
+    """YYYY-MM-DD → '15 June 2025' (cached: an export repeats the same days)."""
+    try:
+        return datetime.strptime(date_only, "%Y-%m-%d").strftime("%d %B %Y")
+    except (TypeError, ValueError):
+        return date_only or ""
+
+def csv_time(time_only):
+    """HH:MM:SS → '09:45:30 AM' by string slicing, no datetime parsing."""
+    try:
+        hour = int(time_only[:2])
+    except (TypeError, ValueError):
+        return time_only or ""
+    return f"{hour % 12 or 12:02d}{time_only[2:]} {'AM' if hour < 12 else 'PM'}"
+
+def csv_stream(rows, title, trail=None):
     """
-    Export all alerts for a user as a downloadable CSV file.
-    
-    Demonstrates:
-      - csv.writer  to build structured tabular output
-      - io.StringIO so we never touch the filesystem
-      - datetime.strptime / strftime to reformat timestamps
-      - sqlite3 SELECT (via database.fetch_alerts_for_user)
-    
-    Usage: GET /export/csv/user@email.com
+    Yield the CSV export chunk by chunk from an iterator of
+    database.iter_alerts() tuples — memory stays flat however many rows.
+    `trail` (database.iter_trail points) adds a location-trail section.
     """
-    rows = database.fetch_alerts_for_user(user_id)
+    buf    = io.StringIO()
+    writer = csv.writer(buf)
 
-    # StringIO acts as an in-memory file — no disk writes needed
-    output = io.StringIO()
-    writer = csv.writer(output)
+    def drain():
+        data = buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        return data.encode("utf-8")
 
     # ── Header row ──
-    writer.writerow([
-        "No.", "User", "Reason",
-        "Date", "Time (IST)",
-        "Latitude", "Longitude", "Google Maps Link"
-    ])
+    writer.writerow(CSV_HEADER)
 
     # ── Data rows ──
-    for idx, row in enumerate(rows, start=1):
-        raw  = row.get("time") or row.get("created_at") or ""
-        try:
-            # Handle both ISO format and DD-MM-YYYY format
-            dt       = datetime.fromisoformat(raw) if "T" in raw \
-                       else datetime.strptime(raw, "%d-%m-%Y %H:%M:%S")
-            date_str = dt.strftime("%d %B %Y")     # 15 June 2025
-            time_str = dt.strftime("%I:%M:%S %p")  # 09:45:30 AM
-        except Exception:
-            date_str, time_str = raw, ""
-
-        lat  = row.get("latitude")  or ""
-        lng  = row.get("longitude") or ""
-        maps = f"https://maps.google.com/?q={lat},{lng}" if lat and lng else ""
-
-        writer.writerow([idx, user_id, row.get("reason", ""),
-                         date_str, time_str, lat, lng, maps])
+    count = 0
+    for _id, user, reason, _created, date_only, time_only, lat, lng in rows:
+        count += 1
+        lat  = "" if lat is None else lat
+        lng  = "" if lng is None else lng
+        maps = f"https://maps.google.com/?q={lat},{lng}" if lat != "" and lng != "" else ""
+        writer.writerow([count, user, reason,
+                         csv_date(date_only), csv_time(time_only), lat, lng, maps])
+        if count % CSV_FLUSH_ROWS == 0:
+            yield drain()
+
+    # ── Location trail ──
+    points = 0
+    for ts, lat, lng in trail or ():
+        if points == 0:
+            writer.writerow([])
+            writer.writerow(["Location trail"])
+            writer.writerow(["Date", "Time (IST)", "Latitude", "Longitude", "Google Maps Link"])
+        points += 1
+        at = clock.at(ts / 1000)
+        writer.writerow([csv_date(at.date), csv_time(at.time),
+                         lat, lng, f"https://maps.google.com/?q={lat},{lng}"])
+        if points % CSV_FLUSH_ROWS == 0:
+            yield drain()
 
     # ── Footer metadata ──
+    now = clock.now()
     writer.writerow([])
     writer.writerow(["Exported by", "RakshaNet Safety App"])
-    writer.writerow(["Export time (IST)", fmt(now_ist())])
-    writer.writerow(["Day", now_ist().strftime("%A")])
-    writer.writerow(["Total records", len(rows)])
-
-    csv_bytes = output.getvalue().encode("utf-8")
-    output.close()
-
-    filename = f"rakshanet_alerts_{now_ist().strftime('%Y%m%d_%H%M')}.csv"
-
+    writer.writerow(["Export", title])
+    writer.writerow(["Export time (IST)", now.display])
+    writer.writerow(["Day", now.weekday])
+    writer.writerow(["Total records", count])
+    if points:
+        writer.writerow(["Trail points", points])
+    yield drain()
+
+def csv_response(rows, title, filename_prefix, trail=None):
+    filename = f"{filename_prefix}_{now_ist().strftime('%Y%m%d_%H%M')}.csv"
     return Response(
-        csv_bytes,
+        csv_stream(rows, title, trail),
         mimetype="text/csv",
         headers={
             "Content-Disposition": f"attachment; filename={filename}",
@@ -226,107 +818,86 @@ def export_csv(user_id):
         }
     )
 
+@app.route("/export/csv/<user_id>", methods=["GET"])
+@describe("Export", "Download all alerts plus the location trail as a CSV file, streamed in chunks. "
+          "Optional ?from=&to= (archived history included). Uses Python csv module + datetime "
+          "formatting + sqlite3.")
+def export_csv(user_id):
+    """
+    Export all alerts for a user as a downloadable CSV file.
+    Optional ?from=YYYY-MM-DD&to=YYYY-MM-DD limits the date range; a range
+    older than the retention window is read back from the archive.
+
+    Demonstrates:
+      - csv.writer  to build structured tabular output
+      - a generator response, so rows stream out as they are read
+      - cached date formatting from the stored date/time columns
+      - sqlite3 SELECT in keyset chunks (via database.iter_alerts)
+
+    Usage: GET /export/csv/user@email.com
+    """
+    try:
+        date_from = valid_date(request.args["from"]) if "from" in request.args else None
+        date_to   = valid_date(request.args["to"]) if "to" in request.args else None
+    except ValueError:
+        return jsonify({"error": "Use YYYY-MM-DD format"}), 400
+    since_ms, until_ms = day_span_ms(date_from, date_to)
+    return csv_response(database.iter_alerts(user_id, date_from, date_to), user_id, "rakshanet_alerts",
+                        trail=database.iter_trail(user_id, since_ms, until_ms))
+
+@app.route("/export/csv", methods=["GET"])
+@describe("Export", "Bulk CSV export of every user's alerts, streamed. Optional "
+          "?from=YYYY-MM-DD&to=YYYY-MM-DD.")
+def export_csv_bulk():
+    """
+    Bulk export of every user's alerts, oldest first.
+    Optional ?from=YYYY-MM-DD&to=YYYY-MM-DD limits the date range.
+    """
+    try:
+        date_from = valid_date(request.args["from"]) if "from" in request.args else None
+        date_to   = valid_date(request.args["to"]) if "to" in request.args else None
+    except ValueError:
+        return jsonify({"error": "Use YYYY-MM-DD format"}), 400
+    title = f"All users {date_from or 'start'} → {date_to or 'today'}"
+    return csv_response(database.iter_alerts(date_from=date_from, date_to=date_to),
+                        title, "rakshanet_all_alerts")
+
 
 #  API DOCUMENTATION  (auto-generated)
+#  Built from app.url_map and the @describe metadata once every route above
+#  is registered; each page is rendered once per base URL and then served
+#  from memory with a strong ETag.
+
+def cached_doc(rendered, mimetype):
+    body, etag = rendered
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(body, mimetype=mimetype)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "public, no-cache"
+    return resp
 
 @app.route("/api-docs")
+@describe("Info", "This page: every route with its methods, tag and request body, generated from the Flask "
+          "routes. Cached per base URL with an ETag.")
 def api_docs():
-    now  = fmt(now_ist())
-    base = request.host_url.rstrip("/")
-
-    ENDPOINTS = [
-        {"method":"GET",  "path":"/",                              "tag":"Info",      "color":"#4a8eff",
-         "desc":"Server status, current IST time, weekday and ISO week number."},
-        {"method":"POST", "path":"/start-timer",                   "tag":"Timer",     "color":"#f5a623",
-         "desc":"Start a safety timer. Auto-fires SOS + email + SMS if no check-in.",
-         "body":'{ "userId": "user@email.com", "minutes": 30 }'},
-        {"method":"POST", "path":"/check-in",                      "tag":"Timer",     "color":"#f5a623",
-         "desc":"Cancel the active timer — user arrived safely.",
-         "body":'{ "userId": "user@email.com" }'},
-        {"method":"POST", "path":"/sos",                           "tag":"Emergency", "color":"#e8193c",
-         "desc":"Trigger SOS immediately with optional GPS coordinates.",
-         "body":'{ "userId": "user@email.com", "lat": 19.076, "lng": 72.877 }'},
-        {"method":"GET",  "path":"/logs/{user_id}",                "tag":"Logs",      "color":"#1dd882",
-         "desc":"All alerts for a user, newest first (sqlite3 SELECT ORDER BY id DESC)."},
-        {"method":"GET",  "path":"/logs/{user_id}/date/YYYY-MM-DD","tag":"Logs",      "color":"#1dd882",
-         "desc":"Filter alerts by date. Uses datetime.strptime for validation."},
-        {"method":"GET",  "path":"/stats/{user_id}",               "tag":"Stats",     "color":"#a259ff",
-         "desc":"Total alerts, today count, this week count, first/last alert, current day & week number."},
-        {"method":"POST", "path":"/add-contact",                   "tag":"Contacts",  "color":"#4a8eff",
-         "desc":"Save an emergency phone number.",
-         "body":'{ "userId": "user@email.com", "phone": "+91XXXXXXXXXX" }'},
-        {"method":"POST", "path":"/delete-contact",                "tag":"Contacts",  "color":"#4a8eff",
-         "desc":"Remove an emergency contact.",
-         "body":'{ "userId": "user@email.com", "phone": "+91XXXXXXXXXX" }'},
-        {"method":"GET",  "path":"/contacts/{user_id}",            "tag":"Contacts",  "color":"#4a8eff",
-         "desc":"List all saved emergency contacts for a user."},
-        {"method":"GET",  "path":"/export/csv/{user_id}",          "tag":"Export",    "color":"#1dd882",
-         "desc":"Download all alerts as a CSV file. Uses Python csv module + datetime formatting + sqlite3."},
-    ]
-
-    MC = {"GET":"#1dd882","POST":"#f5a623","DELETE":"#e8193c"}
-
-    cards = ""
-    for ep in ENDPOINTS:
-        mc  = MC.get(ep["method"], "#6e6e82")
-        bd  = f'<div class="ep-body"><div class="bl">Request body</div><pre>{ep["body"]}</pre></div>' if ep.get("body") else ""
-        try_path = ep["path"].replace("{user_id}","test%40email.com").replace("{YYYY-MM-DD}","2025-06-15")
-        tr  = f'<a class="try" href="{base}{try_path}" target="_blank">↗ Try</a>' if ep["method"]=="GET" else ""
-        cards += f"""<div class="ep">
-  <div class="ep-top">
-    <span class="mth" style="background:{mc}22;color:{mc}">{ep["method"]}</span>
-    <code class="pth">{ep["path"]}</code>
-    <span class="tag" style="border-color:{ep["color"]}44;color:{ep["color"]}">{ep["tag"]}</span>
-    {tr}
-  </div>
-  <div class="dsc">{ep["desc"]}</div>
-  {bd}
-</div>"""
-
-    return Response(f"""<!DOCTYPE html>
-<html lang="en"><head>
-<meta charset="utf-8"/><meta name="viewport" content="width=device-width,initial-scale=1"/>
-<link href="https://fonts.googleapis.com/css2?family=Bebas+Neue&family=Nunito:wght@400;600;700;800&display=swap" rel="stylesheet">
-<title>API Docs — RakshaNet</title>
-<style>
-:root{{--bg:#0c0c0e;--card:#17171b;--card2:#1e1e24;--b:rgba(255,255,255,.07);--b2:rgba(255,255,255,.12);--t:#f2f2f6;--m:#6e6e82;--m2:#9898b0}}
-*{{box-sizing:border-box;margin:0;padding:0}}
-body{{background:var(--bg);color:var(--t);font-family:'Nunito',sans-serif;padding:40px 24px 80px}}
-.w{{max-width:780px;margin:0 auto}}
-h1{{font-family:'Bebas Neue',sans-serif;font-size:38px;letter-spacing:.05em;margin-bottom:6px}}
-.meta{{font-size:12px;color:var(--m);margin-bottom:10px}}
-.base{{background:var(--card2);border:1px solid var(--b2);border-radius:10px;padding:10px 16px;
-       font-family:monospace;font-size:13px;color:var(--m2);margin-bottom:32px;display:inline-block}}
-.base span{{color:#1dd882;font-weight:700}}
-.sl{{font-size:10px;font-weight:800;text-transform:uppercase;letter-spacing:.12em;color:var(--m);
-     margin:28px 0 14px;display:flex;align-items:center;gap:10px}}
-.sl::after{{content:'';flex:1;height:1px;background:var(--b)}}
-.ep{{background:var(--card);border:1px solid var(--b);border-radius:16px;padding:18px 20px;margin-bottom:10px}}
-.ep-top{{display:flex;align-items:center;gap:10px;flex-wrap:wrap;margin-bottom:8px}}
-.mth{{font-size:11px;font-weight:800;padding:3px 10px;border-radius:6px;letter-spacing:.04em;flex-shrink:0}}
-.pth{{font-family:monospace;font-size:13px;color:var(--t);font-weight:600}}
-.tag{{font-size:10px;font-weight:700;padding:2px 9px;border-radius:20px;border:1px solid;flex-shrink:0}}
-.try{{margin-left:auto;font-size:12px;color:#4a8eff;text-decoration:none;font-weight:700}}
-.try:hover{{text-decoration:underline}}
-.dsc{{font-size:13px;color:var(--m2);line-height:1.55;margin-bottom:6px}}
-.ep-body{{background:var(--card2);border-radius:10px;padding:12px 14px;margin-top:8px}}
-.bl{{font-size:10px;color:var(--m);text-transform:uppercase;letter-spacing:.08em;margin-bottom:6px;font-weight:700}}
-pre{{font-family:monospace;font-size:12px;color:var(--m2);white-space:pre-wrap}}
-.foot{{font-size:11px;color:var(--m);text-align:right;margin-top:28px}}
-</style></head>
-<body><div class="w">
-<h1>RakshaNet API</h1>
-<div class="meta">Auto-generated by Flask · SQLite3 backend · {now} IST</div>
-<div class="base">Base URL: <span>{base}</span></div>
-<div class="sl">All Endpoints ({len(ENDPOINTS)})</div>
-{cards}
-<div class="foot">Generated {now} IST &nbsp;·&nbsp; RakshaNet v1.0</div>
-</div></body></html>""", mimetype="text/html")
+    return cached_doc(api_registry.html(request.host_url.rstrip("/")), "text/html")
+
+@app.route("/openapi.json")
+@describe("Info", "OpenAPI 3.0 document for the same routes, including the JSON body schemas the POST "
+          "routes validate (missing or mistyped fields get a 400).")
+def openapi_json():
+    return cached_doc(api_registry.openapi(request.host_url.rstrip("/")), "application/json")
+
+api_registry = ApiRegistry(app, generated_at=clock.now().display)
 
 # ── Run 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5001))
     print(f"🚀 RakshaNet starting on :{port}")
-    print(f"🕐 {fmt(now_ist())} IST  |  {now_ist().strftime('%A')}  |  Week {now_ist().isocalendar()[1]}")
+    now = clock.now()
+    print(f"🕐 {now.display} IST  |  {now.weekday}  |  Week {now.week}")
     print(f"📖 API Docs: http://localhost:{port}/api-docs")
+    print("💡 For production use the ASGI server: python asgi.py")
     app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
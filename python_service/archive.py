@@ -0,0 +1,193 @@
+"""
+archive.py — RakshaNet
+Uses: sqlite3 + zlib + json (standard library)
+
+Cold storage for rows that maintenance.py rolls out of alerts.db.
+
+One SQLite file per calendar month (archive/rakshanet-YYYY-MM.db). Inside,
+one rollover batch of one user's rows is a single chunk: a zlib-compressed
+JSON list keyed by (kind, user, first_id). A user's history for a date
+range is therefore a few indexed chunk reads with no per-row overhead
+(bench_archive.py: ~60 bytes per archived alert or session row, about a
+third of what the same rows and their indexes held in alerts.db).
+
+  write(directory, kind, chunks)   — chunks: {(month, user): [row, …]} in id order
+  read(directory, kind, user=…, date_from=…, date_to=…, before=…, newest_first=…)
+  months(directory)                — archived months, oldest first
+
+Writes are idempotent: a chunk replaces any chunk with the same key and
+rows already in it are skipped, so a rollover that crashed between writing
+here and deleting from alerts.db simply rewrites the same chunks next time.
+
+Row layouts (lists, one per archived row; `user` lives on the chunk):
+  alerts   [id, reason, created_at, date_only, time_only, latitude, longitude,
+            repeat_count, last_repeat_at]
+  sessions [id, event, logged_at, day_name, week_num]
+"""
+
+import json
+import os
+import re
+import sqlite3
+import zlib
+
+KINDS      = ("alerts", "sessions")
+CHUNK_ROWS = 1000   # rows per chunk before a user's month starts a new one
+DAY_OF     = {"alerts": 3, "sessions": 2}   # row index holding the date (YYYY-MM-DD…)
+_FILE_RE   = re.compile(r"^rakshanet-(\d{4}-\d{2})\.db$")
+TRACE      = None   # database.audit_query_plans() captures statements through this
+
+SCHEMA = """CREATE TABLE IF NOT EXISTS chunks (
+    kind      TEXT    NOT NULL,      -- 'alerts' | 'sessions'
+    user      TEXT    NOT NULL,
+    first_id  INTEGER NOT NULL,
+    last_id   INTEGER NOT NULL,
+    day_from  TEXT    NOT NULL,      -- YYYY-MM-DD of the oldest row
+    day_to    TEXT    NOT NULL,      -- YYYY-MM-DD of the newest row
+    rows      INTEGER NOT NULL,
+    payload   BLOB    NOT NULL,      -- zlib(JSON list of rows)
+    PRIMARY KEY (kind, user, first_id)
+) WITHOUT ROWID"""
+
+
+def month_path(directory, month):
+    return os.path.join(directory, f"rakshanet-{month}.db")
+
+
+def months(directory):
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(m.group(1) for m in map(_FILE_RE.match, names) if m)
+
+
+def _open(directory, month):
+    conn = sqlite3.connect(month_path(directory, month))
+    if TRACE is not None:
+        conn.set_trace_callback(TRACE)
+    conn.execute(SCHEMA)
+    return conn
+
+
+def pack(rows):
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode(), 6)
+
+
+def unpack(blob):
+    return json.loads(zlib.decompress(blob))
+
+
+def write(directory, kind, chunks):
+    """
+    Store {(month, user): rows} (rows in id order). New rows are appended to
+    the user's newest chunk in that month until it holds CHUNK_ROWS, so a
+    light user's month ends up as one well-compressed chunk rather than one
+    tiny chunk per rollover batch. Returns the number of rows written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    by_month = {}
+    for (month, user), rows in chunks.items():
+        by_month.setdefault(month, []).append((user, rows))
+    day, written = DAY_OF[kind], 0
+    for month, items in sorted(by_month.items()):
+        conn = _open(directory, month)
+        try:
+            with conn:
+                records = []
+                for user, rows in items:
+                    last = conn.execute(
+                        """SELECT rows, last_id, payload FROM chunks WHERE kind = ? AND user = ?
+                           ORDER BY first_id DESC LIMIT 1""", (kind, user)).fetchone()
+                    if last is not None and last[0] < CHUNK_ROWS:
+                        rows = unpack(last[2]) + [r for r in rows if r[0] > last[1]]   # retry-safe
+                    records.append((kind, user, rows[0][0], rows[-1][0], rows[0][day][:10],
+                                    rows[-1][day][:10], len(rows), pack(rows)))
+                conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?)", records)
+        finally:
+            conn.close()
+        written += sum(len(rows) for _, rows in items)
+    return written
+
+
+def read(directory, kind, user=None, date_from=None, date_to=None, before=None,
+         newest_first=True):
+    """
+    Yield (user, row) for archived rows in [date_from, date_to] with id < before.
+    For one user rows come in id order (newest first by default). Bulk reads
+    (user=None) go month by month, then chunk by chunk within a month.
+    """
+    wanted = [m for m in months(directory)
+              if (date_from is None or m >= date_from[:7]) and (date_to is None or m <= date_to[:7])]
+    if newest_first:
+        wanted.reverse()
+    day   = DAY_OF[kind]
+    order = "DESC" if newest_first else "ASC"
+    for month in wanted:
+        where, params = ["kind = ?"], [kind]
+        if user is not None:
+            where.append("user = ?")
+            params.append(user)
+        if date_from:
+            where.append("day_to >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("day_from <= ?")
+            params.append(date_to)
+        if before is not None:
+            where.append("first_id < ?")
+            params.append(before)
+        conn = _open(directory, month)
+        try:
+            chunks = conn.execute(
+                f"""SELECT user, payload FROM chunks WHERE {" AND ".join(where)}
+                    ORDER BY first_id {order}""", params).fetchall()
+        finally:
+            conn.close()
+        for chunk_user, payload in chunks:
+            rows = unpack(payload)
+            if newest_first:
+                rows.reverse()
+            for row in rows:
+                d = row[day][:10]
+                if ((before is None or row[0] < before)
+                        and (date_from is None or d >= date_from) and (date_to is None or d <= date_to)):
+                    yield chunk_user, row
+
+
+def user_totals(directory, kind):
+    """
+    {user: [rows, first_row, last_row]} over the whole archive: how many
+    `kind` rows each user has archived, plus their oldest and newest row.
+    """
+    out = {}
+    for month in months(directory):
+        conn = _open(directory, month)
+        try:
+            for user, rows, first, last in conn.execute(
+                    """SELECT user, SUM(rows),
+                              (SELECT payload FROM chunks AS f WHERE f.kind = c.kind AND f.user = c.user
+                               ORDER BY first_id ASC  LIMIT 1),
+                              (SELECT payload FROM chunks AS l WHERE l.kind = c.kind AND l.user = c.user
+                               ORDER BY first_id DESC LIMIT 1)
+                       FROM chunks AS c WHERE kind = ? GROUP BY user""", (kind,)):
+                if user in out:
+                    out[user][0] += rows
+                    out[user][2]  = unpack(last)[-1]
+                else:
+                    out[user] = [rows, unpack(first)[0], unpack(last)[-1]]
+        finally:
+            conn.close()
+    return out
+
+
+def stats(directory):
+    out = {}
+    for month in months(directory):
+        conn = _open(directory, month)
+        try:
+            counts = dict(conn.execute("SELECT kind, SUM(rows) FROM chunks GROUP BY kind").fetchall())
+        finally:
+            conn.close()
+        out[month] = {**counts, "bytes": os.path.getsize(month_path(directory, month))}
+    return out
@@ -0,0 +1,220 @@
+"""
+asgi.py — RakshaNet
+Uses: asyncio (standard library) + a2wsgi + uvicorn
+
+Production entry point. Serves the unchanged Flask routes over ASGI:
+the event loop owns every socket (slow clients, keep-alive, request
+bodies) and the Flask app runs on a2wsgi's bounded pool of ASGI_WORKERS
+threads. A streamed response (CSV export) keeps its thread until the
+client has taken all but the last few chunks (a2wsgi's send queue), so
+a stalled download can't buffer a whole export in memory.
+Once ASGI_BACKLOG requests are in flight new ones get 503 + Retry-After
+instead of piling up behind the database; bodies over ASGI_MAX_BODY get 413.
+
+Timers and notifications already run on their own threads (scheduler.py,
+notifier.py); ASGI lifespan shutdown stops them and flushes queued writes.
+
+/stream/<user_id> (SSE) is served natively as a coroutine, so thousands of
+idle streams hold no threads and don't count against ASGI_BACKLOG.
+
+Run:  python asgi.py                  (PORT, WEB_CONCURRENCY env vars)
+      uvicorn asgi:app --port 5001
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+
+from a2wsgi import WSGIMiddleware
+
+from app import (app as flask_app, shutdown_background,
+                 stream_hello, last_event_id, SSE_HEADERS)
+import clock
+from config import ASGI_WORKERS, ASGI_BACKLOG, ASGI_MAX_BODY, SSE_HEARTBEAT
+from events import bus, sse_format
+
+SEND_QUEUE = 4   # response chunks a2wsgi buffers ahead of a slow client
+
+# Set while the current request's client is gone; a2wsgi runs the WSGI app
+# in a copy of the request task's context, so the app thread sees it too.
+_client_gone = contextvars.ContextVar("client_gone", default=None)
+
+
+def stop_when_gone(wsgi_app):
+    """Wrap a WSGI app so a streamed body stops (and is closed) once the client disconnects."""
+    def app(environ, start_response):
+        result = wsgi_app(environ, start_response)
+        gone   = _client_gone.get()
+        return result if gone is None else _until(result, gone)
+    return app
+
+
+def _until(result, gone):
+    try:
+        for chunk in result:
+            yield chunk
+            if gone.is_set():
+                return
+    finally:
+        close = getattr(result, "close", None)
+        if close is not None:
+            close()
+
+
+class Gateway:
+    """
+    ASGI front door: admission control, the body limit, lifespan and the
+    native (async) routes. Everything else goes to the WSGI app through
+    a2wsgi.WSGIMiddleware.
+    """
+
+    def __init__(self, wsgi_app, workers=ASGI_WORKERS, backlog=ASGI_BACKLOG,
+                 max_body=ASGI_MAX_BODY, on_shutdown=None, routes=None):
+        self.wsgi        = WSGIMiddleware(stop_when_gone(wsgi_app), workers=workers,
+                                          send_queue_size=SEND_QUEUE)
+        self.executor    = self.wsgi.executor   # native routes run blocking calls here too
+        self.routes      = routes or {}         # path prefix → async handler(self, scope, receive, send)
+        self.backlog     = backlog
+        self.max_body    = max_body
+        self.on_shutdown = on_shutdown
+        self.in_flight   = 0
+        self.stats       = {"requests": 0, "rejected": 0, "too_large": 0}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return   # no websockets
+        for prefix, handler in self.routes.items():
+            if scope["path"].startswith(prefix) and scope["method"] == "GET":
+                return await handler(self, scope, receive, send)
+        if self.in_flight >= self.backlog:
+            self.stats["rejected"] += 1
+            return await self._plain(send, 503, b'{"error": "Server busy, retry shortly"}',
+                                     [(b"retry-after", b"1")])
+        length = dict(scope["headers"]).get(b"content-length", b"0")
+        if not length.isdigit() or int(length) > self.max_body:
+            self.stats["too_large"] += 1
+            return await self._plain(send, 413, b'{"error": "Request body too large"}')
+        self.in_flight += 1
+        self.stats["requests"] += 1
+        try:
+            await self._serve(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    async def _serve(self, scope, receive, send):
+        gone, watcher = threading.Event(), None
+
+        async def watch():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            gone.set()
+
+        async def guarded(message):
+            nonlocal watcher
+            if gone.is_set():
+                return
+            try:
+                await send(message)
+            except OSError:   # the server says the client went away
+                gone.set()
+                return
+            if message["type"] == "http.response.start":
+                # Flask has read the request body by now: listen for the disconnect
+                watcher = asyncio.ensure_future(watch())
+
+        token = _client_gone.set(gone)
+        try:
+            await self.wsgi(scope, self._capped(receive), guarded)
+        finally:
+            _client_gone.reset(token)
+            if watcher is not None:
+                watcher.cancel()
+
+    def _capped(self, receive):
+        """receive() that ends a body without Content-Length once it passes max_body."""
+        seen = 0
+
+        async def capped():
+            nonlocal seen
+            message = await receive()
+            if message["type"] == "http.request":
+                seen += len(message.get("body", b""))
+                if seen > self.max_body:
+                    self.stats["too_large"] += 1
+                    return {"type": "http.request", "body": b"", "more_body": False}
+            return message
+        return capped
+
+    @staticmethod
+    async def _plain(send, status, body, headers=()):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), *headers]})
+        await send({"type": "http.response.body", "body": body})
+
+    # ── lifespan ──────────────────────────
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.on_shutdown is not None:
+                    await asyncio.get_running_loop().run_in_executor(self.executor, self.on_shutdown)
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+async def sse_stream(adapter, scope, receive, send):
+    """/stream/<user_id> without a thread: wait on the bus, send batches or a heartbeat."""
+    user = scope["path"][len("/stream/"):]
+    if not user or "/" in user:
+        return await adapter._plain(send, 404, b'{"error": "Not found"}')
+    headers = dict(scope["headers"])
+    loop    = asyncio.get_running_loop()
+    sub     = bus.subscribe(user, loop=loop,
+                            last_event_id=last_event_id(headers.get(b"last-event-id", b"").decode()))
+    if sub is None:
+        return await adapter._plain(send, 503, b'{"error": "Too many open streams"}',
+                                    [(b"retry-after", b"5")])
+
+    async def disconnected():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+    gone = asyncio.ensure_future(disconnected())
+    try:
+        hello = await loop.run_in_executor(adapter.executor, stream_hello, user)
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"access-control-allow-origin", b"*"),
+            *[(k.lower().encode(), v.encode()) for k, v in SSE_HEADERS.items()]]})
+        await send({"type": "http.response.body", "body": hello.encode(), "more_body": True})
+        while not gone.done():
+            waiter = asyncio.ensure_future(sub.aget(SSE_HEARTBEAT))
+            await asyncio.wait({waiter, gone}, return_when=asyncio.FIRST_COMPLETED)
+            if gone.done():
+                waiter.cancel()
+                break
+            chunk = "".join(map(sse_format, waiter.result())) or ": ping\n\n"
+            await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+    finally:
+        gone.cancel()
+        bus.unsubscribe(sub)
+
+
+app = Gateway(flask_app, on_shutdown=shutdown_background, routes={"/stream/": sse_stream})
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port    = int(os.environ.get("PORT", 5001))
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    print(f"🚀 RakshaNet (ASGI) starting on :{port} with {workers} process(es)")
+    now = clock.now()
+    print(f"🕐 {now.display} IST  |  {now.weekday}  |  Week {now.week}")
+    uvicorn.run("asgi:app", host="0.0.0.0", port=port, workers=workers,
+                access_log=False, log_level="warning")
@@ -0,0 +1,252 @@
+"""
+bench.py — RakshaNet
+Reproducible API benchmark. Boots the Flask app in-process against a
+scratch SQLite file (email/SMS replaced by fakes), seeds a dataset, then
+drives a weighted mix of endpoints from N concurrent clients and reports
+throughput and latency percentiles per endpoint.
+
+  python bench.py                                  # run and print
+  python bench.py --save-baseline                  # record bench_baseline.json
+  python bench.py --baseline bench_baseline.json   # exit 1 on a regression
+
+A regression is throughput below, or p95 latency above, the baseline by
+more than --threshold (default 20%). Compare runs made with the same
+--concurrency / --users / --alerts / --mix / --limits on the same machine.
+
+Per-user burst control (SOS coalescing, the /start-timer rate limit) is
+off by default: a few hundred simulated users hammering the same accounts
+would otherwise mostly measure the 429 / "already sent" fast path.
+--limits on keeps it, and 429s and coalesced SOS presses are counted in
+their own columns rather than as errors.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+import clock
+
+DEFAULT_MIX = "sos=10,start-timer=15,check-in=15,logs=30,stats=25,export=5"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise SystemExit(f"unknown endpoint '{name}'; choose from {', '.join(ENDPOINTS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def user_of(rng, users):
+    return f"user{rng.randrange(users)}@bench"
+
+
+# name → (rng, users) → (method, path, json body)
+ENDPOINTS = {
+    "sos":         lambda rng, users: ("POST", "/sos", {"userId": user_of(rng, users),
+                                                        "lat": 19.07 + rng.random() / 10,
+                                                        "lng": 72.87 + rng.random() / 10}),
+    "start-timer": lambda rng, users: ("POST", "/start-timer", {"userId": user_of(rng, users),
+                                                                "minutes": 60}),
+    "check-in":    lambda rng, users: ("POST", "/check-in", {"userId": user_of(rng, users)}),
+    "logs":        lambda rng, users: ("GET", f"/logs/{user_of(rng, users)}?limit=50", None),
+    "stats":       lambda rng, users: ("GET", f"/stats/{user_of(rng, users)}", None),
+    "export":      lambda rng, users: ("GET", f"/export/csv/{user_of(rng, users)}", None),
+}
+
+
+def seed(database, users, alerts_per_user, contacts_per_user=3):
+    """Insert the starting dataset directly (same write path as the API)."""
+    rng   = random.Random(1)
+    start = database.now_ist() - timedelta(days=60)
+    with database.connection() as conn:
+        for u in range(users):
+            user = f"user{u}@bench"
+            for _ in range(alerts_per_user):
+                at = start + timedelta(seconds=rng.randrange(60 * 86400))
+                database._insert_alert_tx(conn, user, "SOS button triggered",
+                                          19.07 + rng.random() / 10, 72.87 + rng.random() / 10,
+                                          clock.at(at))
+            conn.executemany(
+                "INSERT OR IGNORE INTO contacts (user, phone, added_on) VALUES (?, ?, ?)",
+                [(user, f"+9190000{u:05d}{c}", start.isoformat()) for c in range(contacts_per_user)])
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))] * 1000
+
+
+def summarise(latencies, errors, elapsed, limited=0, coalesced=0):
+    latencies.sort()
+    return {
+        "requests":  len(latencies),
+        "errors":    errors,
+        "limited":   limited,     # 429 from the /start-timer rate limit
+        "coalesced": coalesced,   # SOS joined an open alert instead of opening one
+        "rps":      round(len(latencies) / elapsed, 1),
+        "p50_ms":   round(percentile(latencies, 0.50), 3),
+        "p95_ms":   round(percentile(latencies, 0.95), 3),
+        "p99_ms":   round(percentile(latencies, 0.99), 3),
+    }
+
+
+def drive(app, mix, users, concurrency, seconds, seed_value):
+    names, weights = list(mix), list(mix.values())
+    samples = {name: [] for name in names}
+    counts  = {name: {"errors": 0, "limited": 0, "coalesced": 0} for name in names}
+    lock    = threading.Lock()
+    stop    = time.perf_counter() + seconds
+
+    def client(t):
+        rng    = random.Random(seed_value * 1000 + t)
+        http   = app.test_client()
+        mine   = {name: [] for name in names}
+        seen   = {name: {"errors": 0, "limited": 0, "coalesced": 0} for name in names}
+        while time.perf_counter() < stop:
+            name = rng.choices(names, weights)[0]
+            method, path, body = ENDPOINTS[name](rng, users)
+            t0 = time.perf_counter()
+            resp = http.open(path, method=method, json=body)
+            data = resp.get_data()       # drain streamed bodies (CSV)
+            mine[name].append(time.perf_counter() - t0)
+            if resp.status_code == 429:
+                seen[name]["limited"] += 1
+            elif resp.status_code >= 400:
+                seen[name]["errors"] += 1
+            elif name == "sos" and b'"repeat_count"' in data:
+                seen[name]["coalesced"] += 1
+        with lock:
+            for name in names:
+                samples[name].extend(mine[name])
+                for key, n in seen[name].items():
+                    counts[name][key] += n
+
+    threads = [threading.Thread(target=client, args=(t,)) for t in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    overall = [v for name in names for v in samples[name]]
+    total   = {key: sum(c[key] for c in counts.values()) for key in ("errors", "limited", "coalesced")}
+    return {
+        "overall":   summarise(overall, elapsed=elapsed, **total),
+        "endpoints": {name: summarise(samples[name], elapsed=elapsed, **counts[name]) for name in names},
+    }
+
+
+def compare(result, baseline, threshold):
+    """Return a list of human-readable regressions (empty when within threshold)."""
+    problems = []
+    if baseline.get("config") != result["config"]:
+        print("⚠️  baseline was recorded with a different configuration:")
+        print(f"    baseline {baseline.get('config')}\n    this run {result['config']}")
+    pairs = [("overall", result["overall"], baseline.get("overall"))]
+    pairs += [(name, stats, baseline.get("endpoints", {}).get(name))
+              for name, stats in result["endpoints"].items()]
+    for name, now, before in pairs:
+        if not before:
+            continue
+        if now["rps"] < before["rps"] * (1 - threshold):
+            problems.append(f"{name}: throughput {now['rps']:,.0f} req/s vs baseline "
+                            f"{before['rps']:,.0f} ({now['rps'] / before['rps'] - 1:+.0%})")
+        if now["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            problems.append(f"{name}: p95 {now['p95_ms']:.2f} ms vs baseline "
+                            f"{before['p95_ms']:.2f} ms ({now['p95_ms'] / before['p95_ms'] - 1:+.0%})")
+    return problems
+
+
+def report(result):
+    print(f"{'endpoint':<12} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'errors':>7} {'429':>6} {'merged':>7}")
+    rows = list(result["endpoints"].items()) + [("overall", result["overall"])]
+    for name, s in rows:
+        print(f"{name:<12} {s['requests']:>9,} {s['rps']:>9,.0f} {s['p50_ms']:>9.2f} "
+              f"{s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['errors']:>7} "
+              f"{s.get('limited', 0):>6} {s.get('coalesced', 0):>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--alerts", type=int, default=20, help="seeded alerts per user")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,… (%(default)s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--limits", choices=("off", "on"), default="off",
+                        help="per-user SOS coalescing and /start-timer rate limit (default off)")
+    parser.add_argument("--warmup", type=float, default=1, help="seconds discarded before measuring")
+    parser.add_argument("--out", help="write this run's results as JSON")
+    parser.add_argument("--baseline", help="compare against this JSON baseline")
+    parser.add_argument("--save-baseline", nargs="?", const="bench_baseline.json",
+                        help="record this run as the baseline (default bench_baseline.json)")
+    parser.add_argument("--threshold", type=float, default=0.20,
+                        help="allowed regression as a fraction (default 0.20)")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    tmp = tempfile.TemporaryDirectory()
+    import database
+    import notifier
+    database.DB_NAME = os.path.join(tmp.name, "bench.db")
+    for channel in ("email", "sms"):
+        notifier.set_transport(channel, notifier.FakeTransport(channel))
+    import app as app_module
+    from app import app
+    if args.limits == "off":
+        from ratelimit import SosCoalescer, TokenBuckets
+        app_module.sos_bursts   = SosCoalescer(window=-1)               # every press opens an alert
+        app_module.timer_limits = TokenBuckets(burst=float("inf"))      # never 429
+
+    with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):   # per-request logs
+        seed(database, args.users, args.alerts)
+        if args.warmup:
+            drive(app, mix, args.users, args.concurrency, args.warmup, args.seed + 1)
+        result = drive(app, mix, args.users, args.concurrency, args.seconds, args.seed)
+    result["config"] = {"concurrency": args.concurrency, "users": args.users,
+                        "alerts_per_user": args.alerts, "mix": mix, "limits": args.limits}
+    result["seconds"] = args.seconds
+    result["recorded_at"] = database.now_iso()
+    result["python"] = sys.version.split()[0]
+
+    print(f"{args.users:,} users × {args.alerts} alerts, {args.concurrency} clients, {args.seconds:g}s, "
+          f"burst control {args.limits}")
+    report(result)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"✅ Baseline saved to {args.save_baseline}")
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = compare(result, json.load(f), args.threshold)
+        for p in problems:
+            print(f"❌ {p}")
+        if problems:
+            status = 1
+        else:
+            print(f"✅ Within {args.threshold:.0%} of baseline")
+
+    database.writer.flush()
+    database.close_pool()
+    tmp.cleanup()
+    sys.exit(status)
@@ -0,0 +1,95 @@
+"""
+bench_archive.py — RakshaNet
+Rolls two years of alerts over to the monthly archive on a scratch
+database and reports rollover throughput, bytes freed in alerts.db vs
+bytes written to the archive, and the cost of reading one user's month
+from the live table vs from the archive.
+
+Usage: python bench_archive.py [--alerts 500000] [--users 2000] [--retention 365]
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+
+import archive
+import clock
+import database
+
+
+def dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) if os.path.isdir(path) else 0
+
+
+def seed(n, users, days, batch=50_000):
+    rng   = random.Random(3)
+    start = clock.now() - timedelta(days=days)
+    step  = days * 86400 / n
+    for base in range(0, n, batch):
+        with database.connection() as conn:
+            for i in range(base, min(n, base + batch)):
+                database._record_event_tx(conn, f"user{rng.randrange(users)}@bench", "SOS button triggered",
+                                          "sos", 19.07 + rng.random() / 10, 72.87 + rng.random() / 10,
+                                          start + timedelta(seconds=i * step))
+
+
+def month_read(user, month, runs=20):
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        rows, _ = database.fetch_alerts_history(user, date_from=f"{month}-01", date_to=f"{month}-31")
+    return (time.perf_counter() - t0) / runs * 1000, len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--alerts", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=730, help="history span to seed")
+    parser.add_argument("--retention", type=int, default=365)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp, open(os.devnull, "w") as quiet:
+        database.DB_NAME = os.path.join(tmp, "archive.db")
+        with contextlib.redirect_stdout(quiet):
+            database.create_table()
+        t0 = time.perf_counter()
+        seed(args.alerts, args.users, args.days)
+        database.checkpoint()
+        live = database.file_stats()
+        print(f"{args.alerts:,} alerts (+ sessions) over {args.days} days, {args.users:,} users "
+              f"— seeded in {time.perf_counter() - t0:.1f}s, alerts.db {live['db_bytes'] / 2**20:,.1f} MB")
+
+        user      = "user7@bench"
+        old_month = (clock.now() - timedelta(days=args.days - 40)).date[:7]
+        new_month = (clock.now() - timedelta(days=40)).date[:7]
+        live_ms, live_rows = month_read(user, old_month)
+
+        cutoff = (clock.now() - timedelta(days=args.retention)).date
+        t0, moved = time.perf_counter(), {}
+        for kind in archive.KINDS:
+            moved[kind] = 0
+            while True:
+                n = database.roll_over(kind, cutoff)
+                if not n:
+                    break
+                moved[kind] += n
+        elapsed = time.perf_counter() - t0
+        freed = database.incremental_vacuum(10**9) or 0
+        database.checkpoint()
+        after = database.file_stats()
+        print(f"rollover: {moved['alerts']:,} alerts + {moved['sessions']:,} sessions in {elapsed:.1f}s "
+              f"({sum(moved.values()) / elapsed:,.0f} rows/s)")
+        print(f"  alerts.db {live['db_bytes'] / 2**20:,.1f} → {after['db_bytes'] / 2**20:,.1f} MB "
+              f"({freed:,} pages released)   archive {dir_bytes(database.archive_dir()) / 2**20:,.1f} MB "
+              f"in {len(archive.months(database.archive_dir()))} monthly files")
+
+        arch_ms, arch_rows = month_read(user, old_month)
+        hot_ms, hot_rows   = month_read(user, new_month)
+        print(f"one user, one month: live {live_ms:.2f} ms ({live_rows} rows) before rollover, "
+              f"archive {arch_ms:.2f} ms ({arch_rows} rows) after; recent month (live) {hot_ms:.2f} ms")
+        database.writer.flush()
+        database.close_pool()
@@ -0,0 +1,102 @@
+"""
+bench_clock.py — RakshaNet
+Microbenchmarks for the timestamp work on the alert insert path:
+
+  fields   — every field one /sos stores and returns, the old way (a fresh
+             datetime.now(tz) + strftime per helper, pytz when installed)
+             vs one clock.now() Instant
+  instant  — clock.now() alone, and clock.at() on a CSV-export style run
+             of trail timestamps
+  insert   — database._record_event_tx (alert + rollups + session row)
+             on a scratch database, to show the clock's share of a write
+
+Usage: python bench_clock.py [--number 200000]
+"""
+
+import argparse
+import os
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+import clock
+
+try:
+    import pytz
+    LEGACY_TZ, LEGACY_LABEL = pytz.timezone("Asia/Kolkata"), "pytz"
+except ImportError:
+    LEGACY_TZ, LEGACY_LABEL = clock.IST, "zoneinfo"
+
+
+def legacy_now():
+    return datetime.now(LEGACY_TZ)
+
+
+def legacy_fields():
+    """What insert + log_session + /sos computed before: one now() per helper."""
+    created_at = legacy_now().isoformat()
+    date_only  = legacy_now().strftime("%Y-%m-%d")
+    time_only  = legacy_now().strftime("%H:%M:%S")
+    now        = legacy_now()
+    week       = (now.date() - timedelta(days=now.weekday())).isoformat()
+    logged_at  = legacy_now().isoformat()
+    day        = legacy_now().strftime("%A")
+    week_num   = legacy_now().isocalendar()[1]
+    shown      = f"{legacy_now().strftime('%d-%m-%Y %H:%M:%S')} ({legacy_now().strftime('%A')})"
+    reply      = legacy_now().strftime("%d-%m-%Y %H:%M:%S")
+    return created_at, date_only, time_only, week, logged_at, day, week_num, shown, reply
+
+
+def instant_fields():
+    at = clock.now()
+    return (at.iso, at.date, at.time, at.week_start, at.iso, at.weekday, at.week,
+            f"{at.display} ({at.weekday})", at.display)
+
+
+def per_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def report(label, us, base=None):
+    extra = f"   x{base / us:.1f}" if base else ""
+    print(f"  {label:<50} {us:8.2f} µs{extra}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--number", type=int, default=200_000)
+    args = parser.parse_args()
+    n = args.number
+
+    print(f"fields per /sos event (legacy uses {LEGACY_LABEL})")
+    old = per_call(legacy_fields, n)
+    report("legacy: now() per helper", old)
+    report("clock.now() once", per_call(instant_fields, n), old)
+
+    print("instants")
+    report(f"datetime.now({LEGACY_LABEL})", per_call(legacy_now, n))
+    report("clock.now()", per_call(clock.now, n))
+    start = clock.now().ts
+    trail = [start + i * 5 for i in range(1000)]   # 5 s apart, as the client samples
+    report("clock.at(ts) over a 1,000-point trail, per point",
+           per_call(lambda: [clock.at(ts).time for ts in trail], max(1, n // 1000)) / 1000)
+    report("strftime over the same trail, per point",
+           per_call(lambda: [datetime.fromtimestamp(ts, LEGACY_TZ).strftime("%H:%M:%S")
+                             for ts in trail], max(1, n // 1000)) / 1000)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        import database
+        database.DB_NAME = os.path.join(tmp, "clock.db")
+        database.create_table()
+        count = [0]
+
+        def insert():
+            count[0] += 1
+            with database.connection() as conn:
+                database._record_event_tx(conn, f"user{count[0] % 500}@bench", "SOS button triggered",
+                                          "sos", 19.07, 72.87, clock.now())
+
+        print("insert path (one transaction per event, scratch database)")
+        report("_record_event_tx + commit", per_call(insert, max(1, n // 100)))
+        database.writer.flush()
+        database.close_pool()
@@ -0,0 +1,49 @@
+"""
+bench_ratelimit.py — RakshaNet
+Cost per check and memory of SosCoalescer / TokenBuckets as the number of
+distinct users grows past RATE_LIMIT_USERS (LRU eviction keeps it flat).
+
+Usage: python bench_ratelimit.py [--users 1000000] [--maxsize 100000]
+"""
+
+import argparse
+import time
+import tracemalloc
+from concurrent.futures import Future
+
+from ratelimit import SosCoalescer, TokenBuckets
+
+
+def opened():
+    future = Future()
+    future.set_result(1)
+    return future
+
+
+def run(label, check, users, maxsize):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for i in range(users):
+        check(f"user{i}@bench")
+        check(f"user{i}@bench")                 # repeat: the coalesce / refill path
+        check(f"user{i % (maxsize // 2)}@bench")  # a hot set that stays resident
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<14} {elapsed / (3 * users) * 1e6:6.2f} µs/check   "
+          f"peak {peak / 2 ** 20:6.1f} MB ({peak / maxsize:,.0f} B per tracked user)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--maxsize", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{args.users:,} distinct users, {args.maxsize:,} tracked")
+    sos = SosCoalescer(maxsize=args.maxsize)
+    run("SosCoalescer", lambda user: sos.submit(user, opened), args.users, args.maxsize)
+    print(f"    {sos.stats()}")
+    buckets = TokenBuckets(maxsize=args.maxsize)
+    run("TokenBuckets", buckets.take, args.users, args.maxsize)
+    print(f"    {buckets.stats()}")
@@ -0,0 +1,87 @@
+"""
+bench_scheduler.py — RakshaNet
+Arms N safety timers on the heap scheduler and reports thread count,
+memory and per-operation cost; optionally compares against the old
+"one threading.Timer per user" model.
+
+Usage: python bench_scheduler.py [--timers 100000] [--compare 2000]
+"""
+
+import argparse
+import resource
+import threading
+import time
+import tracemalloc
+
+from scheduler import TimerScheduler
+
+
+def noop(_):
+    pass
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_heap(n):
+    sched = TimerScheduler()
+    tracemalloc.start()
+    rss0 = rss_mb()
+
+    t0 = time.perf_counter()
+    for i in range(n):
+        sched.start(f"user{i}@mail.com", 3600 + i % 600, noop, i)
+    arm = time.perf_counter() - t0
+
+    mem, _ = tracemalloc.get_traced_memory()
+    print(f"heap scheduler — {n:,} armed timers")
+    print(f"  threads       : {threading.active_count()}")
+    print(f"  traced memory : {mem / 1e6:.1f} MB   (RSS +{rss_mb() - rss0:.1f} MB)")
+    print(f"  start         : {arm / n * 1e6:.2f} µs/op")
+
+    t0 = time.perf_counter()
+    for i in range(0, n, 2):
+        sched.reschedule(f"user{i}@mail.com", 7200)
+    print(f"  reschedule    : {(time.perf_counter() - t0) / (n // 2) * 1e6:.2f} µs/op")
+
+    t0 = time.perf_counter()
+    for i in range(n):
+        sched.cancel(f"user{i}@mail.com")
+    print(f"  cancel        : {(time.perf_counter() - t0) / n * 1e6:.2f} µs/op")
+
+    tracemalloc.stop()
+    sched.shutdown()
+
+
+def bench_threads(n):
+    rss0 = rss_mb()
+    t0 = time.perf_counter()
+    timers = [threading.Timer(3600, noop, args=[i]) for i in range(n)]
+    for t in timers:
+        t.start()
+    arm = time.perf_counter() - t0
+    print(f"threading.Timer — {n:,} armed timers")
+    print(f"  threads       : {threading.active_count()}")
+    print(f"  RSS           : +{rss_mb() - rss0:.1f} MB  (~{(rss_mb() - rss0) / n * 1e3:.1f} KB/timer)")
+    print(f"  start         : {arm / n * 1e6:.2f} µs/op")
+    for t in timers:
+        t.cancel()
+    for t in timers:
+        t.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--timers", type=int, default=100_000)
+    parser.add_argument("--compare", type=int, default=0,
+                        help="also arm this many threading.Timer objects")
+    args = parser.parse_args()
+
+    bench_heap(args.timers)
+    if args.compare:
+        bench_threads(args.compare)
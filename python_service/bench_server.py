@@ -0,0 +1,142 @@
+"""
+bench_server.py — RakshaNet
+Load-tests /sos, /logs and /stats over real HTTP against the Flask
+development server (python app.py) and the ASGI server (python asgi.py),
+each on its own scratch database with email/SMS replaced by fakes.
+
+Usage: python bench_server.py [--concurrency 32] [--seconds 5] [--users 200]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SERVERS = ("flask", "asgi")
+
+
+def serve(mode, port, db):
+    """Child process: run one server against `db` with fake transports."""
+    import database
+    import notifier
+    database.DB_NAME = db
+    for channel in ("email", "sms"):
+        notifier.set_transport(channel, notifier.FakeTransport(channel))
+    if mode == "flask":
+        from app import app
+        app.run(host="127.0.0.1", port=port, debug=False)
+    else:
+        import uvicorn
+        from asgi import app
+        uvicorn.run(app, host="127.0.0.1", port=port, access_log=False, log_level="warning")
+
+
+def request(conn, method, path, body=None):
+    payload = json.dumps(body).encode() if body is not None else None
+    headers = {"Content-Type": "application/json"} if payload else {}
+    conn.request(method, path, body=payload, headers=headers)
+    resp = conn.getresponse()
+    resp.read()
+    return resp.status
+
+
+def wait_until_up(port, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if request(http.client.HTTPConnection("127.0.0.1", port, timeout=2), "GET", "/") == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on :{port} did not start")
+
+
+def run(port, label, make_request, concurrency, seconds):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def worker(t):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine, failed, i = [], 0, 0
+        while time.perf_counter() < stop:
+            method, path, body = make_request(t, i)
+            i += 1
+            t0 = time.perf_counter()
+            try:
+                ok = request(conn, method, path, body) < 400
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                ok = False
+            mine.append(time.perf_counter() - t0)
+            failed += not ok
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    result = {"rps": len(latencies) / elapsed, "p50": p(0.50), "p99": p(0.99), "errors": errors[0]}
+    print(f"  {label:<8} {result['rps']:>8,.0f} req/s   p50 {result['p50']:7.2f} ms   "
+          f"p99 {result['p99']:8.2f} ms   errors {result['errors']}")
+    return result
+
+
+def scenarios(users):
+    user = lambda t, i: f"user{(t * 7919 + i) % users}@bench"
+    return {
+        "/sos":   lambda t, i: ("POST", "/sos", {"userId": user(t, i), "lat": 19.07, "lng": 72.87}),
+        "/logs":  lambda t, i: ("GET", f"/logs/{user(t, i)}?limit=50", None),
+        "/stats": lambda t, i: ("GET", f"/stats/{user(t, i)}", None),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5, help="per endpoint per server")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--port", type=int, default=5801)
+    parser.add_argument("--serve", choices=SERVERS, help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.db)
+        sys.exit(0)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for offset, mode in enumerate(SERVERS):
+            port = args.port + offset
+            child = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--serve", mode,
+                 "--port", str(port), "--db", os.path.join(tmp, f"{mode}.db")],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_up(port)
+                print(f"{mode} server — {args.concurrency} concurrent clients")
+                results[mode] = {name: run(port, name, make, args.concurrency, args.seconds)
+                                 for name, make in scenarios(args.users).items()}
+            finally:
+                child.terminate()
+                child.wait()
+
+    print("\nasgi vs flask")
+    for name in scenarios(args.users):
+        f, a = results["flask"][name], results["asgi"][name]
+        print(f"  {name:<8} throughput x{a['rps'] / f['rps']:.2f}   p99 x{a['p99'] / f['p99']:.2f}")
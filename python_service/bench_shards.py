@@ -0,0 +1,107 @@
+"""
+bench_shards.py — RakshaNet
+Write throughput of /sos-style events (alert + rollups + session row)
+as the store is split over 1, 4 and 16 SQLite shards: P worker processes
+× T threads call database.record_event() for random users against a
+scratch database, as P app workers would.
+
+Usage: python bench_shards.py [--shards 1,4,16] [--processes 4] [--threads 8] [--seconds 5]
+                              [--synchronous NORMAL]
+"""
+
+import argparse
+import contextlib
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+import database
+
+
+def worker(db, synchronous, threads, start, seconds, users, seed, out):
+    database.DB_NAME        = db
+    database.DB_SYNCHRONOUS = synchronous
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def run(t):
+        rng, mine, failed = random.Random(seed * 1000 + t), [], 0
+        time.sleep(max(0.0, start - time.time()))
+        deadline = start + seconds
+        while time.time() < deadline:
+            t0 = time.perf_counter()
+            try:
+                database.record_event(f"user{rng.randrange(users)}@bench", "SOS button triggered",
+                                      "sos", 19.07, 72.87)
+                mine.append(time.perf_counter() - t0)
+            except Exception as e:
+                failed += 1
+                errors.append(repr(e))
+        with lock:
+            latencies.extend(mine)
+
+    pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    database.writer.flush()
+    out.put((latencies, errors[:3], len(errors), database.writer.stats))
+
+
+def bench(n, args, tmp, ctx):
+    db = os.path.join(tmp, f"s{n}", "alerts.db")
+    os.makedirs(os.path.dirname(db))
+    database.DB_NAME, database.DB_SHARDS = db, n
+    with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+        database.create_table()
+    database.close_pool()
+
+    out   = ctx.Queue()
+    start = time.time() + 2.0   # every process starts writing at the same moment
+    procs = [ctx.Process(target=worker, args=(db, args.synchronous, args.threads, start, args.seconds,
+                                              args.users, p, out))
+             for p in range(args.processes)]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    latencies = sorted(l for r in results for l in r[0])
+    failed    = sum(r[2] for r in results)
+    writes    = sum(r[3]["writes"] for r in results)
+    batches   = sum(r[3]["batches"] for r in results)
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0
+    print(f"{n:>3} shard(s)  {len(latencies) / args.seconds:>9,.0f} events/s   "
+          f"p50 {p(0.50):6.2f} ms   p99 {p(0.99):7.2f} ms   "
+          f"{writes / max(batches, 1):5.1f} writes/commit   failed {failed}")
+    for r in results:
+        for e in r[1]:
+            print(f"      {e}")
+    return len(latencies) / args.seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--shards", default="1,4,16")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="writer threads per process")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--synchronous", default=database.DB_SYNCHRONOUS,
+                        help="PRAGMA synchronous for the run (NORMAL or FULL)")
+    args = parser.parse_args()
+
+    print(f"{args.processes} processes × {args.threads} threads, {args.seconds:g}s per run, "
+          f"synchronous={args.synchronous}, {os.cpu_count()} CPU(s)")
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        base = None
+        for n in map(int, args.shards.split(",")):
+            rate = bench(n, args, tmp, ctx)
+            base = base or rate
+            print(f"            {rate / base:.2f}× the first run")
@@ -0,0 +1,137 @@
+"""
+bench_spatial.py — RakshaNet
+Loads N synthetic alerts (clustered around a few cities, spread over 90
+days) into a scratch database, then times nearby-alert and hotspot queries
+through the R*Tree index against a plain scan of sos_alerts.
+
+Usage: python bench_spatial.py [--alerts 10000000] [--queries 200] [--db path]
+       (--db keeps the loaded database so later runs skip the load)
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+
+import database
+import geo
+
+CITIES = [(19.076, 72.877), (28.614, 77.209), (12.972, 77.595),
+          (22.573, 88.364), (13.083, 80.271), (17.385, 78.487)]
+
+
+def load(n, batch=200_000):
+    rng   = random.Random(42)
+    now   = database.now_ist()
+    start = now - timedelta(days=90)
+    span  = (now - start).total_seconds()
+    t0    = time.perf_counter()
+    for base in range(0, n, batch):
+        alerts, index = [], []
+        for i in range(base, min(n, base + batch)):
+            if rng.random() < 0.8:
+                clat, clng = rng.choice(CITIES)
+                lat, lng   = rng.gauss(clat, 0.15), rng.gauss(clng, 0.15)
+            else:
+                lat, lng = rng.uniform(8, 35), rng.uniform(68, 97)
+            at = start + timedelta(seconds=rng.random() * span)
+            alerts.append((i + 1, f"user{i % 50000}@bench", "SOS button triggered", lat, lng,
+                           at.isoformat(), at.strftime("%Y-%m-%d"), at.strftime("%H:%M:%S")))
+            t = at.timestamp()
+            index.append((i + 1, lat, lat, lng, lng, t, t))
+        with database.connection() as conn:
+            conn.executemany(
+                """INSERT INTO sos_alerts
+                   (id, user, reason, latitude, longitude, created_at, date_only, time_only)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", alerts)
+            conn.executemany("INSERT INTO alerts_rtree VALUES (?, ?, ?, ?, ?, ?, ?)", index)
+        print(f"  loaded {min(n, base + batch):>12,} alerts  ({time.perf_counter() - t0:.0f}s)", end="\r")
+    print()
+
+
+def scan_nearby(lat, lng, radius_km, since, limit=100):
+    """Baseline: bounding box on the plain columns (full table scan) + haversine."""
+    (min_lat, max_lat, min_lng, max_lng), = geo.bounding_boxes(lat, lng, radius_km)
+    with database.connection() as conn:
+        rows = conn.execute(
+            """SELECT id, latitude, longitude FROM sos_alerts
+               WHERE latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?
+                 AND created_at >= ?""",
+            (min_lat, max_lat, min_lng, max_lng, since.isoformat())
+        ).fetchall()
+    distances = geo.haversine_km(lat, lng, [(r[1], r[2]) for r in rows])
+    return sorted(d for d in distances if d <= radius_km)[:limit]
+
+
+def scan_hotspots(cell_km, since, limit=20):
+    size = geo.cell_degrees(cell_km)
+    with database.connection() as conn:
+        return conn.execute(
+            """SELECT CAST((latitude + 90) / ? AS INTEGER) AS row,
+                      CAST((longitude + 180) / ? AS INTEGER) AS col, COUNT(*) AS count
+               FROM sos_alerts WHERE created_at >= ?
+               GROUP BY row, col ORDER BY count DESC LIMIT ?""",
+            (size, size, since.isoformat(), limit)
+        ).fetchall()
+
+
+def timed(label, fn, runs):
+    latencies = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"{label:<34} p50 {p(0.50):9.2f} ms   p99 {p(0.99):9.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--alerts", type=int, default=10_000_000)
+    parser.add_argument("--queries", type=int, default=200, help="nearby queries per variant")
+    parser.add_argument("--db", help="database file to (re)use instead of a scratch one")
+    args = parser.parse_args()
+
+    tmp = None
+    if args.db is None:
+        tmp = tempfile.TemporaryDirectory()
+        args.db = os.path.join(tmp.name, "spatial.db")
+    database.DB_NAME = args.db
+    database.create_table()
+    with database.connection() as conn:
+        have = conn.execute("SELECT COUNT(*) FROM alerts_rtree").fetchone()[0]
+    if have < args.alerts:
+        with database.connection() as conn:
+            conn.execute("DELETE FROM alerts_rtree")
+            conn.execute("DELETE FROM sos_alerts")
+        load(args.alerts)
+    print(f"{args.alerts:,} alerts")
+
+    rng     = random.Random(7)
+    centres = [(clat + rng.uniform(-0.2, 0.2), clng + rng.uniform(-0.2, 0.2))
+               for clat, clng in (rng.choice(CITIES) for _ in range(args.queries))]
+    it      = iter(centres * 2)
+    now     = database.now_ist()
+
+    for radius, hours in ((1, 24), (5, 24), (5, 24 * 30)):
+        since = now - timedelta(hours=hours)
+        label = f"{radius} km / {hours} h"
+        timed(f"nearby  R*Tree   {label}",
+              lambda: database.nearby_alerts(*next(it), radius, since), args.queries // 2)
+        timed(f"nearby  scan     {label}",
+              lambda: scan_nearby(*next(it), radius, since), max(3, args.queries // 50))
+        it = iter(centres * 2)
+
+    for hours in (1, 24):
+        since = now - timedelta(hours=hours)
+        timed(f"hotspot R*Tree   1 km / {hours} h",
+              lambda: database.alert_hotspots(1.0, since), 5)
+        timed(f"hotspot scan     1 km / {hours} h",
+              lambda: scan_hotspots(1.0, since), 3)
+
+    database.close_pool()
+    if tmp is not None:
+        tmp.cleanup()
@@ -0,0 +1,125 @@
+"""
+bench_stream.py — RakshaNet
+SSE fan-out benchmark. Starts the server (ASGI, or the threaded Flask dev
+server for comparison) on a scratch database, opens N /stream connections
+watching the same user, then arms that user's timer K times and measures
+how long each "timer" event takes to reach every watcher. Also reports
+server memory and thread count with all streams idle.
+
+Usage: python bench_stream.py [--watchers 2000] [--events 20] [--server asgi|flask]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_server import wait_until_up
+
+
+def proc_status(pid):
+    fields = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            fields[key] = value.strip()
+    return int(fields["VmRSS"].split()[0]) / 1024, int(fields["Threads"])
+
+
+async def watcher(port, user, arrivals, ready):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=2 ** 20)
+    writer.write(f"GET /stream/{user} HTTP/1.1\r\nHost: bench\r\n"
+                 "Accept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    seen = 0
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        if line.startswith(b"event: snapshot"):
+            ready.append(1)
+        elif line.startswith(b"event: timer"):
+            if seen < len(arrivals):
+                arrivals[seen].append(time.perf_counter())
+            seen += 1
+
+
+async def post(port, path, body):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = body.encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+    await writer.drain()
+    await reader.read()
+    writer.close()
+
+
+async def run(port, pid, watchers, events):
+    user     = "fanout@bench"
+    arrivals = [[] for _ in range(events)]
+    ready    = []
+    base_rss, base_threads = proc_status(pid)
+
+    t0    = time.perf_counter()
+    tasks = []
+    for i in range(watchers):
+        tasks.append(asyncio.ensure_future(watcher(port, user, arrivals, ready)))
+        if i % 200 == 199:
+            await asyncio.sleep(0.05)
+    while len(ready) < watchers:
+        await asyncio.sleep(0.05)
+        if time.perf_counter() - t0 > 120:
+            raise RuntimeError(f"only {len(ready)}/{watchers} streams opened")
+    connect = time.perf_counter() - t0
+    await asyncio.sleep(1)
+    rss, threads = proc_status(pid)
+    print(f"  {watchers:,} streams open in {connect:.1f}s   server RSS {rss:,.0f} MB "
+          f"(+{(rss - base_rss) * 1024 / watchers:.1f} KB/stream)   threads {threads} "
+          f"(idle server {base_threads})")
+
+    firsts, lasts = [], []
+    for k in range(events):
+        sent = time.perf_counter()
+        await post(port, "/start-timer", '{"userId": "%s", "minutes": 60}' % user)
+        while len(arrivals[k]) < watchers:
+            await asyncio.sleep(0.001)
+            if time.perf_counter() - sent > 30:
+                break
+        got = sorted(arrivals[k])
+        firsts.append((got[0] - sent) * 1000)
+        lasts.append((got[-1] - sent) * 1000 if len(got) == watchers else float("inf"))
+
+    firsts.sort()
+    lasts.sort()
+    mid = len(lasts) // 2
+    print(f"  publish → first watcher  p50 {firsts[mid]:7.1f} ms")
+    print(f"  publish → all {watchers:,}   p50 {lasts[mid]:7.1f} ms   worst {lasts[-1]:7.1f} ms   "
+          f"({watchers / (lasts[mid] / 1000):,.0f} deliveries/s)")
+    for t in tasks:
+        t.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--watchers", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--server", choices=("asgi", "flask"), default="asgi")
+    parser.add_argument("--port", type=int, default=5851)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        child = subprocess.Popen(
+            [sys.executable, "bench_server.py", "--serve", args.server,
+             "--port", str(args.port), "--db", os.path.join(tmp, "stream.db")],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(args.port)
+            print(f"{args.server} server — {args.watchers:,} watchers on one user, {args.events} events")
+            asyncio.run(run(args.port, child.pid, args.watchers, args.events))
+        finally:
+            child.terminate()
+            child.wait()
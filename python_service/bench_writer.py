@@ -0,0 +1,77 @@
+"""
+bench_writer.py — RakshaNet
+Compares alert+session write throughput of the group-commit writer with
+the previous "two committed transactions per event" path, using N
+concurrent threads against a scratch database.
+
+Usage: python bench_writer.py [--threads 16] [--events 500] [--synchronous NORMAL]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import clock
+import database
+
+
+def per_call_commit(user, i):
+    """What every /sos did before: insert_alert, commit, log_session, commit."""
+    now = clock.now()
+    with database.connection() as conn:
+        database._insert_alert_tx(conn, user, "SOS button triggered", 19.07, 72.87, now)
+    with database.connection() as conn:
+        database._log_session_tx(conn, user, "sos", now)
+
+
+def group_commit(user, i):
+    database.record_event(user, "SOS button triggered", "sos", 19.07, 72.87)
+
+
+def run(label, fn, threads, events):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(t):
+        mine = []
+        for i in range(events):
+            t0 = time.perf_counter()
+            fn(f"user{t}@bench", i)
+            mine.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(mine)
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    total = threads * events
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"{label:<16} {total / elapsed:>9,.0f} events/s   "
+          f"p50 {p(0.50):6.2f} ms   p99 {p(0.99):7.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--events", type=int, default=500, help="events per thread")
+    parser.add_argument("--synchronous", default=database.DB_SYNCHRONOUS,
+                        help="PRAGMA synchronous for the run (NORMAL or FULL)")
+    args = parser.parse_args()
+
+    database.DB_SYNCHRONOUS = args.synchronous
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, fn in (("per-call commit", per_call_commit), ("group commit", group_commit)):
+            database.DB_NAME = os.path.join(tmp, f"{fn.__name__}.db")
+            database.create_table()
+            run(label, fn, args.threads, args.events)
+        print(f"group commit: {database.writer.stats['writes']:,} writes in "
+              f"{database.writer.stats['batches']:,} transactions")
+        database.close_pool()
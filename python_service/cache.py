@@ -0,0 +1,143 @@
+"""
+cache.py — RakshaNet
+Uses: collections.OrderedDict + threading (standard library)
+
+Small in-process caches for hot, rarely-changing reads (emergency contacts).
+
+  LRUCache            — size-bounded, TTL-expiring, thread-safe, counts hits/misses
+  ReadThroughCache    — loads misses from a function, invalidated on writes
+  LocalInvalidationBus— in-memory bus; every subscribed cache drops the key
+
+Any object with publish(key) / subscribe(callback) can stand in for the
+bus, so several worker processes can share invalidations (see
+database.SqliteInvalidationBus).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+
+    def __init__(self, maxsize, ttl, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl     = ttl
+        self._clock  = clock
+        self._data   = OrderedDict()        # key → (expires_at, value)
+        self._lock   = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        """Return (True, value) on a fresh hit, else (False, None)."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > self._clock():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, item[1]
+            if item is not None:
+                del self._data[key]          # expired
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size":      len(self._data),
+                "maxsize":   self.maxsize,
+                "ttl":       self.ttl,
+                "hits":      self.hits,
+                "misses":    self.misses,
+                "evictions": self.evictions,
+                "hit_rate":  round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class LocalInvalidationBus:
+    """In-memory bus: publish(key) calls every subscriber in this process."""
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def publish(self, key):
+        for callback in list(self._subscribers):
+            callback(key)
+
+
+class ReadThroughCache:
+    """
+    get(key) serves from the LRU or calls loader(key) on a miss.
+    invalidate(key) drops the key here and, via the bus, everywhere else.
+
+    A per-key generation counter stops a slow load that started before an
+    invalidation from caching the pre-write value afterwards.
+    """
+
+    def __init__(self, loader, maxsize, ttl, bus=None):
+        self.loader = loader
+        self.lru    = LRUCache(maxsize, ttl)
+        self.bus    = bus or LocalInvalidationBus()
+        self._gen   = {}
+        self._epoch = 0
+        self._lock  = threading.Lock()
+        self.bus.subscribe(self._drop)
+
+    def get(self, key):
+        hit, value = self.lru.get(key)
+        if hit:
+            return value
+        with self._lock:
+            gen = (self._epoch, self._gen.get(key, 0))
+        value = self.loader(key)
+        with self._lock:
+            if (self._epoch, self._gen.get(key, 0)) == gen:
+                self.lru.set(key, value)
+        return value
+
+    ALL = "*"   # bus key meaning "drop everything"
+
+    def invalidate(self, key):
+        self._drop(key)
+        self.bus.publish(key)
+
+    def invalidate_all(self):
+        self._drop(self.ALL)
+        self.bus.publish(self.ALL)
+
+    def _drop(self, key):
+        if key == self.ALL:
+            with self._lock:
+                self._gen.clear()
+                self._epoch += 1
+                self.lru.clear()
+            return
+        with self._lock:
+            self._gen[key] = self._gen.get(key, 0) + 1
+            if len(self._gen) > 4 * self.lru.maxsize:
+                self._gen.clear()   # keep it bounded; the epoch bump
+                self._epoch += 1    # still voids every load in flight
+            self.lru.invalidate(key)
+
+    def stats(self):
+        return self.lru.stats()
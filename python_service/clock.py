@@ -0,0 +1,95 @@
+"""
+clock.py — RakshaNet
+Uses: zoneinfo + datetime (standard library)
+
+One instant per event. Take it once with clock.now() (or wrap an existing
+datetime / epoch with clock.at()), hand it down, and read every stored or
+displayed field off the same Instant, so created_at, date_only, time_only,
+day name and week number can never straddle a second or midnight.
+
+  inst.dt          aware datetime (Asia/Kolkata)
+  inst.ts          epoch seconds (float)      inst.ms     epoch milliseconds
+  inst.iso         ISO-8601 for storage       inst.display  DD-MM-YYYY HH:MM:SS
+  inst.date        YYYY-MM-DD                 inst.time   HH:MM:SS
+  inst.weekday     Monday …                   inst.week   ISO week number
+  inst.week_start  Monday of the week, YYYY-MM-DD
+
+Formatting is memoized: the day fields are built once per calendar day
+and the clock fields once per second, so an instant costs one
+datetime.fromtimestamp() and one isoformat() on the hot path. zoneinfo
+replaces pytz here (no localize/normalize, and a cheaper utcoffset).
+"""
+
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+IST = ZoneInfo("Asia/Kolkata")
+
+# Single-entry memos: (key, fields). Replacing the tuple is atomic, so
+# threads may race to rebuild an entry but never see a torn one.
+_day    = (None, None)   # date ordinal → (date, weekday, week, week_start, DD-MM-YYYY)
+_second = (None, None)   # (ordinal, h, m, s) → (HH:MM:SS, DD-MM-YYYY HH:MM:SS)
+
+
+def _day_fields(dt):
+    global _day
+    key = dt.toordinal()
+    if _day[0] != key:
+        d   = date.fromordinal(key)
+        _day = (key, (d.isoformat(), d.strftime("%A"), d.isocalendar()[1],
+                      (d - timedelta(days=d.weekday())).isoformat(), d.strftime("%d-%m-%Y")))
+    return _day[1]
+
+
+def _second_fields(dt, day):
+    global _second
+    key = (dt.toordinal(), dt.hour, dt.minute, dt.second)
+    if _second[0] != key:
+        hms     = f"{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}"
+        _second = (key, (hms, f"{day[4]} {hms}"))
+    return _second[1]
+
+
+class Instant:
+    __slots__ = ("dt", "ts", "iso", "date", "time", "display", "weekday", "week", "week_start")
+
+    def __init__(self, dt, ts=None):
+        day = _day_fields(dt)
+        self.dt         = dt
+        self.ts         = dt.timestamp() if ts is None else ts
+        self.iso        = dt.isoformat()
+        self.date, self.weekday, self.week, self.week_start = day[:4]
+        self.time, self.display = _second_fields(dt, day)
+
+    @property
+    def ms(self):
+        return int(self.ts * 1000)
+
+    def __add__(self, delta):
+        return at(self.dt + delta)
+
+    def __sub__(self, delta):
+        return at(self.dt - delta)
+
+    def __repr__(self):
+        return f"Instant({self.iso})"
+
+
+def now():
+    """The current instant in IST."""
+    ts = time.time()
+    return Instant(datetime.fromtimestamp(ts, IST), ts)
+
+
+def at(value):
+    """Instant for an epoch (seconds), a naive (IST) or aware datetime, or an Instant."""
+    if isinstance(value, Instant):
+        return value
+    if isinstance(value, (int, float)):
+        return Instant(datetime.fromtimestamp(value, IST), value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=IST)
+    elif value.tzinfo is not IST:
+        value = value.astimezone(IST)
+    return Instant(value)
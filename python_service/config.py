@@ -3,6 +3,11 @@ EMAIL_ENABLED = True
 
 SMTP_SERVER = "smtp.gmail.com"
 SMTP_PORT = 587
+SMTP_USE_TLS = True     # False for a local smtpd / aiosmtpd stand-in
+SMTP_TIMEOUT = 30       # seconds per SMTP command
+SMTP_POOL_SIZE = 2      # concurrent logged-in sessions kept open
+SMTP_KEEPALIVE = 60     # probe a session with NOOP if idle longer than this
+SMTP_MAX_IDLE = 240     # close sessions idle longer than this (servers drop ~5 min)
 
 SENDER_EMAIL = "abc@gmail.com" 
 SENDER_PASSWORD = "abcd efgh ijklm nopqr"  # use App Password if 2FA is enabled
@@ -18,3 +23,103 @@ TWILIO_AUTH_TOKEN = "your_auth_token"
 
 TWILIO_PHONE_NUMBER = "+1234567890"
 RECEIVER_PHONE_NUMBER = "+91xxxxxxxxxx"   # only your own verified number
+
+TWILIO_API_BASE  = None   # e.g. "http://127.0.0.1:8026" to hit a local stub
+SMS_MAX_PARALLEL = 8      # concurrent Twilio API requests
+SMS_RATE_PER_SEC = 10     # Twilio API request rate cap
+SMS_TIMEOUT      = 15     # seconds per Twilio API request
+
+
+# --- DATABASE SETTINGS (SQLite connection pool) ---
+DB_POOL_SIZE       = 8            # max open connections per database file
+DB_POOL_TIMEOUT    = 10           # seconds to wait for a free connection
+DB_SYNCHRONOUS     = "NORMAL"     # safe with WAL, far fewer fsyncs than FULL
+DB_CACHE_SIZE_KB   = 16384        # page cache per connection (16 MB)
+DB_MMAP_SIZE       = 268435456    # memory-mapped I/O (256 MB)
+DB_BUSY_TIMEOUT_MS = 5000         # wait on a locked database instead of failing
+WRITE_BATCH_SIZE    = 256         # max alert/session writes per group commit
+WRITE_BATCH_WAIT_MS = 0           # extra wait to grow a batch (0 = commit what's queued)
+
+# --- CACHE SETTINGS ---
+CONTACTS_CACHE_SIZE = 50000   # users whose contact lists stay in memory
+CONTACTS_CACHE_TTL  = 300     # seconds before a cached list is re-read anyway
+CACHE_BUS           = "sqlite"  # "sqlite" shares invalidations across workers, "local" = this process only
+CACHE_BUS_POLL      = 1.0     # seconds between cross-worker invalidation polls
+
+
+# --- SAFETY TIMER SETTINGS ---
+TIMER_POLL_INTERVAL = 2     # seconds between expiry-loop scans of the timers table
+TIMER_LEASE_TTL     = 10    # seconds a worker stays expiry leader without renewing
+TIMER_MAX_MINUTES   = 1440  # longest /start-timer accepted, in minutes (one day)
+
+
+# --- NOTIFICATION QUEUE SETTINGS ---
+NOTIFY_QUEUE_SIZE   = 10000   # max pending deliveries held in memory
+NOTIFY_WORKERS      = 8       # parallel senders (fan-out across contacts)
+NOTIFY_MAX_ATTEMPTS = 4       # first try + retries
+NOTIFY_BACKOFF_BASE = 2       # seconds; retry n waits BASE * 2**(n-1)
+NOTIFY_BATCH_SIZE   = 20      # queued messages a worker sends in one go (one SMTP session)
+NOTIFY_SWEEP_EVERY  = 5       # seconds between claims of queued / abandoned deliveries
+NOTIFY_CLAIM_TTL    = 300     # seconds a claimed delivery stays with its worker before others may send it
+
+
+# --- LOCATION TRAIL SETTINGS ---
+TRAIL_BUCKET_SECONDS  = 600    # one packed row per user per 10 minutes
+TRAIL_MAX_POINTS      = 1000   # points accepted per /location request
+TRAIL_SOS_MINUTES     = 30     # trail window attached to auto-SOS messages
+
+
+# --- SPATIAL QUERY SETTINGS ---
+NEARBY_MAX_RADIUS_KM = 100     # largest radius /alerts/nearby accepts
+NEARBY_MAX_LIMIT     = 1000    # most alerts one nearby query returns
+HOTSPOT_CELL_KM      = 1.0     # default hotspot grid cell size
+
+
+# --- ASGI SERVER SETTINGS ---
+ASGI_WORKERS  = 32                 # threads running (blocking) route handlers per process
+ASGI_BACKLOG  = 1024               # requests in flight before new ones get 503 + Retry-After
+ASGI_MAX_BODY = 8 * 1024 * 1024    # largest request body accepted (bytes)
+
+
+# --- METRICS SETTINGS ---
+METRICS_ENABLED      = True    # record latency histograms / counters served at /metrics
+PROFILER_INTERVAL_MS = 10      # sampling profiler: ms between stack snapshots
+METRICS_ADMIN_TOKEN  = None    # X-Admin-Token for /debug/profile (None = localhost only)
+
+
+# --- LIVE STREAM (SSE) SETTINGS ---
+SSE_MAX_CLIENTS  = 20000   # open /stream connections per process
+SSE_QUEUE_SIZE   = 100     # events buffered per slow client before the oldest drop
+SSE_REPLAY       = 20      # recent events kept per user for Last-Event-ID resume
+SSE_REPLAY_USERS = 10000   # users whose recent events are kept
+SSE_HEARTBEAT    = 15      # seconds between keep-alive comments on idle streams
+
+
+# --- BURST CONTROL SETTINGS ---
+SOS_DEDUP_WINDOW   = 30       # seconds; an SOS this soon after the previous one joins its alert
+SOS_DEDUP_MAX_SPAN = 300      # seconds; a burst older than this opens a fresh alert (contacts re-notified)
+TIMER_RATE_PER_MIN = 6        # sustained /start-timer calls per user per minute
+TIMER_BURST        = 3        # back-to-back /start-timer calls allowed before limiting
+RATE_LIMIT_USERS   = 100000   # users tracked per limiter; least recently active evicted beyond this
+
+
+# --- RETENTION / MAINTENANCE SETTINGS ---
+ALERT_RETENTION_DAYS   = None     # days before alerts move to monthly archive files (None = keep all live)
+SESSION_RETENTION_DAYS = None     # same for session log rows; both are opt-in, e.g. 365 / 90
+ARCHIVE_DIR            = "archive"  # next to alerts.db; one rakshanet-YYYY-MM.db per month
+ARCHIVE_BATCH          = 5000     # rows moved per rollover transaction
+MAINT_POLL_INTERVAL    = 60       # seconds between maintenance-leader wake-ups
+MAINT_ROLLOVER_EVERY   = 3600     # seconds between rollover runs
+MAINT_ROLLOVER_BUDGET  = 30       # seconds one rollover run may spend before yielding
+MAINT_CHECKPOINT_EVERY = 300      # seconds between wal_checkpoint(TRUNCATE) runs
+MAINT_VACUUM_EVERY     = 3600     # seconds between incremental vacuum runs
+MAINT_VACUUM_PAGES     = 2000     # free pages returned to the OS per run
+MAINT_ANALYZE_EVERY    = 86400    # seconds between ANALYZE refreshes
+DB_WAL_SIZE_LIMIT      = 64 * 1024 * 1024   # journal_size_limit: WAL size kept after a checkpoint
+
+
+# --- SHARDING SETTINGS ---
+DB_SHARDS         = 1      # SQLite files users are spread over (a new database only; then `database.py rebalance N`)
+SHARD_VNODES      = 64     # ring points per shard (more = more even spread)
+SHARD_LAYOUT_POLL = 2.0    # seconds a process trusts its cached shard layout before re-reading it
+REBALANCE_BATCH   = 500    # users moved per rebalance transaction
@@ -0,0 +1,58 @@
+"""
+conftest.py — RakshaNet
+Shared pytest fixtures. Run the suite from python_service/:
+
+    python -m pytest -q
+"""
+
+import time
+
+import pytest
+
+import database
+from ratelimit import SosCoalescer, TokenBuckets
+from scheduler import DurableTimers
+
+collect_ignore = ["test_email.py"]   # sends a real email; run it by hand
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A freshly migrated single-shard alerts.db in tmp_path for one test."""
+    database.writer.flush()
+    database.close_pool()
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "alerts.db"))
+    monkeypatch.setattr(database, "DB_SHARDS", 1)
+    database.open_shards()
+    database.contacts_cache.lru.clear()
+    yield database.DB_NAME
+    database.writer.flush()
+    database.close_pool()
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """
+    Flask test client on the `db` database. The app's background workers
+    are stopped (tests drive them directly); timers get a fresh, unstarted
+    DurableTimers and burst control starts empty.
+    """
+    import app as app_module   # first import starts the workers: stop them once
+    if not getattr(app_module, "_stopped_for_tests", False):
+        app_module.shutdown_background()
+        app_module._stopped_for_tests = True
+    monkeypatch.setattr(app_module, "timers", DurableTimers(app_module.auto_sos))
+    monkeypatch.setattr(app_module, "sos_bursts", SosCoalescer())
+    monkeypatch.setattr(app_module, "timer_limits", TokenBuckets())
+    yield app_module.app.test_client()
+    app_module.timers.scheduler.shutdown(wait=False)
+
+
+def wait_for(predicate, timeout=5.0, interval=0.01):
+    """Poll predicate() until it is truthy; returns its last value."""
+    deadline = time.monotonic() + timeout
+    while True:
+        value = predicate()
+        if value or time.monotonic() > deadline:
+            return value
+        time.sleep(interval)
@@ -6,32 +6,520 @@ Tables:
   sos_alerts  — every SOS / timer event
   contacts    — emergency phone numbers per user
   sessions    — login/logout tracking
+  timers      — armed check-in deadlines (survive restarts, shared by workers)
+  leases      — leader election for the timer expiry loop
+  deliveries  — per-recipient email / SMS delivery status for each alert
+  user_stats, user_daily_counts, user_weekly_counts
+              — per-user alert rollups, maintained by insert_alert()
+  user_versions — per-user change counter behind HTTP ETags
+  cache_invalidations — cross-worker cache invalidation log
+  location_trail — live-location points, delta-packed per user per time bucket
+  last_positions — latest known point per user
+  alerts_rtree — R*Tree spatial index over alert positions and times
+  (sos_alerts.repeat_count — SOS presses coalesced into one alert, see ratelimit.py)
+  maintenance_state — archive horizons, last-run times of maintenance.py tasks
+                      and the shard layout
+  shard_moves, moved_users — bookkeeping of an online rebalance (see SHARDING)
+
+Old sos_alerts / sessions rows move to monthly archive files (archive.py);
+fetch_alerts_history() and iter_alerts() read them back for old date ranges.
+
+Users are spread over DB_SHARDS files by consistent hashing (shards.py).
+Shard 0 is DB_NAME itself and also holds the deployment-wide tables
+(leases, cache_invalidations, maintenance_state, shard_moves). Per-user
+functions run on the user's shard; the global ones (bulk exports,
+hotspots, timers due, queued deliveries, maintenance) scatter over every
+shard and gather the results. Signatures are the same either way.
 """
 
+import atexit
+import functools
+import heapq
+import json
+import os
+import queue
 import sqlite3
-from datetime import datetime
-import pytz
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from concurrent.futures import Future
+
+import archive
+import clock
+import geo
+import metrics
+import shards
+from events import bus, mask
+import trail
+from cache import LocalInvalidationBus, ReadThroughCache
+from config import (DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_SYNCHRONOUS,
+                    DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_BUSY_TIMEOUT_MS,
+                    WRITE_BATCH_SIZE, WRITE_BATCH_WAIT_MS,
+                    CONTACTS_CACHE_SIZE, CONTACTS_CACHE_TTL,
+                    CACHE_BUS, CACHE_BUS_POLL,
+                    ARCHIVE_DIR, ARCHIVE_BATCH, MAINT_VACUUM_PAGES, DB_WAL_SIZE_LIMIT,
+                    DB_SHARDS, SHARD_LAYOUT_POLL, REBALANCE_BATCH)
 
 DB_NAME = "alerts.db"
-IST     = pytz.timezone("Asia/Kolkata")
+IST     = clock.IST
+
+# Wall time of each query function below, labelled by function name.
+DB_CALL_SECONDS      = metrics.histogram("db_call_seconds", "Time spent in database.py query functions",
+                                         ["function"])
+WRITE_BATCH_WRITES   = metrics.histogram("db_write_batch_size", "Writes per group commit",
+                                         buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+WRITE_COMMIT_SECONDS = metrics.histogram("db_write_commit_seconds",
+                                         "Duration of one group-commit transaction")
+
 
+QUERY_FUNCTIONS = set()   # every @timed function; audit_query_plans() checks it ran each one
+_audit_calls    = None    # names of the @timed functions called while an audit runs
 
-#  CONNECTION
-def get_connection():
-    conn = sqlite3.connect(DB_NAME, check_same_thread=False)
+def timed(fn):
+    name = fn.__name__
+    QUERY_FUNCTIONS.add(name)
+    observed = metrics.timed(DB_CALL_SECONDS, name)(fn)
+
+    @functools.wraps(fn)
+    def call(*args, **kwargs):
+        if _audit_calls is not None:
+            _audit_calls.add(name)
+        return observed(*args, **kwargs)
+    return call
+
+
+#  CONNECTION POOL
+#  Connections are opened once, configured once (PRAGMAs below) and then
+#  handed out from a bounded queue, so a request never pays for
+#  sqlite3.connect() + PRAGMA journal_mode on the hot path. Every shard
+#  file has its own pool.
+_sql_trace = None   # audit_query_plans() captures every statement through this
+
+def get_connection(path=None):
+    """Open a new, fully configured connection (used by the pool)."""
+    conn = sqlite3.connect(path or DB_NAME, check_same_thread=False,
+                           timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    if _sql_trace is not None:
+        conn.set_trace_callback(_sql_trace)
     conn.row_factory = sqlite3.Row   # rows behave like dicts
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")   # only takes effect on a new file (or VACUUM)
     conn.execute("PRAGMA journal_mode=WAL")  # better concurrency
+    conn.execute(f"PRAGMA journal_size_limit={int(DB_WAL_SIZE_LIMIT)}")
+    conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{int(DB_CACHE_SIZE_KB)}")
+    conn.execute(f"PRAGMA mmap_size={int(DB_MMAP_SIZE)}")
+    conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)}")
     return conn
 
 
-#  CREATE TABLES
-def create_table():
-    conn = get_connection()
-    cursor = conn.cursor()
+class ConnectionPool:
+    """
+    Bounded pool of long-lived sqlite3 connections.
+      - connections are created lazily, up to `size`
+      - acquire() blocks up to `timeout` seconds when all are in use
+      - close() drains and closes every idle connection
+    """
+
+    def __init__(self, path, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.path    = path
+        self.size    = size
+        self.timeout = timeout
+        self._idle   = queue.LifoQueue(maxsize=size)   # LIFO keeps hot conns hot
+        self._lock   = threading.Lock()
+        self._opened = 0
+        self._closed = False
+
+    def acquire(self):
+        if self._closed:
+            raise RuntimeError("connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return get_connection(self.path)
+                except Exception:
+                    self._opened -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"no free database connection after {self.timeout}s")
+
+    def release(self, conn, broken=False):
+        if broken or self._closed:
+            self._discard(conn)
+            return
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except Exception:
+                self._discard(conn)   # unusable; free its slot for a fresh one
+                return
+        self._idle.put_nowait(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._opened -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def stats(self):
+        return {"path": self.path, "size": self.size,
+                "open": self._opened, "idle": self._idle.qsize()}
+
+
+_pools     = {}   # shard → ConnectionPool
+_pool_lock = threading.Lock()
+
+def get_pool(shard=0):
+    """Return the process-wide pool of a shard, (re)creating it if DB_NAME changed."""
+    path = shards.shard_path(DB_NAME, shard)
+    pool = _pools.get(shard)
+    if pool is None or pool.path != path or pool._closed:
+        with _pool_lock:
+            pool = _pools.get(shard)
+            if pool is None or pool.path != path or pool._closed:
+                if pool is not None:
+                    pool.close()
+                pool = _pools[shard] = ConnectionPool(path)
+    return pool
+
+def close_pool():
+    """Shutdown hook: close every pooled connection of every shard."""
+    with _pool_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+def pool_stats():
+    """get_pool().stats() summed over the shards' pools."""
+    pools = list(_pools.values())
+    return {"shards": len(pools), "size": sum(p.size for p in pools),
+            "open": sum(p._opened for p in pools), "idle": sum(p._idle.qsize() for p in pools)}
+
+atexit.register(close_pool)
+
+
+@contextmanager
+def connection(shard=0):
+    """
+    Borrow a pooled connection to a shard (default: shard 0, the home
+    database) for one unit of work.
+    Commits on success, rolls back on error, always returns it to the pool.
+    """
+    pool   = get_pool(shard)
+    conn   = pool.acquire()
+    broken = False
+    try:
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+    except BaseException:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            broken = True   # connection is unusable — don't return it
+        raise
+    finally:
+        pool.release(conn, broken=broken)
+
+
+#  GROUP-COMMIT WRITER
+#  Alert / session writes are queued to one writer thread, which applies
+#  everything waiting in a single transaction (one commit, one WAL sync)
+#  instead of one transaction per call. Each write runs in its own
+#  SAVEPOINT so a failing write doesn't sink the rest of its batch.
+#  One writer per shard file, so shards commit in parallel.
+class GroupCommitWriter:
+
+    def __init__(self, shard=0, batch_size=WRITE_BATCH_SIZE, wait_ms=WRITE_BATCH_WAIT_MS):
+        self.shard      = shard
+        self.batch_size = batch_size
+        self.wait       = wait_ms / 1000
+        self._queue     = queue.Queue()
+        self._thread    = None
+        self._lock      = threading.Lock()
+        self._idle      = threading.Condition()
+        self._pending   = 0
+        self.stats      = {"writes": 0, "batches": 0}
+
+    def submit(self, fn, *args):
+        """Queue fn(conn, *args); the Future resolves once its batch has committed."""
+        future = Future()
+        self._ensure_started()
+        with self._idle:
+            self._pending += 1
+        self._queue.put((fn, args, future))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True,
+                                                    name=f"rakshanet-writer-{self.shard}")
+                    self._thread.start()
+
+    def flush(self, timeout=None):
+        """Block until every queued write has been committed (or failed)."""
+        with self._idle:
+            self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _done(self, count):
+        with self._idle:
+            self._pending -= count
+            if self._pending == 0:
+                self._idle.notify_all()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.wait
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch   = self._collect()
+            results = []
+            started = time.perf_counter()
+            try:
+                with connection(self.shard) as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    for fn, args, future in batch:
+                        conn.execute("SAVEPOINT w")
+                        try:
+                            results.append((future, fn(conn, *args), None))
+                            conn.execute("RELEASE w")
+                        except Exception as e:
+                            conn.execute("ROLLBACK TO w")
+                            conn.execute("RELEASE w")
+                            results.append((future, None, e))
+            except Exception as e:
+                # the commit itself failed — nothing in this batch is durable
+                for _, _, future in batch:
+                    future.set_exception(e)
+                self._done(len(batch))
+                continue
+            self.stats["writes"]  += len(batch)
+            self.stats["batches"] += 1
+            WRITE_BATCH_WRITES.observe(len(batch))
+            WRITE_COMMIT_SECONDS.observe(time.perf_counter() - started)
+            for future, value, error in results:
+                if error is None:
+                    future.set_result(value)
+                else:
+                    future.set_exception(error)
+            self._done(len(batch))
+
+
+class ShardWriters:
+    """The GroupCommitWriter of each shard (writer[shard]), started on first use."""
+
+    def __init__(self):
+        self._writers = {}
+        self._lock    = threading.Lock()
+
+    def __getitem__(self, shard):
+        w = self._writers.get(shard)
+        if w is None:
+            with self._lock:
+                w = self._writers.get(shard)
+                if w is None:
+                    w = self._writers[shard] = GroupCommitWriter(shard)
+        return w
 
-    # --- Alerts table (stores every SOS / timer event) ---
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sos_alerts (
+    def flush(self, timeout=None):
+        """Block until every shard's queued writes have been committed (or failed)."""
+        for w in list(self._writers.values()):
+            w.flush(timeout)
+
+    @property
+    def stats(self):
+        ws = list(self._writers.values())
+        return {"writes": sum(w.stats["writes"] for w in ws),
+                "batches": sum(w.stats["batches"] for w in ws)}
+
+
+writer = ShardWriters()
+atexit.register(writer.flush)   # runs before close_pool (atexit is LIFO)
+
+
+#  SHARDING
+#  Which shard holds a user: shards.owner() on the layout recorded in the
+#  home database. While `python database.py rebalance M` runs, users whose
+#  owner differs between the old and the new ring are looked up in
+#  shard_moves (moved yet or not). Every write checks, in its own
+#  transaction, that the user hasn't been moved off that shard meanwhile
+#  (the moved_users tombstone); if so it fails with ShardMoved and is
+#  re-routed, so a write can never land on a shard the user has left.
+class ShardMoved(Exception):
+    """The user was moved to another shard while this write was routed."""
+
+
+class ShardLayout:
+    """
+    (shards, generation, target) from maintenance_state["shard_layout"],
+    cached per process and re-read every SHARD_LAYOUT_POLL seconds.
+      shards     — files users are spread over
+      generation — bumped by each rebalance; selects the id ranges (shards.id_base)
+      target     — shard count a rebalance is moving to, else None
+    """
+
+    KEY = "shard_layout"
+
+    def __init__(self):
+        self.home     = None
+        self.state    = (DB_SHARDS, 0, None)
+        self._checked = 0.0
+
+    def refresh(self, force=False):
+        if not force and self.home == DB_NAME and time.monotonic() - self._checked < SHARD_LAYOUT_POLL:
+            return self.state
+        try:
+            value = get_state(self.KEY)
+        except sqlite3.OperationalError:
+            return (DB_SHARDS, 0, None)   # not migrated yet
+        if value is not None:
+            stored = json.loads(value)
+            self.state = (stored["shards"], stored["generation"], stored["target"])
+        else:
+            self.state = (DB_SHARDS, 0, None)
+        self.home, self._checked = DB_NAME, time.monotonic()
+        return self.state
+
+    def store(self, count, generation, target=None):
+        set_state(self.KEY, json.dumps({"shards": count, "generation": generation, "target": target}))
+        return self.refresh(force=True)
+
+
+layout = ShardLayout()
+
+
+def shard_for(user):
+    """Index of the shard holding `user`."""
+    count, _, target = layout.refresh()
+    owner = shards.owner(user, count)
+    if target is None:
+        return owner
+    if shards.owner(user, target) == owner:
+        return owner
+    with connection() as conn:   # mid-rebalance: moved yet?
+        row = conn.execute("SELECT shard FROM shard_moves WHERE user = ?", (user,)).fetchone()
+    return row[0] if row else owner
+
+
+def all_shards():
+    """Every shard that may hold rows (old and new ones while rebalancing)."""
+    count, _, target = layout.refresh()
+    return range(max(count, target or 0))
+
+
+def _check_fence(conn, user):
+    """Call after a write, in its transaction: refuse it if `user` has left this shard."""
+    if conn.execute("SELECT 1 FROM moved_users WHERE user = ?", (user,)).fetchone():
+        raise ShardMoved(user)
+
+
+def _fenced_tx(conn, user, fn, args):
+    result = fn(conn, *args)
+    _check_fence(conn, user)
+    return result
+
+
+def _submit(user, fn, *args):
+    """
+    writer.submit(fn, *args) on the user's shard. A write refused with
+    ShardMoved is re-routed and queued again; the returned Future only
+    resolves with the final outcome.
+    """
+    outer = Future()
+
+    def attempt(tries):
+        def done(f):
+            error = f.exception()
+            if isinstance(error, ShardMoved) and tries < 3:
+                layout.refresh(force=True)
+                attempt(tries + 1)
+            elif error is not None:
+                outer.set_exception(error)
+            else:
+                outer.set_result(f.result())
+        writer[shard_for(user)].submit(_fenced_tx, user, fn, args).add_done_callback(done)
+
+    attempt(1)
+    return outer
+
+
+def _user_write(user, fn, *args):
+    """fn(conn, *args) in one transaction on the user's shard, re-routed like _submit()."""
+    for _ in range(3):
+        try:
+            with connection(shard_for(user)) as conn:
+                return _fenced_tx(conn, user, fn, args)
+        except ShardMoved:
+            layout.refresh(force=True)
+    raise ShardMoved(user)
+
+
+#  ROLLUP SQL
+#  Recomputes every per-user rollup from sos_alerts. Used by migration 3
+#  and by `python database.py rebuild-stats`. user_stats is cumulative:
+#  rollover leaves it alone, so rebuild_user_stats() adds archived rows
+#  back in afterwards. Daily / weekly counts only matter for today and this
+#  week; rollover prunes them below the archive horizon.
+_ROLLUP_REBUILD = [
+    "DELETE FROM user_stats",
+    "DELETE FROM user_daily_counts",
+    "DELETE FROM user_weekly_counts",
+    """INSERT INTO user_stats (user, total, first_alert, last_alert)
+       SELECT u.user, u.total,
+              (SELECT created_at FROM sos_alerts WHERE user = u.user ORDER BY id ASC  LIMIT 1),
+              (SELECT created_at FROM sos_alerts WHERE user = u.user ORDER BY id DESC LIMIT 1)
+       FROM (SELECT user, COUNT(*) AS total FROM sos_alerts GROUP BY user) AS u""",
+    """INSERT INTO user_daily_counts (user, day, count)
+       SELECT user, date_only, COUNT(*) FROM sos_alerts GROUP BY user, date_only""",
+    """INSERT INTO user_weekly_counts (user, week_start, count)
+       SELECT user, date(date_only, 'weekday 0', '-6 days') AS wk, COUNT(*)
+       FROM sos_alerts GROUP BY user, wk""",
+]
+
+
+#  SCHEMA MIGRATIONS
+#  Each entry runs once, in order, inside one transaction; the applied
+#  version is stored in PRAGMA user_version. Append — never edit — entries.
+MIGRATIONS = [
+    (1, "base tables", [
+        # --- Alerts table (stores every SOS / timer event) ---
+        """CREATE TABLE IF NOT EXISTS sos_alerts (
             id          INTEGER PRIMARY KEY AUTOINCREMENT,
             user        TEXT    NOT NULL,
             reason      TEXT    NOT NULL,
@@ -40,240 +528,1963 @@ def create_table():
             created_at  TEXT    NOT NULL,   -- ISO-8601 timestamp
             date_only   TEXT    NOT NULL,   -- YYYY-MM-DD  (for date filtering)
             time_only   TEXT    NOT NULL    -- HH:MM:SS    (for time filtering)
-        )
-    """)
+        )""",
 
-    # --- Contacts table ---
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS contacts (
+        # --- Contacts table ---
+        """CREATE TABLE IF NOT EXISTS contacts (
             id         INTEGER PRIMARY KEY AUTOINCREMENT,
             user       TEXT NOT NULL,
             phone      TEXT NOT NULL,
             added_on   TEXT NOT NULL,       -- ISO-8601 timestamp
             UNIQUE(user, phone)             -- no duplicate contacts
-        )
-    """)
+        )""",
 
-    # --- Sessions table (datetime module showcase) ---
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sessions (
+        # --- Sessions table (datetime module showcase) ---
+        """CREATE TABLE IF NOT EXISTS sessions (
             id         INTEGER PRIMARY KEY AUTOINCREMENT,
             user       TEXT NOT NULL,
             event      TEXT NOT NULL,       -- 'login' | 'logout' | 'checkin'
             logged_at  TEXT NOT NULL,
             day_name   TEXT NOT NULL,       -- e.g. "Monday"
             week_num   INTEGER NOT NULL     -- ISO week number
-        )
-    """)
+        )""",
 
-    conn.commit()
-    conn.close()
-    print("✅ Database tables ready")
+        # --- Timers table (one armed check-in deadline per user) ---
+        """CREATE TABLE IF NOT EXISTS timers (
+            user       TEXT PRIMARY KEY,
+            fires_at   REAL NOT NULL,       -- unix epoch seconds
+            minutes    INTEGER NOT NULL,
+            armed_at   TEXT NOT NULL        -- ISO-8601 timestamp
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_timers_fires_at ON timers (fires_at)",
+
+        # --- Deliveries table (one row per notification per recipient) ---
+        """CREATE TABLE IF NOT EXISTS deliveries (
+            id         INTEGER PRIMARY KEY AUTOINCREMENT,
+            alert_id   INTEGER,
+            user       TEXT NOT NULL,
+            channel    TEXT NOT NULL,       -- 'email' | 'sms'
+            recipient  TEXT NOT NULL,
+            message    TEXT NOT NULL,
+            status     TEXT NOT NULL,       -- 'queued' | 'sent' | 'failed' | 'skipped'
+            attempts   INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            updated_at TEXT NOT NULL        -- ISO-8601 timestamp
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_deliveries_alert ON deliveries (alert_id)",
+        "CREATE INDEX IF NOT EXISTS idx_deliveries_status ON deliveries (status)",
+
+        # --- Leases table (single-leader background loops) ---
+        """CREATE TABLE IF NOT EXISTS leases (
+            name       TEXT PRIMARY KEY,
+            owner      TEXT NOT NULL,
+            expires_at REAL NOT NULL        -- unix epoch seconds
+        )""",
+    ]),
+    (2, "per-user indexes", [
+        # newest-first listings, totals, first/last alert
+        "CREATE INDEX IF NOT EXISTS idx_alerts_user_id   ON sos_alerts (user, id)",
+        # date filters and today / this-week counts
+        "CREATE INDEX IF NOT EXISTS idx_alerts_user_date ON sos_alerts (user, date_only)",
+        # get_contacts: covering, already in display order
+        "CREATE INDEX IF NOT EXISTS idx_contacts_user_id ON contacts (user, id, phone)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions (user, id)",
+    ]),
+    (3, "per-user alert rollups", [
+        """CREATE TABLE IF NOT EXISTS user_stats (
+            user        TEXT PRIMARY KEY,
+            total       INTEGER NOT NULL,
+            first_alert TEXT,               -- created_at of the first alert
+            last_alert  TEXT                -- created_at of the latest alert
+        )""",
+        """CREATE TABLE IF NOT EXISTS user_daily_counts (
+            user        TEXT NOT NULL,
+            day         TEXT NOT NULL,      -- YYYY-MM-DD
+            count       INTEGER NOT NULL,
+            PRIMARY KEY (user, day)
+        ) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS user_weekly_counts (
+            user        TEXT NOT NULL,
+            week_start  TEXT NOT NULL,      -- YYYY-MM-DD of that week's Monday
+            count       INTEGER NOT NULL,
+            PRIMARY KEY (user, week_start)
+        ) WITHOUT ROWID""",
+        # backfill from existing alerts (same SQL as rebuild_user_stats)
+        *_ROLLUP_REBUILD,
+    ]),
+    (4, "cache invalidation log", [
+        """CREATE TABLE IF NOT EXISTS cache_invalidations (
+            seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel    TEXT NOT NULL,       -- which cache, e.g. 'contacts'
+            key        TEXT NOT NULL,
+            at         REAL NOT NULL        -- unix epoch seconds
+        )""",
+    ]),
+    (5, "location trails", [
+        # one row per user per TRAIL_BUCKET_SECONDS; points packed by trail.py
+        """CREATE TABLE IF NOT EXISTS location_trail (
+            id         INTEGER PRIMARY KEY,
+            user       TEXT    NOT NULL,
+            bucket     INTEGER NOT NULL,    -- ts_ms // (TRAIL_BUCKET_SECONDS * 1000)
+            n          INTEGER NOT NULL,    -- points in the blob
+            last_ts    INTEGER NOT NULL,    -- last appended point (delta base)
+            last_lat   INTEGER NOT NULL,    -- micro-degrees
+            last_lng   INTEGER NOT NULL,
+            points     BLOB    NOT NULL,
+            UNIQUE(user, bucket)
+        )""",
+        """CREATE TABLE IF NOT EXISTS last_positions (
+            user       TEXT PRIMARY KEY,
+            ts         INTEGER NOT NULL,    -- epoch milliseconds
+            latitude   REAL    NOT NULL,
+            longitude  REAL    NOT NULL
+        )""",
+    ]),
+    (6, "spatial alert index", [
+        # R*Tree over alert positions and times (epoch seconds); id = sos_alerts.id.
+        # Boxes are float32 rounded outwards, so queries refine against sos_alerts.
+        """CREATE VIRTUAL TABLE IF NOT EXISTS alerts_rtree USING rtree(
+            id, min_lat, max_lat, min_lng, max_lng, min_t, max_t
+        )""",
+        """INSERT INTO alerts_rtree
+           SELECT id, latitude, latitude, longitude, longitude,
+                  strftime('%s', created_at), strftime('%s', created_at)
+           FROM sos_alerts
+           WHERE latitude IS NOT NULL AND longitude IS NOT NULL""",
+    ]),
+    (7, "per-user version stamps", [
+        # bumped whenever a user's alerts change; the source of HTTP ETags
+        """CREATE TABLE IF NOT EXISTS user_versions (
+            user       TEXT PRIMARY KEY,
+            version    INTEGER NOT NULL,
+            changed_at TEXT    NOT NULL     -- ISO-8601 timestamp of the last change
+        )""",
+        """INSERT OR IGNORE INTO user_versions (user, version, changed_at)
+           SELECT user, total, COALESCE(last_alert, first_alert) FROM user_stats""",
+    ]),
+    (8, "coalesced SOS repeats", [
+        # repeated SOS presses within the dedup window update one alert
+        "ALTER TABLE sos_alerts ADD COLUMN repeat_count INTEGER NOT NULL DEFAULT 1",
+        "ALTER TABLE sos_alerts ADD COLUMN last_repeat_at TEXT",
+    ]),
+    (9, "maintenance state", [
+        # archive horizons and task bookkeeping for maintenance.py
+        """CREATE TABLE IF NOT EXISTS maintenance_state (
+            key   TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )""",
+    ]),
+    (10, "user sharding", [
+        # a rebalance moves deliveries by user
+        "CREATE INDEX IF NOT EXISTS idx_deliveries_user ON deliveries (user)",
+        # home database: users a running rebalance has already moved, and where to
+        """CREATE TABLE IF NOT EXISTS shard_moves (
+            user  TEXT PRIMARY KEY,
+            shard INTEGER NOT NULL
+        ) WITHOUT ROWID""",
+        # every shard: users moved off it; writes for them are refused (_check_fence)
+        """CREATE TABLE IF NOT EXISTS moved_users (
+            user  TEXT PRIMARY KEY,
+            shard INTEGER NOT NULL
+        ) WITHOUT ROWID""",
+    ]),
+    (11, "delivery claims", [
+        # a worker claims rows before sending them: status 'sending' (or
+        # 'retrying' during backoff) + owner; claimed_at is when the claim
+        # lapses minus NOTIFY_CLAIM_TTL, after which any worker may take it
+        "ALTER TABLE deliveries ADD COLUMN owner TEXT",
+        "ALTER TABLE deliveries ADD COLUMN claimed_at REAL",
+        "DROP INDEX IF EXISTS idx_deliveries_status",
+        "CREATE INDEX IF NOT EXISTS idx_deliveries_claim ON deliveries (status, claimed_at)",
+    ]),
+    (12, "rollup pruning", [
+        # rollover drops daily / weekly counts older than the archive horizon
+        "CREATE INDEX IF NOT EXISTS idx_daily_counts_day ON user_daily_counts (day)",
+        "CREATE INDEX IF NOT EXISTS idx_weekly_counts_week ON user_weekly_counts (week_start)",
+    ]),
+    (13, "rebalance write marks", [
+        # move_users copies users without write-locking their shard; any
+        # write to a listed user's rows meanwhile bumps `writes`, and only
+        # those users are copied again under the lock
+        """CREATE TABLE IF NOT EXISTS moving_users (
+            user   TEXT PRIMARY KEY,
+            writes INTEGER NOT NULL
+        ) WITHOUT ROWID""",
+        *(f"""CREATE TRIGGER IF NOT EXISTS mark_{table}_{op.lower()} AFTER {op} ON {table}
+              BEGIN UPDATE moving_users SET writes = writes + 1 WHERE user = {row}.user; END"""
+          for table in ("sos_alerts", "sessions", "contacts", "timers", "deliveries",
+                        "user_stats", "user_daily_counts", "user_weekly_counts", "user_versions",
+                        "location_trail", "last_positions")
+          for op, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD"))),
+    ]),
+    (14, "write marks only while rebalancing", [
+        # every write paid for the v13 triggers; rebalance() now adds them
+        # when it starts and drops them when it is done (_set_write_marks)
+        *(f"DROP TRIGGER IF EXISTS mark_{table}_{op}"
+          for table in ("sos_alerts", "sessions", "contacts", "timers", "deliveries",
+                        "user_stats", "user_daily_counts", "user_weekly_counts", "user_versions",
+                        "location_trail", "last_positions")
+          for op in ("insert", "update", "delete")),
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def migrate(conn, name="database"):
+    """Apply every pending migration. Safe to call from several processes."""
+    conn.execute("BEGIN IMMEDIATE")   # one migrator at a time
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, label, statements in MIGRATIONS:
+            if number <= version:
+                continue
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {number}")
+            print(f"🛠  Migrated {name} to v{number} ({label})")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+#  CREATE TABLES
+def create_table():
+    count = open_shards()
+    if isinstance(contacts_cache.bus, SqliteInvalidationBus):
+        contacts_cache.bus.start()
+    print("✅ Database tables ready" + (f" ({count} shards)" if count > 1 else ""))
+
+
+def open_shards(default=None):
+    """
+    Migrate the home database, record a layout of `default` (DB_SHARDS)
+    shards if it has none yet, then migrate every shard file and move its
+    id sequences into the current generation's range. Returns the shard count.
+    """
+    with connection() as conn:
+        migrate(conn)
+    if get_state(ShardLayout.KEY) is None:
+        layout.store(default or DB_SHARDS, 0)
+    count, generation, target = layout.refresh(force=True)
+    if count != DB_SHARDS and target is None and default is None:
+        print(f"⚠️  {DB_NAME} is laid out for {count} shard(s), DB_SHARDS says {DB_SHARDS}: "
+              f"set DB_SHARDS = {count} or run `python database.py rebalance {DB_SHARDS}`")
+    for shard in all_shards():
+        with connection(shard) as conn:
+            if shard:
+                migrate(conn, f"shard {shard}")
+            _seed_ids(conn, shards.id_base(generation, shard))
+    return count
+
+
+ID_TABLES = ("sos_alerts", "sessions", "contacts", "deliveries")
+
+def _seed_ids(conn, base):
+    """Make the AUTOINCREMENT tables hand out ids from `base` on (never lowers them)."""
+    if not base:
+        return
+    for table in ID_TABLES:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+        if row is None:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, base))
+        elif row[0] < base:
+            conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (base, table))
 
 
 #  DATETIME HELPERS
+#  Thin wrappers over clock.now(). A function that needs more than one
+#  field takes a single clock.Instant and reads them all off it.
 def now_ist():
     """Return current datetime object in IST."""
-    return datetime.now(IST)
+    return clock.now().dt
 
 def now_str():
     """Human-readable IST timestamp: DD-MM-YYYY HH:MM:SS"""
-    return now_ist().strftime("%d-%m-%Y %H:%M:%S")
+    return clock.now().display
 
 def now_iso():
     """ISO-8601 timestamp for DB storage."""
-    return now_ist().isoformat()
+    return clock.now().iso
 
 def now_date():
     """Date only: YYYY-MM-DD"""
-    return now_ist().strftime("%Y-%m-%d")
+    return clock.now().date
 
 def now_time():
     """Time only: HH:MM:SS"""
-    return now_ist().strftime("%H:%M:%S")
+    return clock.now().time
 
 def day_name():
     """Full weekday name: Monday, Tuesday …"""
-    return now_ist().strftime("%A")
+    return clock.now().weekday
 
 def week_number():
     """ISO week number of the year."""
-    return now_ist().isocalendar()[1]
+    return clock.now().week
+
+def week_start(dt=None):
+    """Monday of the week containing `dt` (default: now), as YYYY-MM-DD."""
+    return clock.at(dt).week_start if dt is not None else clock.now().week_start
 
 
 #  ALERT FUNCTIONS
-def insert_alert(user, reason, lat=None, lng=None):
-    conn   = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
+@timed
+def insert_alert(user, reason, lat=None, lng=None, wait=True, at=None):
+    """
+    Store an alert (rollups updated in the same transaction), stamped with
+    the clock.Instant `at` (default: now).
+    Returns its id once committed, or a Future of the id if wait=False.
+    """
+    now    = at or clock.now()
+    future = _submit(user, _insert_alert_tx, user, reason, lat, lng, now)
+    _publish_alert(future, user, reason, lat, lng, now)
+    return future.result() if wait else future
+
+
+@timed
+def record_event(user, reason, event, lat=None, lng=None, wait=True, at=None):
+    """
+    insert_alert + log_session as one atomic unit of work, both stamped
+    with the same clock.Instant `at` (default: now).
+    Returns the alert id once committed, or a Future of it if wait=False.
+    """
+    now    = at or clock.now()
+    future = _submit(user, _record_event_tx, user, reason, event, lat, lng, now)
+    _publish_alert(future, user, reason, lat, lng, now)
+    return future.result() if wait else future
+
+
+def _publish_alert(future, user, reason, lat, lng, now):
+    """Announce the alert on the live stream once its batch has committed."""
+    def done(f):
+        if f.exception() is None:
+            bus.publish(user, "alert", {"id": f.result(), "reason": reason, "latitude": lat,
+                                        "longitude": lng, "time": now.iso})
+    future.add_done_callback(done)
+
+
+@timed
+def _insert_alert_tx(conn, user, reason, lat, lng, now):
+    cursor = conn.execute(
         """INSERT INTO sos_alerts
            (user, reason, latitude, longitude, created_at, date_only, time_only)
            VALUES (?, ?, ?, ?, ?, ?, ?)""",
-        (user, reason, lat, lng, now_iso(), now_date(), now_time())
+        (user, reason, lat, lng, now.iso, now.date, now.time)
+    )
+    _bump_rollups(conn, user, now.iso, now.date, now.week_start)
+    if lat is not None and lng is not None:
+        conn.execute("INSERT INTO alerts_rtree VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (cursor.lastrowid, lat, lat, lng, lng, now.ts, now.ts))
+    return cursor.lastrowid
+
+
+@timed
+def _record_event_tx(conn, user, reason, event, lat, lng, now):
+    alert_id = _insert_alert_tx(conn, user, reason, lat, lng, now)
+    _log_session_tx(conn, user, event, now)
+    return alert_id
+
+
+@timed
+def coalesce_alert(alert_id, user, lat=None, lng=None, at=None):
+    """
+    Fold a repeated SOS into the open alert `alert_id`: bump its
+    repeat_count and move it to the new location (if one was sent).
+    Returns the new repeat_count, or None if the alert no longer exists.
+    No new alert row, rollup or notification.
+    """
+    now   = at or clock.now()
+    count = _submit(user, _coalesce_alert_tx, alert_id, user, lat, lng, now).result()
+    if count is not None:
+        bus.publish(user, "alert", {"id": alert_id, "repeat_count": count, "latitude": lat,
+                                    "longitude": lng, "time": now.iso})
+    return count
+
+
+def _coalesce_alert_tx(conn, alert_id, user, lat, lng, now):
+    row = conn.execute(
+        """UPDATE sos_alerts
+           SET repeat_count   = repeat_count + 1,
+               last_repeat_at = ?,
+               latitude       = COALESCE(?, latitude),
+               longitude      = COALESCE(?, longitude)
+           WHERE id = ? AND user = ?
+           RETURNING repeat_count, created_at""",
+        (now.iso, lat, lng, alert_id, user)
+    ).fetchone()
+    if row is None:
+        return None
+    if lat is not None and lng is not None:   # the index keeps the alert's original time
+        t = datetime.fromisoformat(row[1]).timestamp()
+        conn.execute("INSERT OR REPLACE INTO alerts_rtree VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (alert_id, lat, lat, lng, lng, t, t))
+    _bump_version(conn, user, now.iso)
+    return row[0]
+
+
+def _bump_rollups(conn, user, created_at, date_only, week):
+    conn.execute(
+        """INSERT INTO user_stats (user, total, first_alert, last_alert)
+           VALUES (?, 1, ?, ?)
+           ON CONFLICT(user) DO UPDATE SET
+               total      = total + 1,
+               last_alert = excluded.last_alert""",
+        (user, created_at, created_at)
+    )
+    conn.execute(
+        """INSERT INTO user_daily_counts (user, day, count) VALUES (?, ?, 1)
+           ON CONFLICT(user, day) DO UPDATE SET count = count + 1""",
+        (user, date_only)
+    )
+    conn.execute(
+        """INSERT INTO user_weekly_counts (user, week_start, count) VALUES (?, ?, 1)
+           ON CONFLICT(user, week_start) DO UPDATE SET count = count + 1""",
+        (user, week)
     )
-    conn.commit()
-    conn.close()
+    _bump_version(conn, user, created_at)
+
+
+def _bump_version(conn, user, changed_at):
+    conn.execute(
+        """INSERT INTO user_versions (user, version, changed_at) VALUES (?, 1, ?)
+           ON CONFLICT(user) DO UPDATE SET
+               version = version + 1, changed_at = excluded.changed_at""",
+        (user, changed_at)
+    )
+
+
+@timed
+def get_user_version(user):
+    """{"version": n, "changed_at": ISO timestamp or None} — one primary-key lookup."""
+    with connection(shard_for(user)) as conn:
+        row = conn.execute(
+            "SELECT version, changed_at FROM user_versions WHERE user = ?", (user,)
+        ).fetchone()
+    return {"version": row[0], "changed_at": row[1]} if row else {"version": 0, "changed_at": None}
+
+
+# API field name → sos_alerts column (projection whitelist for /logs)
+ALERT_FIELDS = {
+    "id":        "id",
+    "user":      "user",
+    "reason":    "reason",
+    "time":      "created_at",
+    "date":      "date_only",
+    "latitude":  "latitude",
+    "longitude": "longitude",
+    "repeats":   "repeat_count",
+}
+DEFAULT_ALERT_FIELDS = ("user", "reason", "time", "latitude", "longitude")
+# API field name → position in an archived alert row (archive.py layout)
+ARCHIVED_ALERT_FIELDS = {"id": 0, "reason": 1, "time": 2, "date": 3,
+                         "latitude": 5, "longitude": 6, "repeats": 7}
+
+
+@timed
+def fetch_alerts_page(user, before=None, limit=None, fields=None,
+                      date_from=None, date_to=None, conn=None):
+    """
+    Keyset-paginated alerts for a user, newest first.
+      before     — only alerts with id < before (cursor from the previous page)
+      limit      — page size (None = everything)
+      fields     — subset of ALERT_FIELDS to return
+      date_from / date_to — inclusive YYYY-MM-DD bounds
+      conn       — run on this connection (e.g. inside get_dashboard's snapshot)
+    Returns (rows, next_before); next_before is None on the last page.
+    """
+    fields = fields or DEFAULT_ALERT_FIELDS
+    cols   = ", ".join(f"{ALERT_FIELDS[f]} AS {f}" for f in fields)
+    where, params = ["user = ?"], [user]
+    if before is not None:
+        where.append("id < ?")
+        params.append(before)
+    if date_from:
+        where.append("date_only >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("date_only <= ?")
+        params.append(date_to)
+    sql = f"""SELECT id AS _cursor, {cols}
+              FROM sos_alerts
+              WHERE {" AND ".join(where)}
+              ORDER BY id DESC"""
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit + 1)   # one extra row tells us if there's a next page
+
+    if conn is None:
+        with connection(shard_for(user)) as conn:
+            rows = conn.execute(sql, params).fetchall()
+    else:
+        rows = conn.execute(sql, params).fetchall()
+
+    next_before = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_before = rows[-1]["_cursor"]
+    return [{f: r[f] for f in fields} for r in rows], next_before
+
+
+@timed
+def fetch_alerts_history(user, before=None, limit=None, fields=None, date_from=None, date_to=None):
+    """
+    fetch_alerts_page(), continued into the archive once the live rows run
+    out and `date_from` reaches past the archive horizon. Same return value;
+    next_before works across the boundary.
+    """
+    fields = list(fields or DEFAULT_ALERT_FIELDS)
+    want   = fields if "id" in fields else fields + ["id"]
+    rows, next_before = fetch_alerts_page(user, before, limit, want, date_from, date_to)
+    if next_before is None and _reaches_archive(date_from):
+        floor = min([r["id"] for r in rows] + ([before] if before is not None else []), default=None)
+        for _, row in archive.read(archive_dir(), "alerts", user, date_from, date_to, before=floor):
+            if limit is not None and len(rows) == limit:
+                next_before = rows[-1]["id"]
+                break
+            rows.append({f: row[ARCHIVED_ALERT_FIELDS[f]] if f != "user" else user for f in want})
+    if want is not fields:
+        for r in rows:
+            del r["id"]
+    return rows, next_before
 
 
 def fetch_alerts_for_user(user):
     """Return all alerts for a user, newest first."""
-    conn   = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """SELECT user, reason, created_at AS time, latitude, longitude
-           FROM sos_alerts
-           WHERE user = ?
-           ORDER BY id DESC""",
-        (user,)
-    )
-    rows = [dict(r) for r in cursor.fetchall()]
-    conn.close()
-    return rows
+    return fetch_alerts_page(user)[0]
 
 
 def fetch_alerts_by_date(user, date_str):
     """Return alerts for a specific date (YYYY-MM-DD)."""
-    conn   = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """SELECT user, reason, created_at AS time, latitude, longitude
-           FROM sos_alerts
-           WHERE user = ? AND date_only = ?
-           ORDER BY id DESC""",
-        (user, date_str)
-    )
-    rows = [dict(r) for r in cursor.fetchall()]
-    conn.close()
-    return rows
+    return fetch_alerts_page(user, date_from=date_str, date_to=date_str)[0]
+
+
+def iter_alerts(user=None, date_from=None, date_to=None, chunk=1000):
+    """
+    Stream alerts as tuples
+      (id, user, reason, created_at, date_only, time_only, latitude, longitude)
+    in keyset chunks: newest first for one user, oldest first for a bulk
+    (all-users) export. A pooled connection is only held while a chunk is
+    read, so a long export never pins a connection. A bulk export walks
+    every shard at once and merges the walks by created_at.
+    When date_from reaches past the archive horizon, archived rows follow
+    the live ones (one user) or precede them (bulk); id bounds keep a row
+    caught mid-rollover from appearing twice.
+    """
+    archived = _reaches_archive(date_from)
+    if user is None:
+        everywhere, seen = all_shards(), set()
+        if archived:
+            # an archived row at or above the lowest live id of its id range, on its
+            # owner's shard, may be mid-rollover (still live too)
+            count, floors = layout.refresh()[0], {}
+            for owner, row in archive.read(archive_dir(), "alerts", None, date_from, date_to,
+                                           newest_first=False):
+                shard, (start, end) = shards.owner(owner, count), shards.id_range(row[0])
+                if (shard, start) not in floors:
+                    with connection(shard) as conn:
+                        floors[shard, start] = conn.execute(
+                            "SELECT MIN(id) FROM sos_alerts WHERE id >= ? AND id < ?", (start, end)
+                        ).fetchone()[0]
+                floor = floors[shard, start]
+                if floor is not None and row[0] >= floor:
+                    seen.add(row[0])
+                yield (row[0], owner) + tuple(row[1:7])
+        walks = [_iter_live_alerts(None, date_from, date_to, chunk, shard) for shard in everywhere]
+        for r in heapq.merge(*walks, key=lambda r: r[3]):
+            if r[0] not in seen:
+                yield r
+        return
+    floor = None
+    for r in _iter_live_alerts(user, date_from, date_to, chunk):
+        floor = r[0]
+        yield r
+    if archived:
+        for _, row in archive.read(archive_dir(), "alerts", user, date_from, date_to, before=floor):
+            yield (row[0], user) + tuple(row[1:7])
+
+
+def _iter_live_alerts(user=None, date_from=None, date_to=None, chunk=1000, shard=None):
+    """iter_alerts() over one shard's sos_alerts only (default: the user's shard)."""
+    if shard is None:
+        shard = shard_for(user)
+    where, params = [], []
+    if user is not None:
+        where.append("user = ?")
+        params.append(user)
+    if date_from:
+        where.append("date_only >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("date_only <= ?")
+        params.append(date_to)
+    newest_first = user is not None
+    order  = "DESC" if newest_first else "ASC"
+    keyset = "id < ?" if newest_first else "id > ?"
+    cursor_id = None if newest_first else 0   # rowid range walk for bulk exports
+    while True:
+        clauses = where + ([keyset] if cursor_id is not None else [])
+        sql = f"""SELECT id, user, reason, created_at, date_only, time_only,
+                         latitude, longitude
+                  FROM sos_alerts
+                  {"WHERE " + " AND ".join(clauses) if clauses else ""}
+                  ORDER BY id {order} LIMIT ?"""
+        args = params + ([cursor_id] if cursor_id is not None else []) + [chunk]
+        with connection(shard) as conn:
+            rows = conn.execute(sql, args).fetchall()
+        if not rows:
+            return
+        for r in rows:
+            yield tuple(r)
+        if len(rows) < chunk:
+            return
+        cursor_id = rows[-1][0]
 
 
+@timed
 def count_alerts_today(user):
     """How many alerts has this user triggered today?"""
-    conn   = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT COUNT(*) FROM sos_alerts WHERE user = ? AND date_only = ?",
-        (user, now_date())
-    )
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    with connection(shard_for(user)) as conn:
+        cursor = conn.execute(
+            "SELECT COUNT(*) FROM sos_alerts WHERE user = ? AND date_only = ?",
+            (user, now_date())
+        )
+        return cursor.fetchone()[0]
+
+
+#  SPATIAL FUNCTIONS
+#  alerts_rtree narrows a query to the alerts whose (lat, lng, time) box can
+#  match; the exact time check runs in SQL, and so does the distance check
+#  where SQLite has its math functions (else it runs in Python, geo.py).
+#  Both query every shard and merge.
+@timed
+def nearby_alerts(lat, lng, radius_km, since=None, limit=100):
+    """
+    Alerts within `radius_km` of (lat, lng), optionally created at or after
+    `since` (aware datetime), nearest first, each with "distance_km".
+    """
+    where, tail = "", []
+    if since is not None:
+        where = "AND r.max_t >= ? AND a.created_at >= ?"
+        tail  = [since.timestamp(), since.isoformat()]
+    in_sql = _has_sql_math()
+    if in_sql:   # distance, radius, order and limit all applied inside SQLite
+        dist, head = geo.haversine_sql("a.latitude", "a.longitude"), geo.haversine_params(lat, lng)
+        where, tail = f"{where} AND distance_km <= ? ORDER BY distance_km LIMIT ?", [*tail, radius_km, limit]
+    else:
+        dist, head = "NULL", []
+    candidates = []
+    for shard in all_shards():
+        with connection(shard) as conn:
+            for min_lat, max_lat, min_lng, max_lng in geo.bounding_boxes(lat, lng, radius_km):
+                candidates += conn.execute(
+                    f"""SELECT a.id, a.user, a.reason, a.latitude, a.longitude, a.created_at,
+                               {dist} AS distance_km
+                        FROM alerts_rtree r CROSS JOIN sos_alerts a ON a.id = r.id
+                        WHERE r.max_lat >= ? AND r.min_lat <= ?
+                          AND r.max_lng >= ? AND r.min_lng <= ? {where}""",
+                    [*head, min_lat, max_lat, min_lng, max_lng, *tail]
+                ).fetchall()
+
+    if in_sql:
+        distances = [row["distance_km"] for row in candidates]
+    else:
+        distances = geo.haversine_km(lat, lng, [(row[3], row[4]) for row in candidates])
+    hits = sorted(((d, row) for d, row in zip(distances, candidates) if d <= radius_km),
+                  key=lambda hit: hit[0])
+    return [dict(row, distance_km=round(d, 3)) for d, row in hits[:limit]]
+
+
+_sql_math = None
+
+def _has_sql_math():
+    """Whether this SQLite build has its math functions (asin, radians, …); probed once."""
+    global _sql_math
+    if _sql_math is None:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("SELECT asin(radians(1))")
+            _sql_math = True
+        except sqlite3.OperationalError:
+            _sql_math = False
+        finally:
+            conn.close()
+    return _sql_math
+
+
+@timed
+def alert_hotspots(cell_km=1.0, since=None, bbox=None, limit=20):
+    """
+    Busiest grid cells (about cell_km × cell_km) by alert count.
+    bbox = (min_lat, min_lng, max_lat, max_lng) limits the area.
+    """
+    size  = geo.cell_degrees(cell_km)
+    where, params = [], [size, size]
+    if since is not None:
+        where  += ["r.max_t >= ?", "a.created_at >= ?"]
+        params += [since.timestamp(), since.isoformat()]
+    if bbox is not None:
+        min_lat, min_lng, max_lat, max_lng = bbox
+        where  += ["r.max_lat >= ?", "r.min_lat <= ?", "r.max_lng >= ?", "r.min_lng <= ?",
+                   "a.latitude BETWEEN ? AND ?", "a.longitude BETWEEN ? AND ?"]
+        params += [min_lat, max_lat, min_lng, max_lng, min_lat, max_lat, min_lng, max_lng]
+    everywhere = all_shards()
+    counts = {}
+    for shard in everywhere:
+        with connection(shard) as conn:
+            rows = conn.execute(
+                f"""SELECT CAST((a.latitude + 90) / ? AS INTEGER)   AS row,
+                           CAST((a.longitude + 180) / ? AS INTEGER) AS col,
+                           COUNT(*) AS count
+                    FROM alerts_rtree r CROSS JOIN sos_alerts a ON a.id = r.id
+                    {"WHERE " + " AND ".join(where) if where else ""}
+                    GROUP BY row, col ORDER BY count DESC LIMIT ?""",
+                params + [limit if len(everywhere) == 1 else -1]   # a cell may span shards
+            ).fetchall()
+        for row, col, count in rows:
+            counts[row, col] = counts.get((row, col), 0) + count
+    cells = []
+    for (row, col), count in heapq.nlargest(limit, counts.items(), key=lambda cell: cell[1]):
+        min_lat, min_lng, max_lat, max_lng = geo.cell_bounds(row, col, cell_km)
+        cells.append({
+            "count":     count,
+            "latitude":  round((min_lat + max_lat) / 2, 6),
+            "longitude": round((min_lng + max_lng) / 2, 6),
+            "bounds":    [round(v, 6) for v in (min_lat, min_lng, max_lat, max_lng)],
+        })
+    return cells
 
 
 #  CONTACT FUNCTIONS
-def add_contact(user, phone):
-    conn   = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
-            "INSERT INTO contacts (user, phone, added_on) VALUES (?, ?, ?)",
-            (user, phone, now_iso())
+#  get_contacts() reads through an LRU/TTL cache; add/delete invalidate the
+#  user's entry here and, through the bus, in every other worker.
+class SqliteInvalidationBus:
+    """
+    Shares invalidations between worker processes through the
+    cache_invalidations table: publish() appends a row, a poller thread
+    delivers rows written by anyone since it last looked.
+    """
+
+    RETENTION = 3600   # seconds of invalidation history kept
+
+    def __init__(self, channel, poll_interval=CACHE_BUS_POLL):
+        self.channel       = channel
+        self.poll_interval = poll_interval
+        self._subscribers  = []
+        self._last_seq     = None
+        self._thread       = None
+        self._published    = 0
+        self._own          = set()   # seqs we published and haven't polled past yet
+        self._own_lock     = threading.Lock()
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def start(self):
+        """Start the poller (called once the schema exists)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._poll_loop,
+                                            name=f"rakshanet-bus-{self.channel}", daemon=True)
+            self._thread.start()
+
+    def publish(self, key):
+        now = time.time()
+        with connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO cache_invalidations (channel, key, at) VALUES (?, ?, ?)",
+                (self.channel, key, now)
+            )
+            with self._own_lock:
+                self._own.add(cursor.lastrowid)
+            self._published += 1
+            if self._published % 100 == 0:
+                conn.execute("DELETE FROM cache_invalidations WHERE seq < "
+                             "(SELECT COALESCE(MIN(seq), 0) FROM cache_invalidations WHERE at >= ?)",
+                             (now - self.RETENTION,))
+
+    def poll(self):
+        """Deliver invalidations published since the last poll (any process)."""
+        with connection() as conn:
+            if self._last_seq is None:
+                self._last_seq = conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM cache_invalidations").fetchone()[0]
+                rows = []
+            else:
+                rows = conn.execute(
+                    """SELECT seq, key FROM cache_invalidations
+                       WHERE seq > ? AND channel = ? ORDER BY seq""",
+                    (self._last_seq, self.channel)
+                ).fetchall()
+        with self._own_lock:
+            own = {seq for seq, _ in rows if seq in self._own}
+            if rows:
+                self._last_seq = rows[-1][0]
+            # Seqs at or below the mark will never be read again (other channels,
+            # pruned rows, published before the first poll): forget them.
+            self._own = {seq for seq in self._own if seq > self._last_seq}
+        delivered = 0
+        for seq, key in rows:
+            if seq in own:
+                continue
+            for callback in self._subscribers:
+                callback(key)
+            delivered += 1
+        return delivered
+
+    def _poll_loop(self):
+        while True:
+            try:
+                self.poll()
+            except sqlite3.Error:
+                pass   # table not migrated yet / transient lock — retry next tick
+            time.sleep(self.poll_interval)
+
+
+@timed
+def _load_contacts(user):
+    with connection(shard_for(user)) as conn:
+        cursor = conn.execute(
+            "SELECT phone FROM contacts WHERE user = ? ORDER BY id",
+            (user,)
         )
-        conn.commit()
-    except sqlite3.IntegrityError:
-        pass   # duplicate — silently ignore
-    finally:
-        conn.close()
+        return tuple(r[0] for r in cursor.fetchall())
+
+
+contacts_cache = ReadThroughCache(
+    _load_contacts, CONTACTS_CACHE_SIZE, CONTACTS_CACHE_TTL,
+    bus=SqliteInvalidationBus("contacts") if CACHE_BUS == "sqlite" else LocalInvalidationBus(),
+)
+
+
+@timed
+def add_contact(user, phone):
+    if _user_write(user, _add_contact_tx, user, phone, now_iso()):
+        contacts_cache.invalidate(user)
+
+
+def _add_contact_tx(conn, user, phone, added_on):
+    return conn.execute(
+        """INSERT INTO contacts (user, phone, added_on) VALUES (?, ?, ?)
+           ON CONFLICT(user, phone) DO NOTHING""",   # duplicate — silently ignore
+        (user, phone, added_on)
+    ).rowcount > 0
 
 
 def get_contacts(user):
-    conn   = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT phone FROM contacts WHERE user = ? ORDER BY id",
-        (user,)
+    return list(contacts_cache.get(user))
+
+
+@timed
+def sync_contacts(user, contacts=None, add=(), remove=()):
+    """
+    Bulk-change a user's contacts in one transaction.
+      contacts — full list: the user ends up with exactly these numbers
+      add / remove — diff mode, applied on top of what is stored
+    Returns (resulting phone list, added count, removed count).
+    """
+    phones, added, removed = _user_write(user, _sync_contacts_tx, user, contacts, add, remove)
+    if added or removed:
+        contacts_cache.invalidate(user)
+    return phones, added, removed
+
+
+def _sync_contacts_tx(conn, user, contacts, add, remove):
+    conn.execute("BEGIN IMMEDIATE")
+    if contacts is not None:
+        current = {r[0] for r in conn.execute(
+            "SELECT phone FROM contacts WHERE user = ?", (user,))}
+        wanted  = dict.fromkeys(contacts)            # de-dupe, keep order
+        add     = [p for p in wanted if p not in current]
+        remove  = [p for p in current if p not in wanted]
+    before = conn.total_changes
+    conn.executemany(
+        """INSERT INTO contacts (user, phone, added_on) VALUES (?, ?, ?)
+           ON CONFLICT(user, phone) DO NOTHING""",
+        [(user, p, now_iso()) for p in dict.fromkeys(add)]
+    )
+    added = conn.total_changes - before
+    before = conn.total_changes
+    conn.executemany(
+        "DELETE FROM contacts WHERE user = ? AND phone = ?",
+        [(user, p) for p in dict.fromkeys(remove)]
     )
-    phones = [r[0] for r in cursor.fetchall()]
-    conn.close()
-    return phones
+    removed = conn.total_changes - before
+    phones = [r[0] for r in conn.execute(
+        "SELECT phone FROM contacts WHERE user = ? ORDER BY id", (user,))]
+    return phones, added, removed
 
 
+def bulk_load_contacts(rows, batch=50000):
+    """
+    Offline loader: insert (user, phone) pairs from any iterable, batch
+    rows per transaction (per shard), duplicates skipped. Returns rows inserted.
+    """
+    inserted, chunks = 0, {}
+    stamp = now_iso()
+
+    def flush(shard):
+        nonlocal inserted
+        with connection(shard) as conn:
+            before = conn.total_changes
+            conn.executemany(
+                """INSERT INTO contacts (user, phone, added_on) VALUES (?, ?, ?)
+                   ON CONFLICT(user, phone) DO NOTHING""",
+                chunks[shard]
+            )
+            inserted += conn.total_changes - before
+        chunks[shard].clear()
+
+    for user, phone in rows:
+        shard = shard_for(user)
+        chunk = chunks.setdefault(shard, [])
+        chunk.append((user, phone, stamp))
+        if len(chunk) >= batch:
+            flush(shard)
+    for shard, chunk in chunks.items():
+        if chunk:
+            flush(shard)
+    contacts_cache.invalidate_all()
+    return inserted
+
+
+@timed
 def delete_contact(user, phone):
-    conn   = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
+    if _user_write(user, _delete_contact_tx, user, phone):
+        contacts_cache.invalidate(user)
+
+
+def _delete_contact_tx(conn, user, phone):
+    return conn.execute(
         "DELETE FROM contacts WHERE user = ? AND phone = ?",
         (user, phone)
+    ).rowcount > 0
+
+
+#  LOCATION TRAIL FUNCTIONS
+@timed
+def append_locations(user, points, wait=True):
+    """
+    Append [(ts_ms, lat, lng)] to a user's trail through the group-commit
+    writer. Returns how many points were stored (or a Future if wait=False).
+    """
+    packed = sorted(trail.to_point(*p) for p in points)
+    future = _submit(user, _append_locations_tx, user, packed)
+    return future.result() if wait else future
+
+
+@timed
+def _append_locations_tx(conn, user, packed):
+    if not packed:
+        return 0
+    groups = {}
+    for point in packed:
+        groups.setdefault(trail.bucket_of(point[0]), []).append(point)
+
+    for bucket, pts in groups.items():
+        row = conn.execute(
+            """SELECT last_ts, last_lat, last_lng FROM location_trail
+               WHERE user = ? AND bucket = ?""",
+            (user, bucket)
+        ).fetchone()
+        tail = pts[-1]
+        if row is None:
+            start = (bucket * trail.TRAIL_BUCKET_SECONDS * 1000, 0, 0)
+            conn.execute(
+                """INSERT INTO location_trail
+                   (user, bucket, n, last_ts, last_lat, last_lng, points)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (user, bucket, len(pts), *tail, trail.encode(pts, start))
+            )
+        else:
+            conn.execute(
+                """UPDATE location_trail
+                   SET points = CAST(points || ? AS BLOB), n = n + ?,
+                       last_ts = ?, last_lat = ?, last_lng = ?
+                   WHERE user = ? AND bucket = ?""",
+                (trail.encode(pts, tuple(row)), len(pts), *tail, user, bucket)
+            )
+
+    ts, lat, lng = trail.from_point(packed[-1])
+    conn.execute(
+        """INSERT INTO last_positions (user, ts, latitude, longitude) VALUES (?, ?, ?, ?)
+           ON CONFLICT(user) DO UPDATE SET
+               ts = excluded.ts, latitude = excluded.latitude, longitude = excluded.longitude
+           WHERE excluded.ts >= last_positions.ts""",
+        (user, ts, lat, lng)
     )
-    conn.commit()
-    conn.close()
+    return len(packed)
+
+
+@timed
+def last_position(user):
+    """Latest known point: {"ts": epoch ms, "latitude": …, "longitude": …} or None."""
+    with connection(shard_for(user)) as conn:
+        row = conn.execute(
+            "SELECT ts, latitude, longitude FROM last_positions WHERE user = ?",
+            (user,)
+        ).fetchone()
+        return dict(row) if row else None
+
+
+def iter_trail(user, since_ms=None, until_ms=None):
+    """Yield (ts_ms, lat, lng) for a user's trail, oldest first, one bucket at a time."""
+    shard = shard_for(user)
+    where, params = ["user = ?"], [user]
+    if since_ms is not None:
+        where.append("bucket >= ?")
+        params.append(trail.bucket_of(since_ms))
+    if until_ms is not None:
+        where.append("bucket <= ?")
+        params.append(trail.bucket_of(until_ms))
+    last_bucket = None
+    while True:
+        clauses = where + (["bucket > ?"] if last_bucket is not None else [])
+        args = params + ([last_bucket] if last_bucket is not None else [])
+        with connection(shard) as conn:
+            rows = conn.execute(
+                f"""SELECT bucket, points FROM location_trail
+                    WHERE {" AND ".join(clauses)}
+                    ORDER BY bucket LIMIT 64""",
+                args
+            ).fetchall()
+        if not rows:
+            return
+        for bucket, blob in rows:
+            start = (bucket * trail.TRAIL_BUCKET_SECONDS * 1000, 0, 0)
+            for point in sorted(trail.decode(blob, start)):
+                if ((since_ms is None or point[0] >= since_ms) and
+                        (until_ms is None or point[0] <= until_ms)):
+                    yield trail.from_point(point)
+        last_bucket = rows[-1][0]
+
+
+def fetch_trail(user, since_ms=None, until_ms=None, limit=None):
+    points = []
+    for point in iter_trail(user, since_ms, until_ms):
+        points.append(point)
+        if limit is not None and len(points) >= limit:
+            break
+    return points
+
+
+#  TIMER FUNCTIONS
+#  Deadlines live in SQLite so a restart or a different worker process
+#  still sees them. Every "claim" deletes the row in the same statement,
+#  so exactly one process ever fires a given deadline. The expiry loop
+#  claims due timers on every shard.
+@timed
+def arm_timer(user, fires_at, minutes):
+    """Insert or replace the armed deadline for a user."""
+    _user_write(user, _arm_timer_tx, user, fires_at, minutes, now_iso())
+    bus.publish(user, "timer", {"state": "armed", "fires_at": fires_at, "minutes": minutes})
+
+
+def _arm_timer_tx(conn, user, fires_at, minutes, armed_at):
+    conn.execute(
+        """INSERT INTO timers (user, fires_at, minutes, armed_at)
+           VALUES (?, ?, ?, ?)
+           ON CONFLICT(user) DO UPDATE SET
+               fires_at = excluded.fires_at,
+               minutes  = excluded.minutes,
+               armed_at = excluded.armed_at""",
+        (user, fires_at, minutes, armed_at)
+    )
+
+
+@timed
+def cancel_timer(user):
+    """Disarm a user's timer. Returns True if one was armed."""
+    cancelled = _user_write(user, _claim_timer_tx, user, None)
+    if cancelled:
+        bus.publish(user, "timer", {"state": "cancelled"})
+    return cancelled
+
+
+@timed
+def claim_timer(user, fires_at):
+    """Atomically take ownership of one specific deadline (False if re-armed/cancelled/claimed)."""
+    claimed = _user_write(user, _claim_timer_tx, user, fires_at)
+    if claimed:
+        bus.publish(user, "timer", {"state": "fired", "fires_at": fires_at})
+    return claimed
+
+
+def _claim_timer_tx(conn, user, fires_at):
+    """Delete the user's timer (only if it is the `fires_at` one, unless None)."""
+    if fires_at is None:
+        return conn.execute("DELETE FROM timers WHERE user = ?", (user,)).rowcount > 0
+    return conn.execute(
+        "DELETE FROM timers WHERE user = ? AND fires_at = ?",
+        (user, fires_at)
+    ).rowcount > 0
+
+
+@timed
+def claim_due_timers(now, limit=500):
+    """Atomically take every deadline at or before `now` (up to `limit`); returns [(user, fires_at)]."""
+    due = []
+    for shard in all_shards():
+        if len(due) >= limit:
+            break
+        with connection(shard) as conn:
+            cursor = conn.execute(
+                """DELETE FROM timers
+                   WHERE user IN (SELECT user FROM timers
+                                  WHERE fires_at <= ?
+                                  ORDER BY fires_at LIMIT ?)
+                   RETURNING user, fires_at""",
+                (now, limit - len(due))
+            )
+            due += [(r[0], r[1]) for r in cursor.fetchall()]
+    for user, fires_at in due:
+        bus.publish(user, "timer", {"state": "fired", "fires_at": fires_at})
+    return due
+
+
+@timed
+def get_timer(user):
+    with connection(shard_for(user)) as conn:
+        row = conn.execute(
+            "SELECT user, fires_at, minutes, armed_at FROM timers WHERE user = ?",
+            (user,)
+        ).fetchone()
+        return dict(row) if row else None
+
+
+@timed
+def list_timers(limit=1000):
+    """Armed timers, soonest first."""
+    timers = []
+    for shard in all_shards():
+        with connection(shard) as conn:
+            cursor = conn.execute(
+                """SELECT user, fires_at, minutes, armed_at FROM timers
+                   ORDER BY fires_at LIMIT ?""",
+                (limit,)
+            )
+            timers += [dict(r) for r in cursor.fetchall()]
+    return heapq.nsmallest(limit, timers, key=lambda t: t["fires_at"])
+
+
+@timed
+def acquire_lease(name, owner, ttl, now):
+    """Take or renew a named lease. Returns True if `owner` holds it until now + ttl."""
+    with connection() as conn:
+        cursor = conn.execute(
+            """INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+               ON CONFLICT(name) DO UPDATE SET
+                   owner      = excluded.owner,
+                   expires_at = excluded.expires_at
+               WHERE leases.owner = excluded.owner OR leases.expires_at < ?""",
+            (name, owner, now + ttl, now)
+        )
+        return cursor.rowcount > 0
+
+
+#  DELIVERY FUNCTIONS
+#  A delivery is sent by whichever worker holds its claim. Rows are claimed
+#  atomically (one UPDATE … RETURNING), either at creation by the worker
+#  that fans out the alert or later by claim_deliveries(), which any worker
+#  may run: it takes unclaimed 'queued' rows and rows whose claim lapsed
+#  (the claiming process died mid-send or mid-backoff).
+@timed
+def create_deliveries(alert_id, user, message, targets, owner=None):
+    """
+    Record one delivery per (channel, recipient) in a single transaction,
+    already claimed by `owner` ('sending') or unclaimed ('queued') without
+    one. Returns the new delivery ids in the same order.
+    """
+    return _user_write(user, _create_deliveries_tx, alert_id, user, message, targets, owner,
+                       time.time(), now_iso())
+
+
+def _create_deliveries_tx(conn, alert_id, user, message, targets, owner, claimed_at, now):
+    status = "sending" if owner else "queued"
+    ids = []
+    for channel, recipient in targets:
+        cursor = conn.execute(
+            """INSERT INTO deliveries
+               (alert_id, user, channel, recipient, message, status, owner, claimed_at, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (alert_id, user, channel, recipient, message, status, owner,
+             claimed_at if owner else None, now)
+        )
+        ids.append(cursor.lastrowid)
+    return ids
+
+
+def _shards_by_id(row_id):
+    """The shard that issued `row_id` first, then the others (the row may have moved)."""
+    issuer = shards.issuer(row_id)
+    everywhere = all_shards()
+    return ([issuer] if issuer in everywhere else []) + [s for s in everywhere if s != issuer]
+
+
+@timed
+def update_delivery(delivery_id, status, attempts, error=None, hold=None):
+    """
+    Record an attempt's outcome. 'retrying' keeps the claim for `hold`
+    seconds of backoff (plus NOTIFY_CLAIM_TTL); final states drop it.
+    """
+    claimed_at = time.time() + hold if hold is not None else None
+    row = None
+    for shard in _shards_by_id(delivery_id):
+        with connection(shard) as conn:
+            row = conn.execute(
+                """UPDATE deliveries
+                   SET status = ?, attempts = ?, last_error = ?, claimed_at = ?, updated_at = ?
+                   WHERE id = ?
+                   RETURNING user, alert_id, channel, recipient""",
+                (status, attempts, error, claimed_at, now_iso(), delivery_id)
+            ).fetchone()
+        if row is not None:
+            break
+    if row is not None:
+        bus.publish(row["user"], "delivery", {
+            "alert_id": row["alert_id"], "channel": row["channel"],
+            "recipient": mask(row["recipient"]), "status": status, "attempts": attempts})
+
+
+@timed
+def get_deliveries(alert_id):
+    for shard in _shards_by_id(alert_id):
+        with connection(shard) as conn:
+            cursor = conn.execute(
+                """SELECT id, channel, recipient, status, attempts, last_error, updated_at
+                   FROM deliveries WHERE alert_id = ? ORDER BY id""",
+                (alert_id,)
+            )
+            rows = [dict(r) for r in cursor.fetchall()]
+        if rows:
+            return rows
+    return []
+
+
+@timed
+def claim_deliveries(owner, now, ttl, limit=1000):
+    """
+    Atomically claim up to `limit` deliveries for `owner`: unclaimed
+    'queued' rows and rows whose claim is older than `ttl` seconds.
+    Returns them as dicts, oldest id first.
+    """
+    claimed = []
+    for shard in all_shards():
+        if len(claimed) >= limit:
+            break
+        with connection(shard) as conn:
+            cursor = conn.execute(
+                """UPDATE deliveries SET status = 'sending', owner = ?, claimed_at = ?
+                   WHERE id IN (SELECT id FROM deliveries WHERE status = 'queued'
+                                UNION ALL
+                                SELECT id FROM deliveries
+                                WHERE status IN ('sending', 'retrying') AND claimed_at < ?
+                                LIMIT ?)
+                   RETURNING id, channel, recipient, message, attempts""",
+                (owner, now, now - ttl, limit - len(claimed))
+            )
+            claimed += [dict(r) for r in cursor.fetchall()]
+    return sorted(claimed, key=lambda d: d["id"])
+
+
+@timed
+def release_deliveries(ids):
+    """Hand claimed deliveries back ('queued', no owner) for any worker to claim."""
+    for delivery_id in ids:
+        for shard in _shards_by_id(delivery_id):
+            with connection(shard) as conn:
+                cursor = conn.execute(
+                    """UPDATE deliveries SET status = 'queued', owner = NULL, claimed_at = NULL
+                       WHERE id = ? AND status IN ('sending', 'retrying')""", (delivery_id,))
+            if cursor.rowcount:
+                break
 
 
 #  SESSION LOGGING  (datetime showcase)
-def log_session(user, event):
+@timed
+def log_session(user, event, wait=True, at=None):
     """
     Log a session event using multiple datetime features:
       - isoformat()   → storage
       - strftime()    → day name
       - isocalendar() → week number
+    (all read off one clock.Instant, `at` or now).
+    Goes through the group-commit writer; wait=False returns a Future.
     """
-    conn   = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
+    future = _submit(user, _log_session_tx, user, event, at or clock.now())
+    return future.result() if wait else future
+
+
+@timed
+def _log_session_tx(conn, user, event, now):
+    conn.execute(
         """INSERT INTO sessions (user, event, logged_at, day_name, week_num)
            VALUES (?, ?, ?, ?, ?)""",
-        (user, event, now_iso(), day_name(), week_number())
+        (user, event, now.iso, now.weekday, now.week)
     )
-    conn.commit()
-    conn.close()
 
 
+@timed
 def get_user_stats(user):
     """
-    Return a stats dict using datetime arithmetic:
+    Return a stats dict from the per-user rollups (one indexed lookup):
       - total alerts
       - alerts today
       - alerts this week
       - first alert ever
       - last alert
     """
-    conn   = get_connection()
-    cursor = conn.cursor()
+    with connection(shard_for(user)) as conn:
+        return _user_stats(conn, user, clock.now())
 
-    cursor.execute("SELECT COUNT(*) FROM sos_alerts WHERE user=?", (user,))
-    total = cursor.fetchone()[0]
 
-    cursor.execute(
-        "SELECT COUNT(*) FROM sos_alerts WHERE user=? AND date_only=?",
-        (user, now_date())
-    )
-    today = cursor.fetchone()[0]
+def _user_stats(conn, user, now):
+    row = conn.execute(
+        """SELECT s.total, s.first_alert, s.last_alert,
+                  (SELECT count FROM user_daily_counts
+                    WHERE user = s.user AND day = ?)        AS today,
+                  (SELECT count FROM user_weekly_counts
+                    WHERE user = s.user AND week_start = ?) AS this_week
+           FROM user_stats AS s
+           WHERE s.user = ?""",
+        (now.date, now.week_start, user)
+    ).fetchone()
 
-    cursor.execute(
-        "SELECT COUNT(*) FROM sos_alerts WHERE user=? AND date_only >= ?",
-        (user, now_ist().strftime("%Y-W%V"))   # week start
-    )
-    # simpler: filter by week_num would need join; use date range instead
-    week_start = now_ist().strftime("%Y-%m-") + str(now_ist().day - now_ist().weekday()).zfill(2)
-    cursor.execute(
-        "SELECT COUNT(*) FROM sos_alerts WHERE user=? AND date_only >= ?",
-        (user, week_start)
-    )
-    this_week = cursor.fetchone()[0]
+    return {
+        "total_alerts":  row["total"] if row else 0,
+        "alerts_today":  (row["today"] or 0) if row else 0,
+        "alerts_this_week": (row["this_week"] or 0) if row else 0,
+        "first_alert":   row["first_alert"] if row else None,
+        "last_alert":    row["last_alert"] if row else None,
+        "current_time":  now.display,
+        "current_day":   now.weekday,
+        "week_number":   now.week,
+    }
 
-    cursor.execute(
-        "SELECT created_at FROM sos_alerts WHERE user=? ORDER BY id ASC LIMIT 1",
-        (user,)
-    )
-    row = cursor.fetchone()
-    first_alert = row[0] if row else None
 
-    cursor.execute(
-        "SELECT created_at FROM sos_alerts WHERE user=? ORDER BY id DESC LIMIT 1",
-        (user,)
+@timed
+def get_dashboard(user, limit=100, fields=None):
+    """
+    Stats, version stamp and the latest `limit` alerts from one read
+    snapshot on one connection (the dashboard's single round trip).
+    """
+    with connection(shard_for(user)) as conn:
+        conn.execute("BEGIN")   # all three reads see the same commit
+        row = conn.execute(
+            "SELECT version, changed_at FROM user_versions WHERE user = ?", (user,)
+        ).fetchone()
+        stats = _user_stats(conn, user, clock.now())
+        alerts, next_before = fetch_alerts_page(user, limit=limit, fields=fields, conn=conn)
+    return {
+        "version":     row[0] if row else 0,
+        "changed_at":  row[1] if row else None,
+        "stats":       stats,
+        "alerts":      alerts,
+        "next_before": next_before,
+    }
+
+
+def rebuild_user_stats():
+    """
+    Recompute every rollup from sos_alerts (backfill / repair), shard by
+    shard, then add each user's archived alerts back into user_stats so a
+    rebuild after rollover keeps their total and first_alert.
+    """
+    created = ARCHIVED_ALERT_FIELDS["time"]
+    archived = archive.user_totals(archive_dir(), "alerts")
+    users = 0
+    for shard in all_shards():
+        with connection(shard) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql in _ROLLUP_REBUILD:
+                conn.execute(sql)
+            conn.executemany(
+                """INSERT INTO user_stats (user, total, first_alert, last_alert) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(user) DO UPDATE SET total       = total + excluded.total,
+                                                   first_alert = excluded.first_alert""",
+                [(user, rows, first[created], last[created])
+                 for user, (rows, first, last) in archived.items() if shard_for(user) == shard])
+            # rollups may have changed: invalidate every cached representation
+            conn.execute("UPDATE user_versions SET version = version + 1")
+            users += conn.execute("SELECT COUNT(*) FROM user_stats").fetchone()[0]
+    return users
+
+
+#  RETENTION / MAINTENANCE FUNCTIONS
+#  maintenance.py runs these on one elected worker, over every shard.
+#  Rollover copies a shard's oldest rows to the monthly archive
+#  (archive.py), raises the archive horizon, then deletes them in one
+#  writer transaction that also drops their R*Tree entries and deliveries
+#  and bumps the owners' version stamps (so cached ETags die).
+def archive_dir():
+    """Archive files live next to the database file."""
+    return os.path.join(os.path.dirname(os.path.abspath(DB_NAME)), ARCHIVE_DIR)
+
+
+@timed
+def get_state(key, default=None):
+    with connection() as conn:
+        row = conn.execute("SELECT value FROM maintenance_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_state_tx(conn, key, value):
+    conn.execute(
+        """INSERT INTO maintenance_state (key, value) VALUES (?, ?)
+           ON CONFLICT(key) DO UPDATE SET value = excluded.value""",
+        (key, str(value))
     )
-    row = cursor.fetchone()
-    last_alert = row[0] if row else None
 
-    conn.close()
 
-    return {
-        "total_alerts":  total,
-        "alerts_today":  today,
-        "alerts_this_week": this_week,
-        "first_alert":   first_alert,
-        "last_alert":    last_alert,
-        "current_time":  now_str(),
-        "current_day":   day_name(),
-        "week_number":   week_number(),
-    }
\ No newline at end of file
+@timed
+def set_state(key, value):
+    with connection() as conn:
+        _set_state_tx(conn, key, value)
+
+
+def archive_horizon(kind="alerts"):
+    """Every archived `kind` row is dated before this YYYY-MM-DD (None = nothing archived)."""
+    return get_state(f"{kind}_archived_before")
+
+
+def _reaches_archive(date_from, kind="alerts"):
+    if not date_from:
+        return False
+    horizon = archive_horizon(kind)
+    return horizon is not None and date_from < horizon
+
+
+ROLLOVER_TABLE = {"alerts": "sos_alerts", "sessions": "sessions"}
+ROLLOVER_SQL = {
+    "alerts":   """SELECT id, user, reason, created_at, date_only, time_only,
+                          latitude, longitude, repeat_count, last_repeat_at
+                   FROM sos_alerts WHERE id >= ? AND id < ? ORDER BY id LIMIT ?""",
+    "sessions": """SELECT id, user, event, logged_at, day_name, week_num
+                   FROM sessions WHERE id >= ? AND id < ? ORDER BY id LIMIT ?""",
+}
+
+
+@timed
+def roll_over(kind, cutoff, batch=ARCHIVE_BATCH):
+    """
+    Move up to `batch` of the oldest `kind` rows ("alerts" | "sessions")
+    dated before `cutoff` (YYYY-MM-DD) from each shard into the archive.
+    Returns how many moved; 0 means nothing is left to do (or a rebalance
+    is running: rollover waits for it). The walk goes up from the lowest id
+    and stops at the first row dated on/after the cutoff, so what moves is
+    always a contiguous id prefix. It is done per id range (shards.id_range):
+    rows a rebalance moved in keep the ids of the shard that issued them.
+    """
+    count, _, target = layout.refresh(force=True)
+    if target is not None:
+        return 0
+    return sum(_roll_over_shard(shard, kind, cutoff, batch) for shard in range(count))
+
+
+def _roll_over_shard(shard, kind, cutoff, batch):
+    moved, start = 0, 0
+    while True:
+        with connection(shard) as conn:
+            first = conn.execute(f"SELECT MIN(id) FROM {ROLLOVER_TABLE[kind]} WHERE id >= ?",
+                                 (start,)).fetchone()[0]
+        if first is None:
+            return moved
+        start, end = shards.id_range(first)
+        moved += _roll_over_range(shard, kind, cutoff, batch, start, end)
+        start = end
+
+
+def _roll_over_range(shard, kind, cutoff, batch, start, end):
+    with connection(shard) as conn:
+        rows = conn.execute(ROLLOVER_SQL[kind], (start, end, batch)).fetchall()
+    day   = archive.DAY_OF[kind] + 1   # + the user column
+    moved = []
+    for r in rows:
+        if r[day][:10] >= cutoff:
+            break
+        moved.append(r)
+    if not moved:
+        return 0
+
+    chunks = {}
+    for r in moved:
+        row = list(r)
+        user = row.pop(1)
+        chunks.setdefault((row[day - 1][:7], user), []).append(row)
+    archive.write(archive_dir(), kind, chunks)   # durable before anything is deleted
+    with connection() as conn:
+        _raise_horizon_tx(conn, kind, cutoff)
+
+    ids   = [r[0] for r in moved]
+    users = {user for _, user in chunks}
+    writer[shard].submit(_drop_archived_tx, kind, ids, users, cutoff, clock.now()).result()
+    return len(moved)
+
+
+def _raise_horizon_tx(conn, kind, cutoff):
+    key = f"{kind}_archived_before"
+    row = conn.execute("SELECT value FROM maintenance_state WHERE key = ?", (key,)).fetchone()
+    _set_state_tx(conn, key, max(cutoff, row[0]) if row else cutoff)
+
+
+def _drop_archived_tx(conn, kind, ids, users, cutoff, now):
+    if kind == "alerts":
+        conn.execute("DELETE FROM sos_alerts WHERE id BETWEEN ? AND ?", (ids[0], ids[-1]))
+        conn.executemany("DELETE FROM alerts_rtree WHERE id = ?", [(i,) for i in ids])
+        conn.executemany("DELETE FROM deliveries WHERE alert_id = ?", [(i,) for i in ids])
+        # user_stats keeps archived rows; day / week counts before the horizon go
+        conn.execute("DELETE FROM user_daily_counts WHERE day < ?", (cutoff,))
+        conn.execute("DELETE FROM user_weekly_counts WHERE week_start < date(?, 'weekday 0', '-6 days')",
+                     (cutoff,))
+        for user in users:
+            _bump_version(conn, user, now.iso)
+    else:
+        conn.execute("DELETE FROM sessions WHERE id BETWEEN ? AND ?", (ids[0], ids[-1]))
+
+
+@timed
+def checkpoint(mode="TRUNCATE"):
+    """Checkpoint every shard's WAL (TRUNCATE also shrinks the -wal files to zero)."""
+    out = {"busy": False, "wal_pages": 0, "checkpointed": 0}
+    for shard in all_shards():
+        with connection(shard) as conn:
+            busy, log, done = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        out["busy"] = out["busy"] or bool(busy)
+        out["wal_pages"]    += log
+        out["checkpointed"] += done
+    return out
+
+
+@timed
+def incremental_vacuum(pages=MAINT_VACUUM_PAGES):
+    """
+    Return up to `pages` free pages per shard to the OS. Returns pages
+    released, or None when the files aren't in auto_vacuum=INCREMENTAL
+    mode (databases created before it was enabled: run
+    `python database.py vacuum` once).
+    """
+    released = None
+    for shard in all_shards():
+        with connection(shard) as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                continue
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # executescript steps the pragma to completion; execute() frees one page
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+            released = (released or 0) + before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return released
+
+
+@timed
+def analyze():
+    """Refresh planner statistics (sampled, so it stays cheap on big tables)."""
+    for shard in all_shards():
+        with connection(shard) as conn:
+            conn.execute("PRAGMA analysis_limit=1000")
+            conn.execute("ANALYZE")
+
+
+def full_vacuum():
+    """Rewrite every shard file once, switching it to auto_vacuum=INCREMENTAL."""
+    for shard in all_shards():
+        conn = get_connection(shards.shard_path(DB_NAME, shard))
+        try:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+
+def file_stats():
+    """Sizes summed over every shard file (auto_vacuum is the home database's)."""
+    out = {"db_bytes": 0, "free_bytes": 0, "wal_bytes": 0}
+    for shard in reversed(all_shards()):
+        with connection(shard) as conn:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            pages     = conn.execute("PRAGMA page_count").fetchone()[0]
+            free      = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            mode      = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        wal = shards.shard_path(DB_NAME, shard) + "-wal"
+        out["db_bytes"]   += pages * page_size
+        out["free_bytes"] += free * page_size
+        out["wal_bytes"]  += os.path.getsize(wal) if os.path.exists(wal) else 0
+    out["auto_vacuum"] = ("none", "full", "incremental")[mode]
+    return out
+
+
+#  SHARD REBALANCING
+#  `python database.py rebalance M` re-spreads users over M shards while
+#  the service keeps running:
+#    1. start a new id generation on every shard, record target M, then wait
+#       until every process has re-read the layout (from then on they look
+#       users whose owner changes up in shard_moves)
+#       and add the write-mark triggers to every shard (_set_write_marks)
+#    2. move those users REBALANCE_BATCH at a time: list them in the old
+#       shard's moving_users, copy their rows to the new one from a read
+#       snapshot (writes carry on), then write-lock the old shard, copy again
+#       only the users written to since, record them in shard_moves, delete
+#       them and leave moved_users tombstones there (the write fence)
+#    3. record M shards, drop the write-mark triggers, wait again, forget
+#       shard_moves
+#  An interrupted rebalance is finished by running the same command again.
+#  Rows keep their ids, so alert ids, cursors and ETags stay valid.
+USER_TABLES = ("sos_alerts", "sessions", "contacts", "timers", "deliveries",
+               "user_stats", "user_daily_counts", "user_weekly_counts", "user_versions",
+               "location_trail", "last_positions")
+LOCAL_ID_TABLES = ("location_trail",)   # plain INTEGER PRIMARY KEY: ids only unique per shard
+
+
+def shard_users(shard):
+    """Every user with rows on a shard."""
+    with connection(shard) as conn:
+        return [r[0] for r in conn.execute(
+            """SELECT user FROM user_versions UNION SELECT user FROM sessions
+               UNION SELECT user FROM contacts UNION SELECT user FROM timers
+               UNION SELECT user FROM deliveries UNION SELECT user FROM last_positions""")]
+
+
+@timed
+def move_users(users, source, target):
+    """
+    Move every row of `users` from shard `source` to shard `target` (step 2;
+    needs the write marks rebalance() adds first). Returns rows copied.
+    """
+    moves = [(u, target) for u in users]
+    with connection() as home:
+        # already copied by an interrupted run (and maybe written to since): only the delete is left
+        done = {r[0] for u in users for r in home.execute(
+            "SELECT user FROM shard_moves WHERE user = ? AND shard = ?", (u, target))}
+    fresh = [u for u in users if u not in done]
+    with connection(source) as src:
+        src.executemany("INSERT OR REPLACE INTO moving_users (user, writes) VALUES (?, 0)",
+                        [(u,) for u in fresh])
+    with connection(source) as src:
+        src.execute("BEGIN")   # a read snapshot: `source` keeps taking writes during the bulk copy
+        seen = _write_marks(src, fresh)
+        with connection(target) as dst:
+            copied = _copy_users(src, dst, fresh)
+    with connection(source) as src:
+        src.execute("BEGIN IMMEDIATE")   # holds off writes to `source` until the tombstones commit
+        changed = [u for u, n in _write_marks(src, fresh).items() if n != seen[u]]
+        ids = [r[0] for u in users for r in src.execute(
+            "SELECT id FROM sos_alerts WHERE user = ?", (u,))]
+        with connection(target) as dst:
+            copied += _copy_users(src, dst, changed)
+            dst.executemany("DELETE FROM moved_users WHERE user = ?", [(u,) for u in users])
+            if target == 0:
+                dst.executemany("INSERT OR REPLACE INTO shard_moves (user, shard) VALUES (?, ?)", moves)
+        if source != 0 and target != 0:
+            with connection() as home:
+                home.executemany("INSERT OR REPLACE INTO shard_moves (user, shard) VALUES (?, ?)", moves)
+        elif source == 0:
+            src.executemany("INSERT OR REPLACE INTO shard_moves (user, shard) VALUES (?, ?)", moves)
+        src.executemany("DELETE FROM alerts_rtree WHERE id = ?", [(i,) for i in ids])
+        for table in USER_TABLES:
+            src.executemany(f"DELETE FROM {table} WHERE user = ?", [(u,) for u in users])
+        src.executemany("INSERT OR REPLACE INTO moved_users (user, shard) VALUES (?, ?)", moves)
+        src.executemany("DELETE FROM moving_users WHERE user = ?", [(u,) for u in users])
+    return copied
+
+
+def _set_write_marks(shard, on):
+    """
+    Add (or drop) the triggers that bump a moving_users row on any write to
+    that user's rows. They only exist while a rebalance runs, so normal
+    writes don't pay for them.
+    """
+    with connection(shard) as conn:
+        for table in USER_TABLES:
+            for op, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+                name = f"mark_{table}_{op.lower()}"
+                conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {name} AFTER {op} ON {table}
+                                 BEGIN UPDATE moving_users SET writes = writes + 1
+                                       WHERE user = {row}.user; END""" if on else
+                             f"DROP TRIGGER IF EXISTS {name}")
+
+
+def _write_marks(conn, users):
+    return {u: r[0] for u in users for r in conn.execute(
+        "SELECT writes FROM moving_users WHERE user = ?", (u,))}
+
+
+def _copy_users(src, dst, users):
+    """Replace `users`' rows on dst with their rows on src, in one dst transaction. Returns rows copied."""
+    if not users:
+        return 0
+    copied = 0
+    dst.execute("BEGIN IMMEDIATE")
+    # rows left on dst by an interrupted run, or that src has deleted since the last copy
+    dst.executemany("DELETE FROM alerts_rtree WHERE id IN (SELECT id FROM sos_alerts WHERE user = ?)",
+                    [(u,) for u in users])
+    for table in USER_TABLES:
+        dst.executemany(f"DELETE FROM {table} WHERE user = ?", [(u,) for u in users])
+        rows = [r for u in users for r in src.execute(f"SELECT * FROM {table} WHERE user = ?", (u,))]
+        if table in LOCAL_ID_TABLES:   # may clash with another user's row on dst: take a new id
+            rows = [(None, *r[1:]) for r in rows]
+        if rows:
+            marks = ", ".join("?" * len(rows[0]))
+            dst.executemany(f"INSERT INTO {table} VALUES ({marks})", rows)
+            copied += len(rows)
+    boxes = [r for u in users for r in src.execute(
+        """SELECT r.* FROM sos_alerts a CROSS JOIN alerts_rtree r ON r.id = a.id
+           WHERE a.user = ?""", (u,))]
+    dst.executemany("INSERT INTO alerts_rtree VALUES (?, ?, ?, ?, ?, ?, ?)", boxes)
+    return copied
+
+
+def rebalance(target, grace=None, batch=REBALANCE_BATCH):
+    """
+    Re-spread users over `target` shards (steps 1-3 above). `grace` is the
+    wait for other processes to pick up a layout change (default: two
+    SHARD_LAYOUT_POLL periods plus a second). Returns {(from, to): users moved}.
+    """
+    if not 1 <= target <= shards.MAX_SHARDS:
+        raise ValueError(f"shard count must be between 1 and {shards.MAX_SHARDS}")
+    grace = SHARD_LAYOUT_POLL * 2 + 1 if grace is None else grace
+    count, generation, moving_to = layout.refresh(force=True)
+    if moving_to is None:
+        if target == count:
+            return {}
+        generation += 1
+        for shard in range(max(count, target)):
+            with connection(shard) as conn:
+                if shard:
+                    migrate(conn, f"shard {shard}")
+                _seed_ids(conn, shards.id_base(generation, shard))
+        layout.store(count, generation, target)
+    elif moving_to != target:
+        raise RuntimeError(f"a rebalance to {moving_to} shards is still running; "
+                           f"finish it first (`python database.py rebalance {moving_to}`)")
+    time.sleep(grace)
+
+    for shard in range(max(count, target)):
+        _set_write_marks(shard, True)
+    moved = {}
+    for source in range(max(count, target)):
+        leaving = {}
+        for user in shard_users(source):
+            dest = shards.owner(user, target)
+            if dest != source:
+                leaving.setdefault(dest, []).append(user)
+        for dest, users in sorted(leaving.items()):
+            for i in range(0, len(users), batch):
+                move_users(users[i:i + batch], source, dest)
+            moved[source, dest] = len(users)
+    for shard in range(max(count, target)):
+        _set_write_marks(shard, False)
+
+    layout.store(target, generation)
+    time.sleep(grace)
+    with connection() as conn:
+        conn.execute("DELETE FROM shard_moves")
+    return moved
+
+
+def shard_stats():
+    """Layout plus users, alerts and file size per shard (scatter-gather)."""
+    count, generation, target = layout.refresh(force=True)
+    out = []
+    for shard in all_shards():
+        path = shards.shard_path(DB_NAME, shard)
+        with connection(shard) as conn:
+            users  = conn.execute("SELECT COUNT(*) FROM user_versions").fetchone()[0]
+            alerts = conn.execute("SELECT COUNT(*) FROM sos_alerts").fetchone()[0]
+        out.append({"shard": shard, "file": os.path.basename(path), "users": users, "alerts": alerts,
+                    "bytes": os.path.getsize(path) if os.path.exists(path) else 0})
+    return {"shards": count, "generation": generation, "target": target, "files": out}
+
+
+#  QUERY PLAN AUDIT
+#  Runs every query in this module against a scratch database, captures the
+#  SQL actually executed and checks EXPLAIN QUERY PLAN for full table scans.
+#  The scratch database has two shards, so the scatter-gather paths and a
+#  rebalance run too. Add new functions to _exercise_queries() so they are
+#  audited as well.
+def _exercise_queries():
+    user = "audit@rakshanet"
+    alert_id = insert_alert(user, "SOS button triggered", 19.07, 72.87)
+    record_event(user, "SOS button triggered", "sos")
+    coalesce_alert(alert_id, user, 19.08, 72.88)
+    fetch_alerts_for_user(user)
+    fetch_alerts_by_date(user, now_date())
+    fetch_alerts_page(user, before=alert_id + 1, limit=10, fields=["reason", "time"],
+                      date_from="2025-01-01", date_to=now_date())
+    list(iter_alerts(user, chunk=1))
+    list(iter_alerts(date_from="2025-01-01", date_to=now_date(), chunk=1))
+    count_alerts_today(user)
+    nearby_alerts(19.07, 72.87, 5)
+    nearby_alerts(19.07, 179.99, 5, since=now_ist() - timedelta(hours=1))
+    alert_hotspots()
+    alert_hotspots(0.5, since=now_ist() - timedelta(hours=1), bbox=(18.9, 72.7, 19.3, 73.1))
+    add_contact(user, "+910000000000")
+    get_contacts(user)
+    delete_contact(user, "+910000000000")
+    sync_contacts(user, contacts=["+911111111111"])
+    sync_contacts(user, add=["+912222222222"], remove=["+911111111111"])
+    bus = contacts_cache.bus
+    if isinstance(bus, SqliteInvalidationBus):
+        bus.poll()   # first poll only records the high-water mark
+        bus.poll()
+    append_locations(user, [(1_700_000_000_000, 19.07, 72.87), (1_700_000_001_000, 19.08, 72.88)])
+    append_locations(user, [(1_700_000_002_000, 19.09, 72.89)])
+    last_position(user)
+    fetch_trail(user, 1_699_999_000_000, 1_700_000_100_000)
+    arm_timer(user, 0.0, 1)
+    get_timer(user)
+    list_timers()
+    claim_timer(user, 0.0)
+    cancel_timer(user)
+    claim_due_timers(0.0)
+    acquire_lease("audit", user, 10, 0.0)
+    ids = create_deliveries(alert_id, user, "audit", [("sms", "+910000000000")])
+    claim_deliveries("audit", time.time(), 60)
+    release_deliveries(ids)
+    update_delivery(ids[0], "sent", 1)
+    get_deliveries(alert_id)
+    log_session(user, "audit")
+    get_user_stats(user)
+    get_user_version(user)
+    get_dashboard(user, limit=5)
+    roll_over("alerts", "9999-12-31")
+    roll_over("sessions", "9999-12-31")
+    fetch_alerts_history(user, limit=2, date_from="2025-01-01")
+    list(iter_alerts(user, date_from="2025-01-01"))
+    list(iter_alerts(date_from="2025-01-01"))
+    get_state("alerts_archived_before")
+    set_state("audit", 1)
+    checkpoint()
+    incremental_vacuum()
+    analyze()
+    file_stats()
+    shard_for(user)
+    pool_stats()
+    insert_alert("audit2@rakshanet", "SOS button triggered", 19.07, 72.87)
+    rebalance(1, grace=0)
+    shard_stats()
+
+
+def _plan_problems(plan):
+    """Plan lines that read a whole table instead of an index (sqlite_sequence: a row per table)."""
+    return [d for d in plan
+            if d.startswith("SCAN ") and "INDEX" not in d and "CONSTANT ROW" not in d
+            and "sqlite_sequence" not in d]
+
+
+def _explain(conn, statements, seen):
+    results = []
+    for sql in statements:
+        head = sql.lstrip().split(None, 1)[0].upper()
+        if head not in ("SELECT", "UPDATE", "DELETE") or sql in seen:
+            continue
+        seen.add(sql)
+        plan = [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+        results.append((" ".join(sql.split()), plan, not _plan_problems(plan)))
+    return results
+
+
+def audit_query_plans():
+    """
+    Returns [(sql, [plan lines], ok)] for every distinct statement the
+    module (and archive.py) issues. ok is False when SQLite would scan a
+    table. A @timed function that _exercise_queries() never called is
+    reported as a failed entry too, so a new query can't skip the audit.
+    """
+    import tempfile
+    global DB_NAME, _sql_trace, _audit_calls
+    saved = DB_NAME
+    with tempfile.TemporaryDirectory() as tmp:
+        DB_NAME = os.path.join(tmp, "audit.db")
+        try:
+            statements, archived = [], []
+            _sql_trace    = statements.append   # every connection opened from here on
+            archive.TRACE = archived.append
+            _audit_calls  = set()
+            close_pool()
+            open_shards(default=2)
+            _exercise_queries()
+            writer.flush()
+            called = _audit_calls
+            _sql_trace = archive.TRACE = _audit_calls = None
+
+            seen = {sql for _, _, steps in MIGRATIONS for sql in steps}   # one-off backfills
+            with connection() as conn:
+                conn.set_trace_callback(None)
+                results = _explain(conn, statements, seen)
+            for month in archive.months(archive_dir())[:1]:
+                conn = sqlite3.connect(archive.month_path(archive_dir(), month))
+                try:
+                    results += _explain(conn, archived, seen)
+                finally:
+                    conn.close()
+            results += [(f"{name}() — not called by _exercise_queries()", [], False)
+                        for name in sorted(QUERY_FUNCTIONS - called)]
+            return results
+        finally:
+            _sql_trace = archive.TRACE = _audit_calls = None
+            close_pool()
+            DB_NAME = saved
+
+
+if __name__ == "__main__":
+    import argparse, sys
+
+    parser = argparse.ArgumentParser(description="RakshaNet database tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="apply pending schema migrations")
+    sub.add_parser("audit-plans", help="fail if any query in this module scans a table")
+    sub.add_parser("rebuild-stats", help="backfill per-user rollups from sos_alerts")
+    sub.add_parser("vacuum", help="rewrite the file once and switch it to incremental vacuum")
+    sub.add_parser("shards", help="show the shard layout and users / alerts per shard")
+    reb = sub.add_parser("rebalance", help="re-spread users over N shard files, online")
+    reb.add_argument("shards", type=int)
+    reb.add_argument("--grace", type=float, default=None,
+                     help="seconds to wait for other processes to see a layout change")
+    imp = sub.add_parser("import-contacts", help="bulk-load contacts from a user,phone CSV")
+    imp.add_argument("csv_file")
+    imp.add_argument("--batch", type=int, default=50000, help="rows per transaction")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        create_table()
+    elif args.command == "rebuild-stats":
+        create_table()
+        print(f"✅ Rebuilt stats for {rebuild_user_stats()} users")
+    elif args.command == "vacuum":
+        create_table()
+        before = file_stats()
+        close_pool()
+        full_vacuum()
+        after = file_stats()
+        print(f"✅ Vacuumed: {before['db_bytes']:,} → {after['db_bytes']:,} bytes, "
+              f"auto_vacuum={after['auto_vacuum']}")
+    elif args.command == "shards":
+        create_table()
+        print(json.dumps(shard_stats(), indent=2))
+    elif args.command == "rebalance":
+        create_table()
+        started = time.perf_counter()
+        before  = len(all_shards())
+        moved   = rebalance(args.shards, args.grace)
+        for (source, dest), n in sorted(moved.items()):
+            print(f"  shard {source} → {dest}: {n:,} users")
+        print(f"✅ Rebalanced to {args.shards} shard(s): {sum(moved.values()):,} users moved "
+              f"in {time.perf_counter() - started:.1f}s")
+        if before > args.shards:
+            print(f"   shards {args.shards}…{before - 1} are empty now; their files can be deleted")
+    elif args.command == "import-contacts":
+        import csv
+        create_table()
+        started = time.perf_counter()
+        with open(args.csv_file, newline="", encoding="utf-8") as f:
+            rows = ((r[0].strip(), r[1].strip()) for r in csv.reader(f)
+                    if len(r) >= 2 and r[0].strip() and r[0].strip().lower() != "user")
+            count = bulk_load_contacts(rows, batch=args.batch)
+        print(f"✅ Imported {count:,} contacts in {time.perf_counter() - started:.1f}s")
+    elif args.command == "audit-plans":
+        failed = 0
+        for sql, plan, ok in audit_query_plans():
+            print(("✅ " if ok else "❌ ") + sql)
+            for line in plan:
+                print("     " + line)
+            failed += not ok
+        sys.exit(1 if failed else 0)
@@ -0,0 +1,172 @@
+"""
+events.py — RakshaNet
+Uses: threading + asyncio + collections (standard library)
+
+In-process pub/sub for live per-user status, served as Server-Sent Events
+on /stream/<user_id>.
+
+  bus.publish(user, type, data)    — from any thread (writer, timers, notifier)
+  bus.subscribe(user, loop=None)   — one Subscription per open stream
+
+database.py publishes after each commit: "alert" (insert_alert), "timer"
+(armed / cancelled / fired) and "delivery" (notification status).
+
+Under the ASGI server a stream is a coroutine waiting on an asyncio.Event,
+so an idle connection costs a few KB instead of a thread; publish() wakes
+every subscriber on a loop with a single call_soon_threadsafe. The Flask
+dev server falls back to one blocking generator (thread) per stream.
+
+Events live in this process only: with several worker processes, a
+stream sees the writes handled by its own process.
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+from config import SSE_QUEUE_SIZE, SSE_REPLAY, SSE_REPLAY_USERS, SSE_MAX_CLIENTS
+
+
+class Subscription:
+    """A bounded per-connection event queue; the oldest events drop when a client lags."""
+
+    def __init__(self, user, loop=None, maxlen=SSE_QUEUE_SIZE):
+        self.user    = user
+        self.loop    = loop
+        self.events  = deque(maxlen=maxlen)
+        self.dropped = 0
+        self.closed  = False
+        self._cond   = threading.Condition() if loop is None else None
+        self._ready  = asyncio.Event() if loop is not None else None
+
+    def _push(self, event):
+        """Publisher side (any thread for thread subscribers; loop thread for async ones)."""
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(event)
+        if self._cond is not None:
+            with self._cond:
+                self._cond.notify()
+        else:
+            self._ready.set()
+
+    def _drain(self):
+        batch = []
+        while self.events:
+            batch.append(self.events.popleft())
+        return batch
+
+    def get(self, timeout):
+        """Thread subscribers: wait up to `timeout` s, return the pending events (maybe [])."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.events, timeout)
+            return self._drain()
+
+    async def aget(self, timeout):
+        """Async subscribers: same as get() without blocking a thread."""
+        if not self.events:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._ready.clear()
+        return self._drain()
+
+
+class EventBus:
+
+    def __init__(self, replay=SSE_REPLAY, replay_users=SSE_REPLAY_USERS, max_clients=SSE_MAX_CLIENTS):
+        self.replay       = replay
+        self.replay_users = replay_users
+        self.max_clients  = max_clients
+        self._subs   = {}             # user → {Subscription}
+        self._recent = OrderedDict()  # user → deque of recent events (Last-Event-ID replay)
+        self._seq    = itertools.count(int(time.time() * 1000))   # ids keep rising across restarts
+        self._lock   = threading.Lock()
+        self.clients = 0
+        self.stats   = {"published": 0, "delivered": 0}
+
+    def subscribe(self, user, loop=None, last_event_id=None):
+        """
+        Open a stream for `user`. Events newer than `last_event_id` still in
+        the replay buffer are queued first. Returns None at max_clients.
+        """
+        sub = Subscription(user, loop)
+        with self._lock:
+            if self.clients >= self.max_clients:
+                return None
+            self.clients += 1
+            self._subs.setdefault(user, set()).add(sub)
+            if last_event_id is not None:
+                for event in self._recent.get(user, ()):
+                    if event[0] > last_event_id:
+                        sub.events.append(event)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subs.get(sub.user)
+            if subs is not None and sub in subs:
+                subs.discard(sub)
+                self.clients -= 1
+                if not subs:
+                    del self._subs[sub.user]
+        sub.closed = True
+
+    def publish(self, user, type, data):
+        """Queue an event for every open stream of `user`. Never blocks on clients."""
+        event = (next(self._seq), type, json.dumps(data, default=str))
+        with self._lock:
+            recent = self._recent.get(user)
+            if recent is None:
+                recent = self._recent[user] = deque(maxlen=self.replay)
+                if len(self._recent) > self.replay_users:
+                    self._recent.popitem(last=False)
+            else:
+                self._recent.move_to_end(user)
+            recent.append(event)
+            subs = list(self._subs.get(user, ()))
+            self.stats["published"] += 1
+            self.stats["delivered"] += len(subs)
+
+        by_loop = {}
+        for sub in subs:
+            if sub.loop is None:
+                sub._push(event)
+            else:
+                by_loop.setdefault(sub.loop, []).append(sub)
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_push_all, group, event)
+            except RuntimeError:
+                pass   # loop already closed (server shutting down)
+        return event[0]
+
+    def subscribers(self, user):
+        with self._lock:
+            return len(self._subs.get(user, ()))
+
+
+def _push_all(subs, event):
+    for sub in subs:
+        if not sub.closed:
+            sub._push(event)
+
+
+def sse_format(event):
+    seq, type, data = event
+    return f"id: {seq}\nevent: {type}\ndata: {data}\n\n"
+
+
+def mask(recipient):
+    """Hide most of an email / phone number in events other people may watch."""
+    if "@" in recipient:
+        name, _, domain = recipient.partition("@")
+        return f"{name[:1]}***@{domain}"
+    return "***" + recipient[-4:]
+
+
+bus = EventBus()
@@ -0,0 +1,92 @@
+"""
+geo.py — RakshaNet
+Uses: math (standard library)
+
+Geometry helpers for the spatial alert queries in database.py.
+
+  bounding_boxes(lat, lng, km) — (lat, lng) ranges covering a circle; the
+                                 R*Tree prefilter (split at ±180°)
+  haversine_sql(lat_col, lng_col)
+                               — the same distance as a SQL expression, so the
+                                 refinement runs inside SQLite over every
+                                 R*Tree candidate (needs its math functions)
+  haversine_km(lat, lng, pts)  — the same in Python, for SQLite builds
+                                 without math functions
+  cell_bounds(row, col, km)    — corners of a hotspot grid cell (rows and
+                                 columns are counted in SQL, ~km × km cells)
+"""
+
+from math import asin, cos, radians, sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE   = 111.195      # one degree of latitude (and of longitude at the equator)
+
+
+def bounding_boxes(lat, lng, km):
+    """
+    [(min_lat, max_lat, min_lng, max_lng), …] that together contain every
+    point within `km` of (lat, lng). Two boxes when the circle crosses the
+    antimeridian, one box spanning all longitudes near the poles.
+    """
+    dlat    = km / KM_PER_DEGREE
+    min_lat = max(-90.0, lat - dlat)
+    max_lat = min(90.0, lat + dlat)
+    # widest parallel inside the box decides how far longitude must reach
+    widest  = max(abs(min_lat), abs(max_lat))
+    if widest >= 89.9:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    dlng = km / (KM_PER_DEGREE * cos(radians(widest)))
+    if dlng >= 180:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    lo, hi = lng - dlng, lng + dlng
+    if lo < -180:
+        return [(min_lat, max_lat, lo + 360, 180.0), (min_lat, max_lat, -180.0, hi)]
+    if hi > 180:
+        return [(min_lat, max_lat, lo, 180.0), (min_lat, max_lat, -180.0, hi - 360)]
+    return [(min_lat, max_lat, lo, hi)]
+
+
+def haversine_sql(lat_col, lng_col):
+    """
+    SQL for the distance in km from an origin to (lat_col, lng_col). Binds,
+    in order, the values from haversine_params(). SQLite evaluates it in C
+    for each R*Tree candidate, so only the rows inside the radius (sorted
+    and limited) come back to Python.
+    """
+    return (f"2 * {EARTH_RADIUS_KM} * asin(sqrt(min(1.0,"
+            f" (1 - cos(radians({lat_col}) - ?)) / 2"
+            f" + ? * cos(radians({lat_col})) * (1 - cos(radians({lng_col}) - ?)) / 2)))")
+
+
+def haversine_params(lat, lng):
+    lat0 = radians(lat)
+    return [lat0, cos(lat0), radians(lng)]
+
+
+def haversine_km(lat, lng, points):
+    """
+    Distances in km from (lat, lng) to each (lat, lng) in `points`.
+    The origin's radians and cosine are computed once, so the per-point
+    cost is a handful of float ops. nearby_alerts() uses it only when
+    SQLite lacks math functions; haversine_sql() is the same formula.
+    """
+    lat0, lng0 = radians(lat), radians(lng)
+    cos0       = cos(lat0)
+    out        = []
+    append     = out.append
+    for plat, plng in points:
+        p1, l1 = radians(plat), radians(plng)
+        a = (1 - cos(p1 - lat0)) / 2 + cos0 * cos(p1) * (1 - cos(l1 - lng0)) / 2
+        append(2 * EARTH_RADIUS_KM * asin(sqrt(min(1.0, a))))
+    return out
+
+
+def cell_degrees(km):
+    return km / KM_PER_DEGREE
+
+
+def cell_bounds(row, col, km):
+    """(min_lat, min_lng, max_lat, max_lng) of the grid cell at (row, col)."""
+    size = cell_degrees(km)
+    min_lat, min_lng = row * size - 90, col * size - 180
+    return min_lat, min_lng, min_lat + size, min_lng + size
@@ -0,0 +1,154 @@
+"""
+maintenance.py — RakshaNet
+Uses: threading (standard library)
+
+Background upkeep for alerts.db, run by one elected worker (a lease in the
+`leases` table, like the timer expiry loop):
+
+  rollover    — alerts older than ALERT_RETENTION_DAYS and sessions older
+                than SESSION_RETENTION_DAYS move to monthly archive files
+                (archive.py), ARCHIVE_BATCH rows per transaction; a kind
+                whose retention is None (the default) is never rolled over
+  vacuum      — PRAGMA incremental_vacuum: hand the pages rollover freed
+                back to the OS
+  analyze     — refresh planner statistics (ANALYZE with analysis_limit)
+  checkpoint  — PRAGMA wal_checkpoint(TRUNCATE), so alerts.db-wal shrinks
+                back instead of staying at its high-water mark
+
+Each task has its own period; run by hand with `python maintenance.py [task …]`
+or POST /admin/maintenance. Last-run times are kept in the
+maintenance_state table, so a restart or a new leader picks up the
+schedule instead of re-running everything.
+"""
+
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+import clock
+import database
+import metrics
+from config import (ALERT_RETENTION_DAYS, SESSION_RETENTION_DAYS, MAINT_POLL_INTERVAL,
+                    MAINT_ROLLOVER_EVERY, MAINT_ROLLOVER_BUDGET, MAINT_CHECKPOINT_EVERY,
+                    MAINT_VACUUM_EVERY, MAINT_ANALYZE_EVERY)
+
+MAINT_SECONDS = metrics.histogram("maintenance_seconds", "Duration of one maintenance task run",
+                                  ["task"])
+ARCHIVED_ROWS = metrics.counter("archived_rows_total", "Rows rolled over to the archive", ["kind"])
+
+RETENTION = {"alerts": ALERT_RETENTION_DAYS, "sessions": SESSION_RETENTION_DAYS}
+
+
+class Maintenance:
+
+    LEASE = "maintenance"
+    TASKS = ("rollover", "vacuum", "analyze", "checkpoint")   # run order; checkpoint goes last
+
+    def __init__(self, poll_interval=MAINT_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.periods = {"rollover": MAINT_ROLLOVER_EVERY, "checkpoint": MAINT_CHECKPOINT_EVERY,
+                        "vacuum": MAINT_VACUUM_EVERY, "analyze": MAINT_ANALYZE_EVERY}
+        self.owner   = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.leader  = False
+        self.results = {}                 # task → last result, for status()
+        self._run_lock = threading.Lock()  # loop and /admin/maintenance never overlap
+        self._stop     = threading.Event()
+        self._thread   = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="rakshanet-maintenance", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def due(self, now=None):
+        now = now or time.time()
+        return [task for task in self.TASKS
+                if now - float(database.get_state(f"last_{task}", 0)) >= self.periods[task]]
+
+    def run(self, tasks=None):
+        """Run `tasks` (default: every task) now, in TASKS order. Returns {task: result}."""
+        out = {}
+        with self._run_lock:
+            for task in self.TASKS:
+                if tasks is not None and task not in tasks:
+                    continue
+                started = time.perf_counter()
+                try:
+                    out[task] = getattr(self, task)()
+                except Exception as e:
+                    out[task] = {"error": str(e)}
+                    print(f"❌ Maintenance {task} failed:", e)
+                MAINT_SECONDS.observe(time.perf_counter() - started, task)
+                database.set_state(f"last_{task}", time.time())
+                self.results[task] = {"at": clock.now().iso, "result": out[task],
+                                      "seconds": round(time.perf_counter() - started, 3)}
+        return out
+
+    def rollover(self, budget=MAINT_ROLLOVER_BUDGET):
+        today    = clock.now().dt.date()
+        deadline = time.monotonic() + budget
+        moved    = {}
+        for kind, days in RETENTION.items():
+            if days is None:
+                continue
+            cutoff = (today - timedelta(days=days)).isoformat()
+            moved[kind] = 0
+            while time.monotonic() < deadline:
+                n = database.roll_over(kind, cutoff)
+                if not n:
+                    break
+                moved[kind] += n
+                ARCHIVED_ROWS.inc(kind, amount=n)
+        if any(moved.values()):
+            print(f"🛠  Archived {', '.join(f'{n:,} {k}' for k, n in moved.items())}")
+        return moved
+
+    def checkpoint(self):
+        return database.checkpoint("TRUNCATE")
+
+    def vacuum(self):
+        return {"pages_released": database.incremental_vacuum()}
+
+    def analyze(self):
+        database.analyze()
+        return "ok"
+
+    def status(self):
+        return {"leader": self.leader, "owner": self.owner, "tasks": self.results,
+                "due": self.due(), "files": database.file_stats(),
+                "archive_horizon": {kind: database.archive_horizon(kind) for kind in RETENTION}}
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                ttl = self.poll_interval * 3 + MAINT_ROLLOVER_BUDGET
+                self.leader = database.acquire_lease(self.LEASE, self.owner, ttl, time.time())
+                if self.leader:
+                    due = self.due()
+                    if due:
+                        self.run(due)
+            except Exception as e:
+                print("❌ Maintenance loop failed:", e)
+            self._stop.wait(self.poll_interval)
+
+
+if __name__ == "__main__":
+    import sys
+
+    database.create_table()
+    tasks = sys.argv[1:] or list(Maintenance.TASKS)
+    unknown = [t for t in tasks if t not in Maintenance.TASKS]
+    if unknown:
+        sys.exit(f"unknown task(s) {', '.join(unknown)}; choose from {', '.join(Maintenance.TASKS)}")
+    for task, result in Maintenance().run(tasks).items():
+        print(f"✅ {task}: {result}")
+    database.writer.flush()
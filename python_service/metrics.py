@@ -0,0 +1,251 @@
+"""
+metrics.py — RakshaNet
+Uses: threading + sys._current_frames (standard library)
+
+In-process metrics in the Prometheus text format, cheap enough to leave
+on in production: an observation is one bisect and a few additions under
+a per-metric lock, and gauges are only computed when /metrics is scraped.
+
+  counter(name, help, labels)          → .inc(*label_values, amount=1)
+  histogram(name, help, labels)        → .observe(seconds, *label_values)
+  gauge(name, help, fn, labels)        → fn() returns a number or {labels: value}
+  timed(hist, *label_values)           — decorator timing every call
+  render()                             — the /metrics payload
+
+profiler is a sampling profiler that can be started and stopped at
+runtime. It snapshots every thread's stack PROFILER_INTERVAL_MS apart
+and aggregates them as folded stacks (flamegraph.pl / speedscope input).
+"""
+
+import collections
+import functools
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+from config import METRICS_ENABLED, PROFILER_INTERVAL_MS
+
+PREFIX = "rakshanet_"
+
+# seconds; spans a cached read (~100 µs) to a slow SMTP send (10 s)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_names    = {}
+
+
+def _fmt_labels(names, values, extra=()):
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _register(metric):
+    existing = _names.get(metric.name)
+    if existing is not None:
+        return existing   # re-import (e.g. test reloads) keeps one series
+    _registry.append(metric)
+    _names[metric.name] = metric
+    return metric
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = PREFIX + name, help, tuple(labels)
+        self._values = {}
+        self._lock   = threading.Lock()
+
+    def inc(self, *values, amount=1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_fmt_labels(self.labels, k)} {v}" for k, v in items]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = PREFIX + name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._le     = [f'le="{b}"' for b in self.buckets] + ['le="+Inf"']
+        self._series = {}          # label values → [bucket counts…, +Inf count, sum]
+        self._lock   = threading.Lock()
+
+    def observe(self, value, *values):
+        if not METRICS_ENABLED:
+            return
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def time(self, *values):
+        return _Timer(self, values)
+
+    def samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        lines = []
+        for key, series in items:
+            running = 0
+            for le, count in zip(self._le, series):
+                running += count
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, [le])} {running}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labels, key)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labels, key)} {running}")
+        return lines
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help, fn, labels=()):
+        self.name, self.help, self.labels = PREFIX + name, help, tuple(labels)
+        self.fn = fn
+
+    def samples(self):
+        try:
+            value = self.fn()
+        except Exception as e:
+            return [f"# {self.name} unavailable: {e}"]
+        if isinstance(value, dict):
+            return [f"{self.name}{_fmt_labels(self.labels, k if isinstance(k, tuple) else (k,))} {v}"
+                    for k, v in value.items()]
+        return [f"{self.name} {value}"]
+
+
+class _Timer:
+    __slots__ = ("hist", "values", "start")
+
+    def __init__(self, hist, values):
+        self.hist, self.values = hist, values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start, *self.values)
+
+
+def counter(name, help, labels=()):
+    return _register(Counter(name, help, labels))
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, help, labels, buckets))
+
+
+def gauge(name, help, fn, labels=()):
+    metric = _register(Gauge(name, help, fn, labels))
+    metric.fn = fn   # latest callback wins (app reloads rebind their objects)
+    return metric
+
+
+def timed(hist, *values):
+    """Decorator: observe the wall time of every call of the function."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - start, *values)
+        return inner
+    return wrap
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+#  SAMPLING PROFILER
+# Leaf frames of threads parked on a queue/condition/socket; skipped so the
+# profile shows work, not the idle worker pools.
+IDLE_FRAMES = {("threading.py", "wait"), ("queue.py", "get"), ("selectors.py", "select"),
+               ("socket.py", "accept"), ("threading.py", "_wait_for_tstate_lock"),
+               ("thread.py", "_worker")}
+
+
+class SamplingProfiler:
+    """Off by default; start()/stop() at runtime, read folded() while running or after."""
+
+    def __init__(self, interval_ms=PROFILER_INTERVAL_MS, max_depth=64):
+        self.interval  = interval_ms / 1000
+        self.max_depth = max_depth
+        self.stacks    = collections.Counter()
+        self.samples   = 0
+        self.started   = None
+        self._stop     = threading.Event()
+        self._thread   = None
+        self._lock     = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, reset=True):
+        with self._lock:
+            if self.running:
+                return False
+            if reset:
+                self.stacks, self.samples = collections.Counter(), 0
+            self.started = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="rakshanet-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        with self._lock:
+            if not self.running:
+                return False
+            self._stop.set()
+            self._thread.join()
+            return True
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (os.path.basename(frame.f_code.co_filename),
+                                   frame.f_code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self, limit=None):
+        """'frame;frame;frame count' lines, most frequent first."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common(limit))
+
+    def status(self):
+        return {"running": self.running, "samples": self.samples,
+                "interval_ms": self.interval * 1000, "stacks": len(self.stacks),
+                "started": self.started}
+
+
+profiler = SamplingProfiler()
@@ -1,30 +1,294 @@
+import os
+import queue
 import smtplib
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from email.message import EmailMessage
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client
 
+import database
+import metrics
 from config import *
+from scheduler import TimerScheduler
 
 
 
-# --- EMAIL ALERT ---
+# --- TRANSPORTS ---
+# A transport delivers one message to one recipient and raises on failure.
+# Swap them with set_transport() (tests use FakeTransport).
 
-def send_email_alert(message):
-    if not EMAIL_ENABLED:
-        return
+class SmtpSessionPool:
+    """
+    Keeps logged-in SMTP sessions open between alerts.
+      - the STARTTLS + login handshake is paid once per session, not per email
+      - a session idle longer than SMTP_KEEPALIVE is probed with NOOP first
+      - a dropped session is reconnected and the batch resumes where it stopped
+      - send_batch() pushes many messages through one session
+    """
 
-    try:
+    def __init__(self, size=SMTP_POOL_SIZE, keepalive=SMTP_KEEPALIVE, max_idle=SMTP_MAX_IDLE):
+        self.size      = size
+        self.keepalive = keepalive
+        self.max_idle  = max_idle
+        self._idle     = queue.LifoQueue()     # (server, last_used)
+        self._slots    = threading.BoundedSemaphore(size)
+        self._lock     = threading.Lock()
+        self.metrics   = {
+            "handshakes": 0, "handshake_seconds": 0.0, "reconnects": 0,
+            "noops": 0, "batches": 0, "messages_sent": 0, "failures": 0,
+            "send_seconds": 0.0,
+        }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.metrics[key] += amount
+
+    def _connect(self):
+        started = time.perf_counter()
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        if SMTP_USE_TLS:
+            server.starttls()
+        if SENDER_PASSWORD:
+            server.login(SENDER_EMAIL, SENDER_PASSWORD)
+        self._count("handshakes")
+        self._count("handshake_seconds", time.perf_counter() - started)
+        return server
+
+    def _acquire(self):
+        now = time.monotonic()
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            idle = now - last_used
+            if idle > self.max_idle:
+                self._close(server)
+                continue
+            if idle > self.keepalive:
+                self._count("noops")
+                try:
+                    if server.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected("NOOP rejected")
+                except (smtplib.SMTPException, OSError):
+                    self._close(server)
+                    continue
+            return server
+
+    def _release(self, server):
+        if server is not None:
+            self._idle.put((server, time.monotonic()))
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def send_batch(self, messages):
+        """Send EmailMessages over one session. Returns one error-or-None per message."""
+        results = [None] * len(messages)
+        started = time.perf_counter()
+        done    = 0
+        with self._slots:
+            server = None
+            try:
+                server = self._acquire()
+                for i, msg in enumerate(messages):
+                    try:
+                        server.send_message(msg)
+                        self._count("messages_sent")
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:
+                        results[i] = e              # this message only
+                        self._count("failures")
+                    except (smtplib.SMTPServerDisconnected, OSError):
+                        # Session dropped mid-batch: reconnect once and resume.
+                        self._count("reconnects")
+                        server.close()
+                        server = None
+                        server = self._connect()
+                        server.send_message(msg)
+                        self._count("messages_sent")
+                    done = i + 1
+            except Exception as e:
+                for i in range(done, len(messages)):
+                    results[i] = e
+                self._count("failures", len(messages) - done)
+                if server is not None:
+                    server.close()
+                    server = None
+            finally:
+                self._release(server)
+        self._count("batches")
+        self._count("send_seconds", time.perf_counter() - started)
+        return results
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+    def stats(self):
+        with self._lock:
+            m = dict(self.metrics)
+        m["idle_sessions"]  = self._idle.qsize()
+        m["avg_handshake"]  = m["handshake_seconds"] / m["handshakes"] if m["handshakes"] else 0.0
+        m["throughput_mps"] = m["messages_sent"] / m["send_seconds"] if m["send_seconds"] else 0.0
+        return m
+
+
+class EmailTransport:
+    channel = "email"
+
+    def __init__(self):
+        self.pool = SmtpSessionPool()
+
+    def enabled(self):
+        return EMAIL_ENABLED
+
+    @staticmethod
+    def build(recipient, message):
         msg = EmailMessage()
         msg["Subject"] = "🚨 RakshaNet Safety Alert"
         msg["From"] = SENDER_EMAIL
-        msg["To"] = RECEIVER_EMAIL
+        msg["To"] = recipient
         msg.set_content(message)
+        return msg
+
+    def send(self, recipient, message):
+        error = self.send_many([(recipient, message)])[0]
+        if error is not None:
+            raise error
+
+    def send_many(self, items):
+        """Deliver [(recipient, message)] over one pooled session."""
+        return self.pool.send_batch([self.build(r, m) for r, m in items])
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate   = rate
+        self.burst  = burst or max(1, int(rate))
+        self.tokens = self.burst
+        self.stamp  = time.monotonic()
+        self._lock  = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp  = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SmsTransport:
+    """
+    One shared Twilio client (keep-alive HTTP session) for every SMS.
+    send_many() sends concurrently, capped at SMS_MAX_PARALLEL requests
+    in flight and SMS_RATE_PER_SEC requests per second.
+    """
+    channel = "sms"
+
+    def __init__(self):
+        self._client   = None
+        self._executor = None
+        self._lock     = threading.Lock()
+        self.limiter   = RateLimiter(SMS_RATE_PER_SEC)
+
+    def enabled(self):
+        return SMS_ENABLED
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                http = TwilioHttpClient(pool_connections=True, timeout=SMS_TIMEOUT)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SMS_MAX_PARALLEL)
+                http.session.mount("https://", adapter)
+                http.session.mount("http://", adapter)
+                self._client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, http_client=http)
+                if TWILIO_API_BASE:
+                    self._client.api.base_url = TWILIO_API_BASE   # local stub
+            return self._client
+
+    def send(self, recipient, message):
+        """Send one SMS; returns the Twilio message SID."""
+        self.limiter.acquire()
+        sms = self.client().messages.create(
+            body=message,
+            from_=TWILIO_PHONE_NUMBER,
+            to=recipient
+        )
+        return sms.sid
+
+    def submit(self, recipient, message):
+        """Queue one send on the shared SMS pool; returns a Future of the SID."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=SMS_MAX_PARALLEL,
+                                                    thread_name_prefix="rakshanet-sms")
+        return self._executor.submit(self.send, recipient, message)
+
+    def send_many(self, items):
+        """Deliver [(recipient, message)] concurrently. Returns one error-or-None per item."""
+        futures = [self.submit(r, m) for r, m in items]
+        return [f.exception() for f in futures]
+
+
+class FakeTransport:
+    """In-memory transport for tests: records sends, can fail the first N tries."""
+
+    def __init__(self, channel, fail_times=0):
+        self.channel    = channel
+        self.fail_times = fail_times
+        self.sent       = []
+        self._lock      = threading.Lock()
+
+    def enabled(self):
+        return True
+
+    def send(self, recipient, message):
+        with self._lock:
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise ConnectionError("fake transport failure")
+            self.sent.append((recipient, message))
+
 
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(SENDER_EMAIL, SENDER_PASSWORD)
-        server.send_message(msg)
-        server.quit()
+transports = {
+    "email": EmailTransport(),
+    "sms":   SmsTransport(),
+}
 
+def set_transport(channel, transport):
+    transports[channel] = transport
+
+
+
+# --- EMAIL ALERT ---
+
+def send_email_alert(message):
+    transport = transports["email"]
+    if not transport.enabled():
+        return
+
+    try:
+        transport.send(RECEIVER_EMAIL, message)
         print("✅ Email alert sent successfully")
 
     except Exception as e:
@@ -35,19 +299,232 @@ def send_email_alert(message):
 # -- SMS ALERT (Twilio) ---
 
 def send_sms_alert(message, to_number):
-    if not SMS_ENABLED:
+    transport = transports["sms"]
+    if not transport.enabled():
         return
 
     try:
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-
-        sms = client.messages.create(
-            body=message,
-            from_=TWILIO_PHONE_NUMBER,
-            to=to_number
-        )
-
+        transport.send(to_number, message)
         print("✅ SMS sent to", to_number)
 
     except Exception as e:
         print("❌ SMS failed:", e)
+
+
+def send_sms_bulk(message, numbers):
+    """
+    Send one message to many numbers concurrently over the shared client.
+    Returns {number: {"status": "sent", "sid": ...} | {"status": "failed", "error": ...}}.
+    """
+    transport = transports["sms"]
+    if not transport.enabled():
+        return {n: {"status": "skipped"} for n in numbers}
+
+    if hasattr(transport, "submit"):
+        futures = {n: transport.submit(n, message) for n in dict.fromkeys(numbers)}
+    else:
+        futures = {}
+        for n in dict.fromkeys(numbers):
+            futures[n] = f = Future()
+            try:
+                f.set_result(transport.send(n, message))
+            except Exception as e:
+                f.set_exception(e)
+
+    results = {}
+    for number, future in futures.items():
+        error = future.exception()
+        results[number] = ({"status": "sent", "sid": future.result()} if error is None
+                           else {"status": "failed", "error": str(error)})
+    return results
+
+
+
+# --- NOTIFICATION QUEUE ---
+# Request handlers record the alert, call notify_alert() and return.
+# Worker threads then deliver every (channel, recipient) pair in parallel,
+# retry with exponential backoff and store each outcome in `deliveries`.
+# A row is claimed in SQLite before it is sent, so with several worker
+# processes each delivery goes out once; a sweeper in every process picks
+# up rows nobody holds (queue was full, or their worker died).
+
+SEND_SECONDS  = metrics.histogram("notify_send_seconds",
+                                  "Duration of one transport call (send or send_many)", ["channel"])
+SEND_ATTEMPTS = metrics.counter("notify_attempts_total",
+                                "Delivery attempts by channel (email = SMTP, sms = Twilio)", ["channel"])
+SEND_ERRORS   = metrics.counter("notify_errors_total",
+                                "Failed delivery attempts by channel", ["channel"])
+DELIVERIES    = metrics.counter("notify_deliveries_total",
+                                "Final delivery outcomes", ["channel", "status"])
+
+
+class NotificationQueue:
+
+    def __init__(self, workers=NOTIFY_WORKERS, maxsize=NOTIFY_QUEUE_SIZE,
+                 max_attempts=NOTIFY_MAX_ATTEMPTS, backoff_base=NOTIFY_BACKOFF_BASE,
+                 batch_size=NOTIFY_BATCH_SIZE, sweep_every=NOTIFY_SWEEP_EVERY,
+                 claim_ttl=NOTIFY_CLAIM_TTL):
+        self.workers      = workers
+        self.batch_size   = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.sweep_every  = sweep_every
+        self.claim_ttl    = claim_ttl
+        self.owner        = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue       = queue.Queue(maxsize=maxsize)
+        self._retries     = TimerScheduler(name="rakshanet-retries", workers=1)
+        self._threads     = []
+        self._sweeper     = None
+        self._stop        = threading.Event()
+        self._lock        = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._work, name=f"rakshanet-notify-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            # first sweep recovers deliveries a previous run left unsent
+            self._sweeper = threading.Thread(target=self._sweep_loop,
+                                             name="rakshanet-notify-sweep", daemon=True)
+            self._sweeper.start()
+
+    def shutdown(self):
+        self._stop.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+            sweeper, self._sweeper = self._sweeper, None
+        if sweeper is not None:
+            sweeper.join()
+        for _ in threads:
+            self._queue.put(None)
+        for t in threads:
+            t.join()
+        self._retries.shutdown()
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def notify_alert(self, alert_id, user, message, contacts):
+        """Fan out one alert: email to RECEIVER_EMAIL, SMS to every contact."""
+        targets = [("email", RECEIVER_EMAIL)] + [("sms", phone) for phone in contacts]
+        ids = database.create_deliveries(alert_id, user, message, targets, owner=self.owner)
+        for delivery_id, (channel, recipient) in zip(ids, targets):
+            self.submit(delivery_id, channel, recipient, message)
+        return ids
+
+    def submit(self, delivery_id, channel, recipient, message, attempts=0):
+        """Queue a delivery this worker has claimed. Never blocks the caller."""
+        try:
+            self._queue.put_nowait((delivery_id, channel, recipient, message, attempts))
+            return True
+        except queue.Full:
+            # Give the claim back; the next sweep here or on another worker sends it.
+            database.release_deliveries([delivery_id])
+            print(f"❌ Notification queue full — delivery {delivery_id} deferred")
+            return False
+
+    def sweep(self):
+        """Claim unheld deliveries (as many as the queue has room for) and queue them."""
+        room = self._queue.maxsize - self._queue.qsize()
+        if room <= 0:
+            return 0
+        claimed = database.claim_deliveries(self.owner, time.time(), self.claim_ttl, limit=room)
+        return sum(self.submit(row["id"], row["channel"], row["recipient"],
+                               row["message"], row["attempts"]) for row in claimed)
+
+    def _sweep_loop(self):
+        while not self._stop.is_set():
+            try:
+                recovered = self.sweep()
+                if recovered:
+                    print(f"📨 Picked up {recovered} pending delivery(ies)")
+            except Exception as e:
+                print("❌ Delivery sweep failed:", e)
+            self._stop.wait(self.sweep_every)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            # Drain whatever else is already waiting so transports that
+            # support send_many() (SMTP) can push it over one session.
+            batch, stop = [job], False
+            while len(batch) < self.batch_size:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    stop = True
+                    break
+                batch.append(more)
+            try:
+                self._deliver_batch(batch)
+            except Exception as e:
+                print("❌ Notification worker error:", e)
+            if stop:
+                return
+
+    def _deliver_batch(self, batch):
+        by_channel = {}
+        for job in batch:
+            by_channel.setdefault(job[1], []).append(job)
+        for channel, jobs in by_channel.items():
+            transport = transports[channel]
+            if not transport.enabled():
+                for delivery_id, _, _, _, attempts in jobs:
+                    database.update_delivery(delivery_id, "skipped", attempts)
+                DELIVERIES.inc(channel, "skipped", amount=len(jobs))
+            elif hasattr(transport, "send_many") and len(jobs) > 1:
+                with SEND_SECONDS.time(channel):
+                    errors = transport.send_many([(job[2], job[3]) for job in jobs])
+                for job, error in zip(jobs, errors):
+                    self._finish(*job, error)
+            else:
+                for job in jobs:
+                    self._deliver(*job)
+
+    def _deliver(self, delivery_id, channel, recipient, message, attempts):
+        error = None
+        try:
+            with SEND_SECONDS.time(channel):
+                transports[channel].send(recipient, message)
+        except Exception as e:
+            error = e
+        self._finish(delivery_id, channel, recipient, message, attempts, error)
+
+    def _finish(self, delivery_id, channel, recipient, message, attempts, e):
+        attempts += 1
+        SEND_ATTEMPTS.inc(channel)
+        if e is not None:
+            SEND_ERRORS.inc(channel)
+            if attempts >= self.max_attempts:
+                DELIVERIES.inc(channel, "failed")
+                database.update_delivery(delivery_id, "failed", attempts, str(e))
+                print(f"❌ {channel} to {recipient} failed after {attempts} attempts:", e)
+                return
+            delay = self.backoff_base * 2 ** (attempts - 1)
+            database.update_delivery(delivery_id, "retrying", attempts, str(e), hold=delay)
+            self._retries.start(delivery_id, delay, self.submit,
+                                delivery_id, channel, recipient, message, attempts)
+            return
+        DELIVERIES.inc(channel, "sent")
+        database.update_delivery(delivery_id, "sent", attempts)
+        print(f"✅ {channel} sent to", recipient)
+
+
+dispatcher = NotificationQueue()
+
+
+def notification_stats():
+    """Queue depth plus SMTP session / throughput metrics."""
+    email = transports["email"]
+    return {
+        "queue_depth": dispatcher.depth(),
+        "smtp":        email.pool.stats() if hasattr(email, "pool") else None,
+    }
@@ -0,0 +1,138 @@
+"""
+ratelimit.py — RakshaNet
+Uses: collections.OrderedDict + threading (standard library)
+
+Per-user burst control for the write endpoints. Every check is O(1), and
+each structure keeps at most RATE_LIMIT_USERS users. The least recently
+active user is evicted first, so memory stays flat however many users
+pass through.
+
+  SosCoalescer — an SOS within SOS_DEDUP_WINDOW s of the same user's last
+                 one joins that alert (new location, repeat_count + 1)
+                 instead of opening another alert and re-notifying every
+                 contact. A burst longer than SOS_DEDUP_MAX_SPAN starts over.
+  TokenBuckets — a token bucket per user (rate, burst). take() returns the
+                 seconds to wait, 0 when the call is allowed.
+
+An SOS is never rejected, only coalesced. State is per process: with
+several workers, a burst spread across them opens at most one alert per
+worker.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from config import (SOS_DEDUP_WINDOW, SOS_DEDUP_MAX_SPAN,
+                    TIMER_RATE_PER_MIN, TIMER_BURST, RATE_LIMIT_USERS)
+
+
+def _evict(data, maxsize):
+    evicted = 0
+    while len(data) > maxsize:
+        data.popitem(last=False)
+        evicted += 1
+    return evicted
+
+
+class SosCoalescer:
+
+    def __init__(self, window=SOS_DEDUP_WINDOW, max_span=SOS_DEDUP_MAX_SPAN,
+                 maxsize=RATE_LIMIT_USERS, clock=time.monotonic):
+        self.window   = window
+        self.max_span = max_span
+        self.maxsize  = maxsize
+        self._clock   = clock
+        self._bursts  = OrderedDict()   # user → [alert id (Future until committed), first, last, count]
+        self._lock    = threading.Lock()
+        self.opened = self.coalesced = self.evictions = 0
+
+    def submit(self, user, open_alert):
+        """
+        Return (alert id, count). If the user has an open burst, this SOS
+        joins it and count is its new length (> 1). Otherwise open_alert() is
+        called and must return the new alert id or a Future of it (e.g.
+        record_event(..., wait=False)); count is then 1. The burst is
+        reserved under the lock and open_alert() runs outside it, so
+        concurrent presses can't open two alerts and a slow shard only holds
+        up its own users.
+        """
+        now = self._clock()
+        with self._lock:
+            burst = self._bursts.get(user)
+            if burst is not None and now - burst[2] <= self.window and now - burst[1] <= self.max_span:
+                burst[2]  = now
+                burst[3] += 1
+                self._bursts.move_to_end(user)
+                self.coalesced += 1
+                alert, count, opening = burst[0], burst[3], False
+            else:
+                alert, count, opening = Future(), 1, True   # presses joining meanwhile wait on it
+                burst = self._bursts[user] = [alert, now, now, 1]
+                self.opened    += 1
+                self.evictions += _evict(self._bursts, self.maxsize)
+        if opening:
+            try:
+                opened = open_alert()
+                alert.set_result(opened.result() if isinstance(opened, Future) else opened)
+            except Exception as e:
+                alert.set_exception(e)
+        if not isinstance(alert, Future):
+            return alert, count
+        try:
+            alert_id = alert.result()
+        except Exception:
+            with self._lock:
+                if self._bursts.get(user) is burst:
+                    del self._bursts[user]   # the next press retries a fresh alert
+            raise
+        burst[0] = alert_id   # drop the Future (and its Condition) once resolved
+        return alert_id, count
+
+    def forget(self, user):
+        """Close the user's burst (e.g. after a check-in): the next SOS alerts afresh."""
+        with self._lock:
+            self._bursts.pop(user, None)
+
+    def stats(self):
+        with self._lock:
+            return {"users": len(self._bursts), "opened": self.opened,
+                    "coalesced": self.coalesced, "evictions": self.evictions}
+
+
+class TokenBuckets:
+
+    def __init__(self, rate_per_min=TIMER_RATE_PER_MIN, burst=TIMER_BURST,
+                 maxsize=RATE_LIMIT_USERS, clock=time.monotonic):
+        self.rate    = rate_per_min / 60   # tokens per second
+        self.burst   = burst
+        self.maxsize = maxsize
+        self._clock  = clock
+        self._tokens = OrderedDict()       # key → [tokens, updated_at]
+        self._lock   = threading.Lock()
+        self.allowed = self.limited = self.evictions = 0
+
+    def take(self, key, cost=1):
+        """Spend `cost` tokens. Returns 0 if allowed, else seconds until it would be."""
+        now = self._clock()
+        with self._lock:
+            bucket = self._tokens.get(key)
+            if bucket is None:
+                bucket = self._tokens[key] = [self.burst, now]
+                self.evictions += _evict(self._tokens, self.maxsize)
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                self._tokens.move_to_end(key)
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                self.allowed += 1
+                return 0
+            self.limited += 1
+            return (cost - bucket[0]) / self.rate
+
+    def stats(self):
+        with self._lock:
+            return {"users": len(self._tokens), "allowed": self.allowed,
+                    "limited": self.limited, "evictions": self.evictions}
@@ -0,0 +1,270 @@
+"""
+scheduler.py — RakshaNet
+Uses: heapq + threading (standard library)
+
+One dispatcher thread and one min-heap of deadlines replace the old
+"one threading.Timer per user" model, so 100k armed safety timers cost
+100k small heap entries instead of 100k sleeping OS threads.
+
+  start(key, delay, fn, *args)  — arm (or re-arm) a timer      O(log n)
+  cancel(key)                   — disarm a timer                O(1)*
+  reschedule(key, delay)        — move an armed timer           O(log n)
+  pending() / get(key)          — inspect armed deadlines
+
+* cancelled entries are dropped lazily when they reach the top of the heap.
+
+DurableTimers layers SQLite persistence on top: deadlines are written to
+the `timers` table, the local heap only provides a precise wake-up, and a
+single leader (elected through the `leases` table) sweeps due rows so that
+timers armed on another worker — or before a restart — still fire once.
+"""
+
+import heapq
+import itertools
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+import metrics
+from config import TIMER_POLL_INTERVAL, TIMER_LEASE_TTL
+
+# How late callbacks start: dispatch time minus deadline, per scheduler.
+TIMER_LATENESS = metrics.histogram("timer_lateness_seconds",
+                                   "Actual fire time minus deadline", ["scheduler"])
+
+
+class _Entry:
+    __slots__ = ("deadline", "seq", "key", "fn", "args", "armed_at", "cancelled")
+
+    def __init__(self, deadline, seq, key, fn, args, armed_at):
+        self.deadline  = deadline
+        self.seq       = seq
+        self.key       = key
+        self.fn        = fn
+        self.args      = args
+        self.armed_at  = armed_at
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+
+class TimerScheduler:
+    """Heap-based single-thread timer scheduler keyed by user id."""
+
+    def __init__(self, clock=time.monotonic, name="rakshanet-timers", workers=4):
+        self._clock   = clock
+        self._heap    = []
+        self._entries = {}                 # key → live _Entry
+        self._seq     = itertools.count()
+        self._cond    = threading.Condition()
+        self._running = False
+        self._thread  = None
+        self._name    = name
+        # Callbacks (auto_sos) run off the dispatcher so one slow SMTP send
+        # cannot make every other deadline late.
+        self._workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+
+    # ── lifecycle ─────────────────────────
+    def start_dispatcher(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._thread  = threading.Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+
+    def shutdown(self, wait=True):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if wait and self._thread is not None:
+            self._thread.join()
+        self._workers.shutdown(wait=wait)
+
+    # ── public API ────────────────────────
+    def start(self, key, delay, fn, *args):
+        """Arm a timer for `key`, replacing any timer already armed for it."""
+        now = self._clock()
+        with self._cond:
+            self._cancel_locked(key)
+            entry = _Entry(now + delay, next(self._seq), key, fn, args, now)
+            self._entries[key] = entry
+            heapq.heappush(self._heap, entry)
+            if self._heap[0] is entry:
+                self._cond.notify()
+        self.start_dispatcher()
+        return entry.deadline
+
+    def cancel(self, key):
+        """Disarm the timer for `key`. Returns True if one was armed."""
+        with self._cond:
+            return self._cancel_locked(key)
+
+    def reschedule(self, key, delay):
+        """Move an armed timer to `delay` seconds from now. Returns False if none."""
+        with self._cond:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            self.start(key, delay, entry.fn, *entry.args)
+            return True
+
+    def get(self, key):
+        """Describe the armed timer for `key`, or None."""
+        with self._cond:
+            entry = self._entries.get(key)
+            return self._describe(entry, self._clock()) if entry else None
+
+    def pending(self):
+        """All armed timers, soonest first."""
+        with self._cond:
+            now = self._clock()
+            return [self._describe(e, now)
+                    for e in sorted(self._entries.values())]
+
+    def submit(self, fn, *args):
+        """Run `fn(*args)` on the callback workers right away."""
+        self._workers.submit(self._fire, None, fn, args)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ── internals ─────────────────────────
+    def _cancel_locked(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        entry.cancelled = True
+        # Compact once tombstones dominate so memory tracks live timers.
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._entries):
+            self._heap = [e for e in self._heap if not e.cancelled]
+            heapq.heapify(self._heap)
+        return True
+
+    @staticmethod
+    def _describe(entry, now):
+        remaining = max(0.0, entry.deadline - now)
+        return {
+            "key":       entry.key,
+            "remaining": round(remaining, 3),                  # seconds
+            "armed_for": round(entry.deadline - entry.armed_at, 3),
+            "fires_at":  round(time.time() + remaining, 3),    # unix epoch
+        }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    while self._heap and self._heap[0].cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    wait = self._heap[0].deadline - self._clock()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if not self._running:
+                    return
+                entry = heapq.heappop(self._heap)
+                del self._entries[entry.key]
+                TIMER_LATENESS.observe(self._clock() - entry.deadline, self._name)
+            self._workers.submit(self._fire, entry.key, entry.fn, entry.args)
+
+    @staticmethod
+    def _fire(key, fn, args):
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"❌ Timer callback failed for {key or fn.__name__}:", e)
+
+
+class DurableTimers:
+    """
+    Safety timers persisted in SQLite.
+      arm(user, minutes) — store the deadline, then wake locally at fire time
+      cancel(user)       — delete the deadline (works from any worker)
+      start()            — run the leader expiry loop; its first sweep
+                           recovers deadlines that passed while we were down
+      poll()             — one round of that loop (take the lease, sweep)
+    Every firing path claims the row first, so `on_expire` runs once per deadline.
+    `clock` is the wall clock deadlines are stored in (epoch seconds).
+    """
+
+    LEASE = "timer-expiry"
+
+    def __init__(self, on_expire, poll_interval=TIMER_POLL_INTERVAL, lease_ttl=TIMER_LEASE_TTL,
+                 clock=time.time):
+        self.on_expire     = on_expire
+        self.poll_interval = poll_interval
+        self.lease_ttl     = lease_ttl
+        self.owner         = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.scheduler     = TimerScheduler()
+        self._clock        = clock
+        self._stop         = threading.Event()
+        self._thread       = None
+
+    def arm(self, user, minutes):
+        """Arm (or re-arm) a user's timer. Returns the deadline as a unix epoch."""
+        fires_at = self._clock() + minutes * 60
+        database.arm_timer(user, fires_at, minutes)
+        self.scheduler.start(user, minutes * 60, self._expire, user, fires_at)
+        return fires_at
+
+    def cancel(self, user):
+        self.scheduler.cancel(user)
+        return database.cancel_timer(user)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._expiry_loop,
+                                        name="rakshanet-timer-leader", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.scheduler.shutdown()
+
+    def _expire(self, user, fires_at):
+        if database.claim_timer(user, fires_at):
+            self.on_expire(user)
+
+    def sweep(self):
+        """Leader only: claim and fire every overdue deadline. Returns how many fired."""
+        fired = 0
+        while True:
+            now = self._clock()
+            due = database.claim_due_timers(now)
+            for user, fires_at in due:
+                TIMER_LATENESS.observe(max(0.0, now - fires_at), "sweep")
+                self.scheduler.submit(self.on_expire, user)
+            fired += len(due)
+            if not due:
+                return fired
+
+    def poll(self):
+        """Take or renew the leader lease and sweep. Returns how many fired (None = not leader)."""
+        if not database.acquire_lease(self.LEASE, self.owner, self.lease_ttl, self._clock()):
+            return None
+        return self.sweep()
+
+    def _expiry_loop(self):
+        while not self._stop.is_set():
+            try:
+                recovered = self.poll()
+                if recovered:
+                    print(f"⏰ Expiry leader fired {recovered} overdue timer(s)")
+            except Exception as e:
+                print("❌ Timer expiry loop failed:", e)
+            self._stop.wait(self.poll_interval)
@@ -0,0 +1,76 @@
+"""
+shards.py — RakshaNet
+Uses: hashlib + bisect (standard library)
+
+Consistent hashing of users onto N SQLite files (database.py routes every
+per-user query and write through owner()).
+
+Each shard owns SHARD_VNODES points on a 64-bit ring and a user belongs to
+the first point at or after hash(user). Going from N to M shards only
+moves the users whose point now falls to a different shard (about
+1 - N/M of them when growing) and never moves a user between two shards
+that exist on both sides.
+
+  owner(user, n)        — shard index in range(n)
+  shard_path(db, k)     — file of shard k; shard 0 is the database itself
+  id_base(gen, k)       — first id shard k hands out in layout generation gen
+  issuer(id)            — shard that handed out `id`
+  id_range(id)          — [start, end) of the range `id` came from
+
+Ids stay unique across files: every shard draws its AUTOINCREMENT ids from
+its own range, and a rebalance starts a new generation whose ranges lie
+above every id issued so far, so whatever a moved user writes afterwards
+sorts after everything they wrote before it.
+"""
+
+import bisect
+import os
+from functools import lru_cache
+from hashlib import blake2b
+
+from config import SHARD_VNODES
+
+MAX_SHARDS = 64   # ranges per generation
+ID_BITS    = 36   # ids per shard per generation: 2**36; ids stay below 2**53 (JSON-safe)
+
+
+def _hash(key):
+    return int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+@lru_cache(maxsize=8)
+def ring(n, vnodes=SHARD_VNODES):
+    """(sorted points, owner of each point) for n shards."""
+    points = sorted((_hash(f"shard-{k}#{v}"), k) for k in range(n) for v in range(vnodes))
+    return [p for p, _ in points], [k for _, k in points]
+
+
+def owner(user, n):
+    if n == 1:
+        return 0
+    points, owners = ring(n)
+    i = bisect.bisect_left(points, _hash(user))
+    return owners[i % len(owners)]
+
+
+def shard_path(db_name, k):
+    """alerts.db → alerts.db, alerts-01.db, alerts-02.db …"""
+    if k == 0:
+        return db_name
+    root, ext = os.path.splitext(db_name)
+    return f"{root}-{k:02d}{ext}"
+
+
+def id_base(generation, k):
+    if not 0 <= k < MAX_SHARDS:
+        raise ValueError(f"shard index must be below {MAX_SHARDS}")
+    return (generation * MAX_SHARDS + k) << ID_BITS
+
+
+def issuer(row_id):
+    return (row_id >> ID_BITS) % MAX_SHARDS
+
+
+def id_range(row_id):
+    start = row_id >> ID_BITS << ID_BITS
+    return start, start + (1 << ID_BITS)
@@ -0,0 +1,125 @@
+"""
+test_asgi.py — RakshaNet
+asgi.Gateway in front of a2wsgi: streamed bodies, backpressure from a slow
+client, stopping a stream once the client disconnects, admission control
+and the body limit. Driven with hand-written ASGI receive / send.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def asgi(client):
+    import asgi   # imports app: only once the client fixture has set the database up
+    return asgi
+
+
+def chunked_app(n, size=10_000, produced=None, closed=None):
+    def app(environ, start_response):
+        start_response("200 OK", [("Content-Type", "text/plain")])
+
+        def body():
+            try:
+                for i in range(n):
+                    if produced is not None:
+                        produced.append(i)
+                    yield bytes([65 + i % 26]) * size
+            finally:
+                if closed is not None:
+                    closed.set()
+        return body()
+    return app
+
+
+def call(gateway, send, path="/", body=b"", headers=(), method="GET", disconnect=None):
+    async def go():
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await (disconnect.wait() if disconnect is not None else asyncio.Event().wait())
+            return {"type": "http.disconnect"}
+        scope = {"type": "http", "method": method, "path": path, "raw_path": path.encode(),
+                 "root_path": "", "query_string": b"", "headers": list(headers),
+                 "scheme": "http", "http_version": "1.1", "server": ("test", 80), "client": ("t", 1)}
+        await asyncio.wait_for(gateway(scope, receive, send), 10)
+    asyncio.run(go())
+
+
+def collector():
+    out = []
+
+    async def send(message):
+        out.append(message)
+    return out, send
+
+
+def test_streams_a_large_body_in_chunks(asgi):
+    out, send = collector()
+    call(asgi.Gateway(chunked_app(100)), send)
+    assert out[0]["status"] == 200
+    bodies = [m for m in out if m["type"] == "http.response.body"]
+    assert len(bodies) > 50 and not bodies[-1].get("more_body")
+    assert len(b"".join(m["body"] for m in bodies)) == 100 * 10_000
+
+
+def test_a_slow_client_holds_back_the_app(asgi):
+    produced, ready = [], threading.Event()
+    out = []
+
+    async def send(message):
+        out.append(message)
+        if message["type"] == "http.response.body" and not ready.is_set():
+            await asyncio.sleep(0.3)   # the client isn't reading yet
+            assert len(produced) <= asgi.SEND_QUEUE + 3
+            ready.set()
+    call(asgi.Gateway(chunked_app(200, produced=produced)), send)
+    assert ready.is_set() and len(produced) == 200
+
+
+def test_disconnect_stops_the_stream_and_closes_it(asgi):
+    produced, closed = [], threading.Event()
+
+    async def send(message):
+        if message["type"] == "http.response.body" and len(produced) > 5:
+            raise OSError("client went away")
+    call(asgi.Gateway(chunked_app(10_000, produced=produced, closed=closed)), send)
+    assert closed.is_set() and len(produced) < 50
+
+
+def test_disconnect_message_stops_the_stream(asgi):
+    produced, closed, gone = [], threading.Event(), asyncio.Event()
+
+    async def send(message):   # like uvicorn: once the client is gone, sends are dropped silently
+        if message["type"] == "http.response.body" and len(produced) > 5:
+            gone.set()
+            await asyncio.sleep(0.01)
+    call(asgi.Gateway(chunked_app(10_000, produced=produced, closed=closed)), send, disconnect=gone)
+    assert closed.is_set() and len(produced) < 100
+
+
+def test_backlog_full_is_a_503(asgi):
+    gateway = asgi.Gateway(chunked_app(1), backlog=0)
+    out, send = collector()
+    call(gateway, send)
+    assert out[0]["status"] == 503 and (b"retry-after", b"1") in out[0]["headers"]
+    assert gateway.stats["rejected"] == 1
+
+
+def test_oversized_body_is_a_413(asgi):
+    gateway = asgi.Gateway(chunked_app(1), max_body=10)
+    out, send = collector()
+    call(gateway, send, method="POST", body=b"x" * 11, headers=[(b"content-length", b"11")])
+    assert out[0]["status"] == 413 and gateway.stats["too_large"] == 1
+
+
+def test_flask_routes_through_the_gateway(asgi):
+    out, send = collector()
+    call(asgi.app, send, path="/sos", method="POST", body=b'{"userId": "a@b"}',
+         headers=[(b"content-type", b"application/json"), (b"content-length", b"17")])
+    assert out[0]["status"] == 200
+    assert b'"SOS sent"' in b"".join(m.get("body", b"") for m in out[1:])
@@ -0,0 +1,61 @@
+"""
+test_cache_bus.py — RakshaNet
+Cross-instance cache invalidation: two ReadThroughCaches stand in for two
+worker processes, sharing a LocalInvalidationBus in memory or one
+SqliteInvalidationBus each on the same alerts.db.
+"""
+
+from cache import LocalInvalidationBus, ReadThroughCache
+from database import SqliteInvalidationBus, connection
+
+
+def caches(source, bus_a, bus_b):
+    load = lambda key: source[key]
+    return ReadThroughCache(load, 100, 300, bus=bus_a), ReadThroughCache(load, 100, 300, bus=bus_b)
+
+
+def test_local_bus_invalidates_every_subscriber():
+    source = {"u": ("+911",)}
+    bus = LocalInvalidationBus()
+    a, b = caches(source, bus, bus)
+    assert a.get("u") == b.get("u") == ("+911",)
+    source["u"] = ("+912",)
+    a.invalidate("u")
+    assert b.get("u") == ("+912",)
+
+
+def test_sqlite_bus_reaches_the_other_instance(db):
+    source = {"u": ("+911",), "v": ("+913",)}
+    bus_a, bus_b = SqliteInvalidationBus("contacts"), SqliteInvalidationBus("contacts")
+    a, b = caches(source, bus_a, bus_b)
+    bus_a.poll(), bus_b.poll()                    # first poll records the high-water mark
+    assert b.get("u") == ("+911",) and b.get("v") == ("+913",)
+
+    source["u"] = ("+912",)
+    a.invalidate("u")
+    assert b.get("u") == ("+911",)                # not seen yet: B hasn't polled
+    assert bus_b.poll() == 1
+    assert b.get("u") == ("+912",)
+    assert b.get("v") == ("+913",)                # other keys stay cached
+    assert bus_a.poll() == 0                      # A applied its own invalidation already
+
+    a.invalidate_all()
+    source["v"] = ("+914",)
+    assert bus_b.poll() == 1
+    assert b.get("v") == ("+914",)
+
+
+def test_own_seqs_do_not_accumulate(db):
+    bus = SqliteInvalidationBus("contacts")
+    for i in range(50):                          # published before the first poll
+        bus.publish(f"u{i}")
+    bus.poll()
+    assert bus._own == set()
+
+    for i in range(50):
+        bus.publish(f"u{i}")
+    with connection() as conn:                   # pruned before this worker read them back
+        conn.execute("DELETE FROM cache_invalidations")
+    bus.publish("last")
+    assert bus.poll() == 0
+    assert bus._own == set()
@@ -0,0 +1,59 @@
+"""
+test_clock.py — RakshaNet
+clock.Instant day and week fields follow IST, not UTC: they roll over at
+IST midnight (18:30 UTC), and the single-entry memos never hand one day's
+fields to an instant on another day.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import clock
+
+# 2025-06-15 is a Sunday (ISO week 24); IST midnight is 2025-06-15T18:30:00Z
+MIDNIGHT_UTC = datetime(2025, 6, 15, 18, 30, tzinfo=timezone.utc)
+
+
+def fields(inst):
+    return inst.date, inst.weekday, inst.week, inst.week_start
+
+
+def test_day_and_week_fields_roll_over_at_ist_midnight():
+    before = clock.at(MIDNIGHT_UTC - timedelta(seconds=1))
+    after  = clock.at(MIDNIGHT_UTC)
+    assert fields(before) == ("2025-06-15", "Sunday", 24, "2025-06-09")
+    assert fields(after)  == ("2025-06-16", "Monday", 25, "2025-06-16")
+    assert before.display == "15-06-2025 23:59:59"
+    assert after.display  == "16-06-2025 00:00:00"
+    assert (after.time, after.iso) == ("00:00:00", "2025-06-16T00:00:00+05:30")
+
+
+@pytest.mark.parametrize("value", [
+    MIDNIGHT_UTC,                                  # aware, UTC
+    MIDNIGHT_UTC.timestamp(),                      # epoch seconds
+    datetime(2025, 6, 16, 0, 0),                   # naive = IST
+    MIDNIGHT_UTC.astimezone(timezone(timedelta(hours=-7))),
+])
+def test_every_input_form_reads_in_ist(value):
+    inst = clock.at(value)
+    assert fields(inst) == ("2025-06-16", "Monday", 25, "2025-06-16")
+    assert inst.ts == MIDNIGHT_UTC.timestamp() and inst.ms == int(MIDNIGHT_UTC.timestamp() * 1000)
+
+
+def test_memos_never_leak_across_days():
+    a, b = MIDNIGHT_UTC - timedelta(seconds=1), MIDNIGHT_UTC
+    for _ in range(3):                             # alternate so every call misses the memo
+        assert clock.at(a).date == "2025-06-15" and clock.at(a).time == "23:59:59"
+        assert clock.at(b).date == "2025-06-16" and clock.at(b).time == "00:00:00"
+    # same clock time, different day: the per-second memo is keyed by day too
+    assert clock.at(b + timedelta(days=1)).display == "17-06-2025 00:00:00"
+    assert clock.at(b).display == "16-06-2025 00:00:00"
+
+
+def test_arithmetic_crosses_midnight_and_iso_years():
+    inst = clock.at(datetime(2024, 12, 29, 23, 30))          # Sunday of ISO week 52
+    assert fields(inst) == ("2024-12-29", "Sunday", 52, "2024-12-23")
+    nxt = inst + timedelta(hours=1)
+    assert fields(nxt) == ("2024-12-30", "Monday", 1, "2024-12-30")
+    assert (nxt - timedelta(hours=1)).iso == inst.iso
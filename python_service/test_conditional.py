@@ -0,0 +1,90 @@
+"""
+test_conditional.py — RakshaNet
+Conditional GETs on /stats, /logs and /dashboard: a matching
+If-None-Match is a 304 until the user's next alert, and the daily views
+(/stats, /dashboard) also change tag at IST midnight.
+"""
+
+from datetime import datetime
+
+import pytest
+
+import clock
+import database
+
+USER  = "asha@rakshanet"
+PATHS = [f"/stats/{USER}", f"/logs/{USER}", f"/dashboard/{USER}"]
+
+
+@pytest.fixture
+def frozen(monkeypatch):
+    """Pin clock.now(); returns a setter taking an IST ISO timestamp."""
+    def set_now(stamp):
+        instant = clock.at(datetime.fromisoformat(stamp))
+        monkeypatch.setattr(clock, "now", lambda: instant)
+    set_now("2025-06-15T18:00:00")
+    return set_now
+
+
+def _get(client, path, etag=None):
+    return client.get(path, headers={"If-None-Match": etag} if etag else {})
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test_unchanged_poll_is_304(client, frozen, path):
+    database.insert_alert(USER, "SOS button triggered")
+    first = _get(client, path)
+    assert first.status_code == 200
+    etag, weak = first.get_etag()
+    assert weak and first.headers["Cache-Control"] == "private, no-cache"
+
+    again = _get(client, path, first.headers["ETag"])
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.get_etag() == (etag, True)
+    assert _get(client, path, '"stale"').status_code == 200
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test_new_alert_invalidates_the_etag(client, frozen, path):
+    database.insert_alert(USER, "SOS button triggered")
+    old = _get(client, path).headers["ETag"]
+    database.insert_alert("ravi@rakshanet", "Someone else's alert")
+    assert _get(client, path, old).status_code == 304
+
+    database.insert_alert(USER, "Safety timer expired")
+    fresh = _get(client, path, old)
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != old
+    assert _get(client, path, fresh.headers["ETag"]).status_code == 304
+
+
+def test_query_string_is_part_of_the_etag(client, frozen):
+    database.insert_alert(USER, "SOS button triggered")
+    etag = _get(client, f"/logs/{USER}?limit=1").headers["ETag"]
+    assert _get(client, f"/logs/{USER}?limit=2", etag).status_code == 200
+
+
+@pytest.mark.parametrize("path, daily", list(zip(PATHS, (True, False, True))))
+def test_ist_midnight_rolls_the_daily_views(client, frozen, path, daily):
+    frozen("2025-06-15T23:59:59")
+    database.insert_alert(USER, "SOS button triggered")
+    before = _get(client, path)
+
+    frozen("2025-06-16T00:00:01")
+    after = _get(client, path, before.headers["ETag"])
+    assert after.status_code == (200 if daily else 304)
+    if daily:
+        assert after.headers["ETag"] != before.headers["ETag"]
+        assert after.last_modified > before.last_modified
+
+
+def test_if_modified_since(client, frozen):
+    database.insert_alert(USER, "SOS button triggered")
+    first = _get(client, f"/stats/{USER}")
+    since = first.headers["Last-Modified"]
+    assert client.get(f"/stats/{USER}", headers={"If-Modified-Since": since}).status_code == 304
+
+    frozen("2025-06-15T18:00:05")
+    database.insert_alert(USER, "Safety timer expired")
+    assert client.get(f"/stats/{USER}", headers={"If-Modified-Since": since}).status_code == 200
@@ -0,0 +1,121 @@
+"""
+test_events.py — RakshaNet
+EventBus: a reconnecting stream replays what it missed after
+Last-Event-ID, a lagging client drops its oldest events, and closing a
+stream (Flask or ASGI) leaves no subscriber behind.
+"""
+
+import asyncio
+import threading
+
+from config import SSE_QUEUE_SIZE
+from events import EventBus, sse_format
+
+USER = "asha@rakshanet"
+
+
+def test_replay_after_last_event_id():
+    bus = EventBus(replay=3)
+    ids = [bus.publish(USER, "alert", {"n": n}) for n in range(5)]
+    bus.publish("ravi@rakshanet", "alert", {"n": 99})
+    assert ids == sorted(ids)
+
+    assert list(bus.subscribe(USER).events) == []
+    resumed = bus.subscribe(USER, last_event_id=ids[2])
+    assert [e[0] for e in resumed.events] == ids[3:]
+    too_old = bus.subscribe(USER, last_event_id=ids[0])        # only the last 3 are kept
+    assert [e[0] for e in too_old.events] == ids[2:]
+    assert list(bus.subscribe(USER, last_event_id=ids[-1]).events) == []
+
+
+def test_replay_keeps_the_most_recently_active_users():
+    bus = EventBus(replay_users=2)
+    first = {user: bus.publish(user, "alert", {}) for user in ("a", "b")}
+    bus.publish("a", "alert", {})                              # a is now more recent than b
+    bus.publish("c", "alert", {})
+    assert len(bus.subscribe("a", last_event_id=first["a"] - 1).events) == 2
+    assert len(bus.subscribe("b", last_event_id=0).events) == 0
+
+
+def test_a_lagging_subscriber_drops_its_oldest_events():
+    bus = EventBus()
+    sub = bus.subscribe(USER)
+    ids = [bus.publish(USER, "alert", {"n": n}) for n in range(SSE_QUEUE_SIZE + 3)]
+    assert sub.dropped == 3
+    assert [e[0] for e in sub.get(0)] == ids[3:]
+
+
+def test_unsubscribe_cleans_up():
+    bus = EventBus(max_clients=2)
+    a, b = bus.subscribe(USER), bus.subscribe(USER)
+    assert bus.subscribe("ravi@rakshanet") is None
+    assert bus.clients == 2 and bus.subscribers(USER) == 2
+
+    bus.unsubscribe(a)
+    bus.unsubscribe(a)                                         # twice is harmless
+    assert bus.clients == 1 and bus.subscribers(USER) == 1
+    bus.unsubscribe(b)
+    assert bus.clients == 0 and USER not in bus._subs and a.closed and b.closed
+    assert bus.subscribe("ravi@rakshanet") is not None
+
+    bus.publish(USER, "alert", {})
+    assert bus.stats == {"published": 1, "delivered": 0} and list(a.events) == []
+
+
+def test_async_subscriber_is_woken_from_another_thread():
+    bus = EventBus()
+
+    async def go():
+        sub = bus.subscribe(USER, loop=asyncio.get_running_loop())
+        threading.Thread(target=bus.publish, args=(USER, "timer", {"state": "armed"})).start()
+        batch = await sub.aget(5)
+        bus.unsubscribe(sub)
+        bus.publish(USER, "timer", {"state": "fired"})         # after close: not queued
+        await asyncio.sleep(0)
+        return batch, list(sub.events)
+
+    batch, left = asyncio.run(go())
+    assert [(e[1], e[2]) for e in batch] == [("timer", '{"state": "armed"}')]
+    assert left == []
+
+
+def test_flask_stream_replays_and_unsubscribes_on_close(client):
+    from app import bus
+    ids = [bus.publish(USER, "alert", {"n": n}) for n in range(3)]
+    resp = client.get(f"/stream/{USER}", headers={"Last-Event-ID": str(ids[0])}, buffered=False)
+    assert resp.mimetype == "text/event-stream"
+    chunks = iter(resp.response)
+    assert next(chunks).startswith(b"retry: 3000\nevent: snapshot\n")
+    assert next(chunks).decode() == "".join(sse_format(e) for e in bus._recent[USER] if e[0] > ids[0])
+    assert bus.subscribers(USER) == 1
+
+    resp.close()
+    assert bus.subscribers(USER) == 0
+
+
+def test_asgi_stream_replays_and_unsubscribes_on_disconnect(client):
+    import asgi
+    from app import bus
+    ids = [bus.publish(USER, "alert", {"n": n}) for n in range(3)]
+    bodies = []
+
+    async def go():
+        gone = asyncio.Event()
+
+        async def receive():
+            await gone.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body":
+                bodies.append(message["body"])
+                if len(bodies) == 2:
+                    gone.set()
+        scope = {"type": "http", "method": "GET", "path": f"/stream/{USER}", "query_string": b"",
+                 "headers": [(b"last-event-id", str(ids[1]).encode())]}
+        await asyncio.wait_for(asgi.app(scope, receive, send), 10)
+
+    asyncio.run(go())
+    assert bodies[0].startswith(b"retry: 3000\nevent: snapshot\n")
+    assert bodies[1].decode() == sse_format(bus._recent[USER][-1])
+    assert bus.subscribers(USER) == 0
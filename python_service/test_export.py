@@ -0,0 +1,94 @@
+"""
+test_export.py — RakshaNet
+/export/csv/<user> streams the header row, every alert once (newest
+first, CSV-escaped) across several keyset chunks, then the location
+trail, with ?from=&to= bounding both alerts and trail to whole IST days.
+"""
+
+import csv
+import functools
+import io
+from datetime import datetime
+
+import clock
+import database
+
+USER = "asha@rakshanet"
+
+
+def _at(stamp):
+    return clock.at(datetime.fromisoformat(stamp))
+
+
+def _export(client, query=""):
+    resp = client.get(f"/export/csv/{USER}{query}", buffered=False)
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/csv"
+    chunks = list(resp.response)
+    resp.close()
+    return chunks, list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+
+
+def _sections(rows):
+    """Split the CSV into [alert rows, trail rows, footer rows] at blank lines."""
+    sections, current = [], []
+    for row in rows:
+        if row:
+            current.append(row)
+        else:
+            sections.append(current)
+            current = []
+    return sections + [current]
+
+
+def test_multi_chunk_export_streams_every_row(client, monkeypatch):
+    monkeypatch.setattr(database, "iter_alerts", functools.partial(database.iter_alerts, chunk=3))
+    monkeypatch.setattr("app.CSV_FLUSH_ROWS", 4)
+    reasons = ["SOS button triggered", 'Said "help", twice', "Line one\nline two"] + \
+              [f"SOS {i}" for i in range(7)]
+    for reason in reasons:
+        database.insert_alert(USER, reason, 19.07, 72.87)
+    database.insert_alert(USER, "No location")
+    database.insert_alert("ravi@rakshanet", "Someone else's alert")
+
+    from app import CSV_HEADER
+    chunks, rows = _export(client)
+    alerts, footer = _sections(rows)
+    assert len(chunks) == 3             # rows 1-4, rows 5-8, rest + footer
+    assert alerts[0] == CSV_HEADER
+    body = alerts[1:]
+    assert [r[0] for r in body] == [str(n) for n in range(1, 12)]
+    assert [r[2] for r in body] == ["No location"] + reasons[::-1]
+    assert {r[1] for r in body} == {USER}
+    assert body[0][5:] == ["", "", ""]
+    assert body[1][7] == "https://maps.google.com/?q=19.07,72.87"
+    assert ["Total records", "11"] in footer
+
+
+def test_date_range_bounds_alerts_and_trail(client):
+    for stamp in ("2025-06-14T23:59:00", "2025-06-15T00:00:00", "2025-06-16T23:59:59",
+                  "2025-06-17T00:00:00"):
+        database.insert_alert(USER, f"SOS at {stamp}", 19.07, 72.87, at=_at(stamp))
+    database.append_locations(USER, [(_at(stamp).ms, 19.07, 72.87 + i / 1000) for i, stamp in enumerate(
+        ("2025-06-14T23:59:59", "2025-06-15T00:00:00", "2025-06-16T12:00:00", "2025-06-16T23:59:59",
+         "2025-06-17T00:00:00"))])
+
+    _, rows = _export(client, "?from=2025-06-15&to=2025-06-16")
+    alerts, trail, footer = _sections(rows)
+    assert [r[2] for r in alerts[1:]] == ["SOS at 2025-06-16T23:59:59", "SOS at 2025-06-15T00:00:00"]
+    assert trail[:2] == [["Location trail"], ["Date", "Time (IST)", "Latitude", "Longitude",
+                                              "Google Maps Link"]]
+    assert [(r[0], r[1]) for r in trail[2:]] == [("15 June 2025", "12:00:00 AM"),
+                                                 ("16 June 2025", "12:00:00 PM"),
+                                                 ("16 June 2025", "11:59:59 PM")]
+    assert ["Total records", "2"] in footer
+    assert ["Trail points", "3"] in footer
+
+    _, rows = _export(client)
+    assert ["Trail points", "5"] in _sections(rows)[-1]
+
+
+def test_bad_export_dates_are_400(client):
+    resp = client.get(f"/export/csv/{USER}?to=16-06-2025")
+    assert resp.status_code == 400
+    assert resp.get_json() == {"error": "Use YYYY-MM-DD format"}
@@ -0,0 +1,91 @@
+"""
+test_logs.py — RakshaNet
+/logs keyset paging: X-Next-Cursor walks every alert exactly once, newest
+first, ?before= is exclusive, ?fields= projects the rows and bad input is
+a 400.
+"""
+
+from datetime import datetime
+
+import pytest
+
+import clock
+import database
+
+USER = "asha@rakshanet"
+
+
+def _seed(n, day=None):
+    at = clock.at(datetime.fromisoformat(f"{day}T09:30:00")) if day else None
+    return [database.insert_alert(USER, f"SOS {i}", 19.07, 72.87, at=at) for i in range(n)]
+
+
+def _walk(client, url):
+    pages, cursor = [], None
+    while True:
+        resp = client.get(url + (f"&before={cursor}" if cursor else ""))
+        assert resp.status_code == 200
+        pages.append(resp.get_json())
+        cursor = resp.headers.get("X-Next-Cursor")
+        if cursor is None:
+            assert "Link" not in resp.headers
+            return pages
+        assert f"before={cursor}" in resp.headers["Link"]
+
+
+def test_next_cursor_walks_every_alert_once(client):
+    ids = _seed(7)
+    pages = _walk(client, f"/logs/{USER}?limit=3&fields=id,reason")
+    assert [len(p) for p in pages] == [3, 3, 1]
+    assert [r["id"] for p in pages for r in p] == sorted(ids, reverse=True)
+
+
+def test_exact_multiple_has_no_empty_last_page(client):
+    _seed(6)
+    pages = _walk(client, f"/logs/{USER}?limit=3&fields=id")
+    assert [len(p) for p in pages] == [3, 3]
+
+
+def test_before_is_exclusive(client):
+    ids = _seed(5)
+    cursor = client.get(f"/logs/{USER}?limit=2").headers["X-Next-Cursor"]
+    rows = client.get(f"/logs/{USER}?fields=id&before={cursor}").get_json()
+    assert [r["id"] for r in rows] == sorted(ids, reverse=True)[2:]
+
+    last = client.get(f"/logs/{USER}?limit=4").headers["X-Next-Cursor"]
+    assert [r["id"] for r in client.get(f"/logs/{USER}?fields=id&before={last}").get_json()] == [ids[0]]
+
+    from app import encode_cursor
+    assert client.get(f"/logs/{USER}?before={encode_cursor(ids[0])}").get_json() == []
+
+
+def test_paging_continues_into_the_archive(client):
+    old = _seed(3, "2020-01-06")
+    new = _seed(2)
+    assert database.roll_over("alerts", "2021-01-01") == 3
+
+    pages = _walk(client, f"/logs/{USER}?limit=2&fields=id&from=2020-01-01")
+    assert [r["id"] for p in pages for r in p] == sorted(old + new, reverse=True)
+    assert [r["id"] for r in client.get(f"/logs/{USER}?fields=id").get_json()] == new[::-1]
+
+
+def test_fields_projects_rows(client):
+    _seed(2)
+    rows = client.get(f"/logs/{USER}?fields=reason,%20time").get_json()
+    assert [set(r) for r in rows] == [{"reason", "time"}] * 2
+    assert set(client.get(f"/logs/{USER}").get_json()[0]) == set(database.DEFAULT_ALERT_FIELDS)
+
+
+@pytest.mark.parametrize("query, error", [
+    ("before=not-a-cursor", "Invalid cursor"),
+    ("before=aWQ6eA", "Invalid cursor"),           # "id:x"
+    ("before=eHk6MTA", "Invalid cursor"),          # "xy:10"
+    ("limit=ten", "limit must be an integer"),
+    ("fields=reason,password", "Unknown fields: password"),
+    ("fields=,", "Unknown fields: (none)"),
+    ("from=06-01-2020", "Use YYYY-MM-DD format"),
+])
+def test_bad_paging_arguments_are_400(client, query, error):
+    resp = client.get(f"/logs/{USER}?{query}")
+    assert resp.status_code == 400
+    assert resp.get_json()["error"].startswith(error)
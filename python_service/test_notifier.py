@@ -0,0 +1,119 @@
+"""
+test_notifier.py — RakshaNet
+NotificationQueue against FakeTransport: delivery, retry with backoff,
+final status in the deliveries table, and claims (each delivery is sent
+once even with several queues, i.e. worker processes, sweeping).
+"""
+
+import pytest
+
+import database
+import notifier
+from conftest import wait_for
+from notifier import FakeTransport, NotificationQueue
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    email, sms = FakeTransport("email"), FakeTransport("sms")
+    monkeypatch.setitem(notifier.transports, "email", email)
+    monkeypatch.setitem(notifier.transports, "sms", sms)
+    return email, sms
+
+
+def make_queue(**kw):
+    opts = dict(workers=2, backoff_base=0.01, sweep_every=0.05, claim_ttl=60)
+    opts.update(kw)
+    q = NotificationQueue(**opts)
+    q.start()
+    return q
+
+
+def statuses(alert_id):
+    return [(d["channel"], d["recipient"], d["status"], d["attempts"])
+            for d in database.get_deliveries(alert_id)]
+
+
+def settled(alert_id):
+    rows = database.get_deliveries(alert_id)
+    return rows and all(d["status"] in ("sent", "failed", "skipped") for d in rows)
+
+
+def test_alert_fans_out_and_records_status(db, fakes):
+    email, sms = fakes
+    q = make_queue()
+    try:
+        alert_id = database.record_event("u@t", "SOS", "sos")
+        ids = q.notify_alert(alert_id, "u@t", "help", ["+911", "+912"])
+        assert wait_for(lambda: settled(alert_id))
+    finally:
+        q.shutdown()
+    assert len(ids) == 3
+    assert sorted(statuses(alert_id)) == [("email", notifier.RECEIVER_EMAIL, "sent", 1),
+                                          ("sms", "+911", "sent", 1), ("sms", "+912", "sent", 1)]
+    assert email.sent == [(notifier.RECEIVER_EMAIL, "help")]
+    assert sorted(sms.sent) == [("+911", "help"), ("+912", "help")]
+
+
+def test_failed_send_is_retried_then_gives_up(db, fakes):
+    email, sms = fakes
+    sms.fail_times = 2
+    q = make_queue(workers=1, max_attempts=3)
+    try:
+        first = database.record_event("u@t", "SOS", "sos")
+        q.notify_alert(first, "u@t", "one", ["+911"])
+        assert wait_for(lambda: settled(first))
+        sms.fail_times = 10
+        second = database.record_event("u@t", "SOS", "sos")
+        q.notify_alert(second, "u@t", "two", ["+912"])
+        assert wait_for(lambda: settled(second))
+    finally:
+        q.shutdown()
+    assert ("sms", "+911", "sent", 3) in statuses(first)
+    failed = [d for d in database.get_deliveries(second) if d["channel"] == "sms"][0]
+    assert (failed["status"], failed["attempts"]) == ("failed", 3)
+    assert "fake transport failure" in failed["last_error"]
+
+
+def test_queued_rows_are_sent_once_across_workers(db, fakes):
+    email, sms = fakes
+    alert_id = database.record_event("u@t", "SOS", "sos")
+    phones = [f"+91{i:03d}" for i in range(40)]
+    database.create_deliveries(alert_id, "u@t", "left over", [("sms", p) for p in phones])
+    queues = [make_queue() for _ in range(3)]   # three processes starting up at once
+    try:
+        assert wait_for(lambda: settled(alert_id))
+    finally:
+        for q in queues:
+            q.shutdown()
+    assert sorted(p for p, _ in sms.sent) == phones
+
+
+def test_full_queue_defers_to_the_sweep(db, fakes):
+    email, sms = fakes
+    alert_id = database.record_event("u@t", "SOS", "sos")
+    idle = NotificationQueue(maxsize=1)          # not started: nothing drains it
+    ids = idle.notify_alert(alert_id, "u@t", "help", ["+911", "+912"])
+    assert idle.depth() == 1
+    rows = {d["id"]: d["status"] for d in database.get_deliveries(alert_id)}
+    assert [rows[i] for i in ids] == ["sending", "queued", "queued"]
+
+    q = make_queue()
+    try:
+        assert wait_for(lambda: len(sms.sent) == 2)
+    finally:
+        q.shutdown()
+    assert sorted(sms.sent) == [("+911", "help"), ("+912", "help")]
+    assert email.sent == []                      # still claimed by the idle queue
+
+
+def test_lapsed_claim_is_taken_over(db, fakes):
+    email, sms = fakes
+    alert_id = database.record_event("u@t", "SOS", "sos")
+    database.create_deliveries(alert_id, "u@t", "orphan", [("sms", "+911")], owner="dead-worker")
+    q = make_queue(claim_ttl=0.2)
+    try:
+        assert wait_for(lambda: settled(alert_id))
+    finally:
+        q.shutdown()
+    assert sms.sent == [("+911", "orphan")]
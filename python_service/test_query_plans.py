@@ -0,0 +1,27 @@
+"""
+test_query_plans.py — RakshaNet
+Every statement database.py and archive.py issue must be answered from an
+index: database.audit_query_plans() runs each query function against a
+scratch database and EXPLAINs what it executed.
+"""
+
+import database
+
+
+def test_every_query_uses_an_index():
+    results = database.audit_query_plans()
+    bad = [f"{sql}\n    " + "\n    ".join(plan) for sql, plan, ok in results if not ok]
+    assert not bad, "queries without an index (or never exercised):\n" + "\n".join(bad)
+
+
+def test_audit_reaches_the_later_tables():
+    audited = " ".join(sql for sql, _, _ in database.audit_query_plans())
+    for table in ("deliveries", "shard_moves", "moved_users", "maintenance_state",
+                  "cache_invalidations", "chunks"):
+        assert table in audited, f"no {table} query was audited"
+
+
+def test_unexercised_query_function_fails_the_audit(monkeypatch):
+    monkeypatch.setattr(database, "QUERY_FUNCTIONS", database.QUERY_FUNCTIONS | {"brand_new_query"})
+    failed = [sql for sql, _, ok in database.audit_query_plans() if not ok]
+    assert failed == ["brand_new_query() — not called by _exercise_queries()"]
@@ -0,0 +1,74 @@
+"""
+test_ratelimit.py — RakshaNet
+SosCoalescer: presses within the window join one alert, opening an alert
+doesn't hold up other users, and a failed open is retried by the next press.
+"""
+
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from ratelimit import SosCoalescer, TokenBuckets
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_presses_in_the_window_join_one_alert():
+    clock = FakeClock()
+    sos = SosCoalescer(window=30, max_span=300, clock=clock)
+    ids = iter(range(1, 10))
+    assert sos.submit("a", lambda: next(ids)) == (1, 1)
+    clock.now = 20
+    assert sos.submit("a", lambda: next(ids)) == (1, 2)
+    clock.now = 60   # 40 s after the last press: a new emergency
+    assert sos.submit("a", lambda: next(ids)) == (2, 1)
+    assert sos.stats()["opened"] == 2 and sos.stats()["coalesced"] == 1
+
+
+def test_a_slow_open_does_not_block_other_users():
+    sos = SosCoalescer(window=30)
+    release, started = threading.Event(), threading.Event()
+    slow = Future()
+
+    def open_slow():
+        started.set()
+        release.wait(5)
+        slow.set_result(7)
+        return slow
+
+    results = {}
+    t = threading.Thread(target=lambda: results.setdefault("a", sos.submit("a", open_slow)))
+    t.start()
+    assert started.wait(5)
+    assert sos.submit("b", lambda: 8) == (8, 1)   # returns while "a" is still opening
+
+    joined = threading.Thread(target=lambda: results.setdefault("a2", sos.submit("a", lambda: 9)))
+    joined.start()
+    release.set()
+    t.join(5), joined.join(5)
+    assert results == {"a": (7, 1), "a2": (7, 2)}
+
+
+def test_a_failed_open_fails_the_joiners_and_is_retried():
+    sos = SosCoalescer(window=30)
+    failed = Future()
+    failed.set_exception(RuntimeError("disk full"))
+    with pytest.raises(RuntimeError):
+        sos.submit("a", lambda: failed)
+    assert sos.submit("a", lambda: 3) == (3, 1)
+
+
+def test_token_bucket_refills_at_its_rate():
+    clock = FakeClock()
+    buckets = TokenBuckets(rate_per_min=6, burst=2, clock=clock)
+    assert buckets.take("a") == 0 and buckets.take("a") == 0
+    assert buckets.take("a") == pytest.approx(10)
+    clock.now = 10
+    assert buckets.take("a") == 0
@@ -0,0 +1,89 @@
+"""
+test_rebalance.py — RakshaNet
+move_users copies a batch from a read snapshot, so its shard keeps taking
+writes; whatever lands meanwhile must still reach the new shard.
+"""
+
+import time
+
+import database
+import shards
+
+
+def test_writes_during_the_copy_are_moved_too(db, monkeypatch):
+    user = next(u for u in (f"u{i}@rakshanet" for i in range(100)) if shards.owner(u, 2) == 1)
+    database.insert_alert(user, "SOS button triggered", 19.07, 72.87)
+    database.add_contact(user, "+910000000001")
+    database.arm_timer(user, time.time() + 3600, 60)
+
+    copy, calls = database._copy_users, []
+    def copy_then_write(src, dst, users):
+        copied = copy(src, dst, users)
+        calls.append(list(users))
+        if len(calls) == 1:   # the snapshot copy: `source` isn't locked yet
+            database.insert_alert(user, "Safety timer expired", 19.08, 72.88)
+            database.delete_contact(user, "+910000000001")
+            database.add_contact(user, "+910000000002")
+            database.cancel_timer(user)
+        return copied
+    monkeypatch.setattr(database, "_copy_users", copy_then_write)
+
+    assert database.rebalance(2, grace=0) == {(0, 1): 1}
+    assert calls == [[user], [user]]   # copied again under the lock
+
+    assert database.shard_for(user) == 1
+    assert database.get_contacts(user) == ["+910000000002"]
+    assert database.get_timer(user) is None
+    assert database.get_user_stats(user)["total_alerts"] == 2
+    assert len(database.fetch_alerts_page(user)[0]) == 2
+    assert len(database.nearby_alerts(19.07, 72.87, 5)) == 2
+    for shard in (0, 1):
+        with database.connection(shard) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM moving_users").fetchone()[0] == 0
+
+
+def test_untouched_users_are_copied_once(db, monkeypatch):
+    users = [f"u{i}@rakshanet" for i in range(20)]
+    for i, user in enumerate(users):
+        database.insert_alert(user, "SOS button triggered", 19.07, 72.87)
+        database.append_locations(user, [(1_700_000_000_000 + i, 19.0, 72.0)])
+    copy, calls = database._copy_users, []
+    monkeypatch.setattr(database, "_copy_users",
+                        lambda src, dst, batch: calls.append(list(batch)) or copy(src, dst, batch))
+
+    moved = database.rebalance(2, grace=0)
+    assert sum(len(batch) for batch in calls) == sum(moved.values())   # no second copy
+    assert all(database.get_user_stats(u)["total_alerts"] == 1 for u in users)
+
+
+def test_trail_rows_keep_their_owner_when_ids_clash(db):
+    # location_trail ids are per shard: both shards hand out 1, 2, ... so merging them clashes
+    users = [f"u{i}@rakshanet" for i in range(20)]
+    database.rebalance(2, grace=0)
+    for i, user in enumerate(users):
+        database.append_locations(user, [(1_700_000_000_000 + i, 19.0, 72.0)])
+    database.rebalance(1, grace=0)
+    for i, user in enumerate(users):
+        assert [p[0] for p in database.fetch_trail(user)] == [1_700_000_000_000 + i], user
+
+
+def _mark_triggers():
+    counts = []
+    for shard in database.all_shards():
+        with database.connection(shard) as conn:
+            counts.append(conn.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'mark_%'").fetchone()[0])
+    return counts
+
+
+def test_write_marks_only_exist_during_a_rebalance(db, monkeypatch):
+    assert _mark_triggers() == [0]
+    user = next(u for u in (f"u{i}@rakshanet" for i in range(100)) if shards.owner(u, 2) == 1)
+    database.insert_alert(user, "SOS button triggered")
+    during = []
+    move = database.move_users
+    monkeypatch.setattr(database, "move_users",
+                        lambda *args: during.append(_mark_triggers()) or move(*args))
+    database.rebalance(2, grace=0)
+    assert during and all(c == len(database.USER_TABLES) * 3 for counts in during for c in counts)
+    assert _mark_triggers() == [0, 0]
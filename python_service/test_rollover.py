@@ -0,0 +1,60 @@
+"""
+test_rollover.py — RakshaNet
+Rollover moves old alerts to the archive but per-user totals stay
+cumulative: rebuild-stats must add the archived rows back, and day / week
+counts below the archive horizon are pruned.
+"""
+
+from datetime import datetime
+
+import clock
+import database
+import maintenance
+
+
+def _old(day):
+    return clock.at(datetime.fromisoformat(f"{day}T09:30:00"))
+
+
+def test_rebuild_after_rollover_keeps_archived_totals(db):
+    database.insert_alert("asha@rakshanet", "SOS button triggered", at=_old("2020-01-06"))
+    database.insert_alert("asha@rakshanet", "SOS button triggered", at=_old("2020-02-03"))
+    database.insert_alert("ravi@rakshanet", "Safety timer expired", at=_old("2020-03-02"))
+    database.insert_alert("asha@rakshanet", "SOS button triggered")
+    before = {u: database.get_user_stats(u) for u in ("asha@rakshanet", "ravi@rakshanet")}
+
+    assert database.roll_over("alerts", "2021-01-01") == 3
+    assert database.rebuild_user_stats() == 2
+
+    for user, stats in before.items():
+        after = database.get_user_stats(user)
+        for key in ("total_alerts", "first_alert", "last_alert", "alerts_today"):
+            assert after[key] == stats[key], (user, key)
+    assert before["asha@rakshanet"]["total_alerts"] == 3
+    assert before["asha@rakshanet"]["first_alert"].startswith("2020-01-06")
+
+
+def test_rollover_prunes_old_day_and_week_counts(db):
+    database.insert_alert("asha@rakshanet", "SOS button triggered", at=_old("2020-01-06"))
+    database.insert_alert("asha@rakshanet", "SOS button triggered")
+    database.roll_over("alerts", "2021-01-01")
+
+    with database.connection() as conn:
+        days  = [r[0] for r in conn.execute("SELECT day FROM user_daily_counts")]
+        weeks = [r[0] for r in conn.execute("SELECT week_start FROM user_weekly_counts")]
+    today = clock.now()
+    assert days == [today.date]
+    assert weeks == [today.week_start]
+    assert database.get_user_stats("asha@rakshanet")["total_alerts"] == 2
+
+
+def test_rollover_is_opt_in(db, monkeypatch):
+    database.insert_alert("asha@rakshanet", "SOS button triggered", at=_old("2020-01-06"))
+    database.insert_alert("asha@rakshanet", "SOS button triggered")
+
+    assert maintenance.Maintenance().rollover() == {}
+    assert len(database.fetch_alerts_for_user("asha@rakshanet")) == 2
+    assert database.archive_horizon("alerts") is None
+
+    monkeypatch.setitem(maintenance.RETENTION, "alerts", 365)
+    assert maintenance.Maintenance().rollover() == {"alerts": 1}
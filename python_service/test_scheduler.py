@@ -0,0 +1,180 @@
+"""
+test_scheduler.py — RakshaNet
+TimerScheduler on an injected clock: deadlines fire in order, a cancelled
+or re-armed timer never fires its old deadline, and the heap is compacted
+once cancelled entries dominate. DurableTimers on an injected wall clock:
+one leader at a time, lease takeover when it lapses, and deadlines armed
+before a restart fire exactly once.
+"""
+
+import threading
+
+import pytest
+
+import database
+from conftest import wait_for
+from scheduler import DurableTimers, TimerScheduler
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _advance(sched, clock, seconds):
+    """Move the fake clock and wake the dispatcher so it re-reads it."""
+    clock.now += seconds
+    with sched._cond:
+        sched._cond.notify_all()
+
+
+@pytest.fixture
+def timers():
+    clock = FakeClock()
+    sched = TimerScheduler(clock=clock, workers=1)   # one worker: callbacks run in fire order
+    fired = []
+    done  = threading.Event()
+    yield sched, clock, fired, done
+    sched.shutdown()
+
+
+def test_deadlines_fire_in_order_on_the_injected_clock(timers):
+    sched, clock, fired, done = timers
+    sched.start("late", 20, fired.append, "late")
+    sched.start("soon", 5, fired.append, "soon")
+    assert [t["key"] for t in sched.pending()] == ["soon", "late"]
+    assert sched.get("late")["remaining"] == 20
+
+    _advance(sched, clock, 6)
+    assert wait_for(lambda: fired == ["soon"])
+    assert "soon" not in sched and "late" in sched
+
+    _advance(sched, clock, 15)
+    assert wait_for(lambda: fired == ["soon", "late"])
+    assert len(sched) == 0
+
+
+def test_cancelled_and_rearmed_timers_skip_their_old_deadline(timers):
+    sched, clock, fired, done = timers
+    sched.start("cancelled", 5, fired.append, "cancelled")
+    sched.start("rearmed", 5, fired.append, "rearmed-old")
+    sched.start("rearmed", 30, fired.append, "rearmed-new")
+    sched.start("moved", 5, fired.append, "moved")
+    assert sched.cancel("cancelled") is True
+    assert sched.cancel("cancelled") is False
+    assert sched.reschedule("moved", 40) is True
+    assert sched.reschedule("missing", 40) is False
+    sched.start("sentinel", 10, done.set)
+
+    _advance(sched, clock, 10)
+    assert done.wait(5)
+    assert fired == []
+    assert sched.get("rearmed")["armed_for"] == 30
+    assert sched.get("moved")["remaining"] == 30
+
+    _advance(sched, clock, 30)
+    assert wait_for(lambda: fired == ["rearmed-new", "moved"])
+
+
+def test_heap_is_compacted_once_cancelled_entries_dominate(timers):
+    sched, clock, fired, done = timers
+    for i in range(100):
+        sched.start(i, 1000 + i, fired.append, i)
+    for i in range(50):
+        sched.cancel(i)
+    assert len(sched) == 50 and len(sched._heap) == 100        # 100 is not > 2 × 50 yet
+
+    sched.cancel(50)
+    assert len(sched) == 49 and len(sched._heap) == 49         # compacted
+    for i in range(51, 90):
+        sched.cancel(i)
+    assert len(sched) == 10 and len(sched._heap) == 49         # ≤ 64 entries: left alone
+    assert [t["key"] for t in sched.pending()] == list(range(90, 100))
+
+
+#  DurableTimers
+
+@pytest.fixture
+def durable(db):
+    """make() builds a DurableTimers worker; every worker shares one fake wall clock."""
+    clock, made, fired = FakeClock(), [], []
+
+    def make():
+        d = DurableTimers(fired.append, lease_ttl=30, clock=clock)
+        made.append(d)
+        return d
+    yield make, clock, fired
+    for d in made:
+        d.scheduler.shutdown(wait=False)
+
+
+def test_arm_and_cancel_persist_the_deadline(durable):
+    make, clock, fired = durable
+    d = make()
+    assert d.arm("asha@rakshanet", 2) == 1120
+    assert database.get_timer("asha@rakshanet")["fires_at"] == 1120
+    assert "asha@rakshanet" in d.scheduler
+
+    assert d.cancel("asha@rakshanet") is True
+    assert database.get_timer("asha@rakshanet") is None
+    assert "asha@rakshanet" not in d.scheduler
+    clock.now += 600
+    assert d.poll() == 0 and fired == []
+
+
+def test_deadlines_armed_before_a_restart_fire_once(durable):
+    make, clock, fired = durable
+    before = make()
+    assert before.poll() == 0                      # leader until 1030
+    before.arm("asha@rakshanet", 1)                # fires at 1060
+    before.arm("ravi@rakshanet", 5)                # fires at 1300
+    before.scheduler.shutdown(wait=False)          # the worker dies; only the rows survive
+
+    clock.now += 15
+    after = make()
+    assert after.poll() is None                    # the dead worker's lease has not lapsed
+    clock.now += 55
+    assert after.poll() == 1
+    assert wait_for(lambda: fired == ["asha@rakshanet"])
+    assert after.poll() == 0
+
+    clock.now += 240
+    assert after.poll() == 1
+    assert wait_for(lambda: fired == ["asha@rakshanet", "ravi@rakshanet"])
+    assert database.list_timers() == []
+
+
+def test_lease_moves_to_another_worker_when_it_lapses(durable):
+    make, clock, fired = durable
+    a, b = make(), make()
+    assert a.poll() == 0
+    assert b.poll() is None
+    a.arm("asha@rakshanet", 1)
+
+    clock.now += 25
+    assert a.poll() == 0                           # renewing keeps the lease
+    clock.now += 25
+    assert b.poll() is None
+
+    clock.now += 31                                # a stops renewing
+    assert b.poll() == 1
+    assert a.poll() is None
+    assert wait_for(lambda: fired == ["asha@rakshanet"])
+
+
+def test_local_fire_and_sweep_claim_each_deadline_once(durable):
+    make, clock, fired = durable
+    d = make()
+    old = d.arm("asha@rakshanet", 1)
+    new = d.arm("asha@rakshanet", 3)               # re-armed: the old deadline is gone
+
+    d._expire("asha@rakshanet", old)
+    assert fired == []
+    clock.now += 180
+    assert d.poll() == 1
+    d._expire("asha@rakshanet", new)               # local wake-up after the sweep claimed it
+    assert wait_for(lambda: fired == ["asha@rakshanet"])
+    assert fired == ["asha@rakshanet"]
@@ -0,0 +1,79 @@
+"""
+test_sms.py — RakshaNet
+SmsTransport against a local HTTP stub of the Twilio Messages API
+(TWILIO_API_BASE): concurrent sends over kept-alive connections, and a
+rejected number failing on its own.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+import notifier
+from notifier import SmsTransport
+
+
+class TwilioStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like api.twilio.com
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+        to   = form["To"][0]
+        with self.server.lock:
+            self.server.requests.append((self.path, to, form["Body"][0]))
+            self.server.peers.add(self.client_address)
+            sid = f"SM{len(self.server.requests):032d}"
+        if to.endswith("000"):
+            status, body = 400, {"code": 21211, "message": f"Invalid 'To' Phone Number: {to}",
+                                 "status": 400}
+        else:
+            status, body = 201, {"sid": sid, "to": to, "status": "queued"}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def twilio(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TwilioStub)
+    server.requests, server.peers, server.lock = [], set(), threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(notifier, "TWILIO_API_BASE", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(notifier, "TWILIO_ACCOUNT_SID", "ACtest")
+    monkeypatch.setattr(notifier, "SMS_RATE_PER_SEC", 1000)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_send_returns_sid(twilio):
+    sms = SmsTransport()
+    assert sms.send("+911", "help") == "SM" + "1".zfill(32)
+    path, to, body = twilio.requests[0]
+    assert path == "/2010-04-01/Accounts/ACtest/Messages.json"
+    assert (to, body) == ("+911", "help")
+
+
+def test_send_many_is_concurrent_and_reuses_connections(twilio):
+    sms = SmsTransport()
+    numbers = [f"+91{i:03d}" for i in range(1, 41)]
+    assert sms.send_many([(n, "help") for n in numbers]) == [None] * len(numbers)
+    assert sorted(to for _, to, _ in twilio.requests) == numbers
+    assert len(twilio.peers) <= notifier.SMS_MAX_PARALLEL   # pooled keep-alive sockets
+
+
+def test_rejected_number_fails_alone(twilio):
+    sms = SmsTransport()
+    errors = sms.send_many([("+911", "help"), ("+91000", "help"), ("+912", "help")])
+    assert errors[0] is None and errors[2] is None
+    assert "Invalid 'To' Phone Number" in str(errors[1])
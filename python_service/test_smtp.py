@@ -0,0 +1,100 @@
+"""
+test_smtp.py — RakshaNet
+SmtpSessionPool against a local aiosmtpd server: one handshake serves
+many messages, and a dropped session is reconnected without losing mail.
+"""
+
+import socket
+
+import pytest
+
+import notifier
+from notifier import EmailTransport, SmtpSessionPool
+
+controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos[0], envelope.content.decode()))
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtpd(monkeypatch):
+    port  = free_port()
+    inbox = Inbox()
+    monkeypatch.setattr(notifier, "SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setattr(notifier, "SMTP_PORT", port)
+    monkeypatch.setattr(notifier, "SMTP_USE_TLS", False)
+    monkeypatch.setattr(notifier, "SENDER_PASSWORD", "")
+
+    class Server:
+        def start(self):
+            self.ctl = controller.Controller(inbox, hostname="127.0.0.1", port=port)
+            self.ctl.start()
+
+        def restart(self):   # drops every open session
+            self.ctl.stop()
+            self.start()
+
+    server = Server()
+    server.inbox = inbox
+    server.start()
+    yield server
+    server.ctl.stop()
+
+
+def test_session_is_reused_across_batches(smtpd):
+    pool = SmtpSessionPool(size=1)
+    email = EmailTransport()
+    email.pool = pool
+    try:
+        assert email.send_many([("a@t", "one"), ("b@t", "two")]) == [None, None]
+        email.send("c@t", "three")
+    finally:
+        pool.close()
+    stats = pool.stats()
+    assert stats["handshakes"] == 1
+    assert (stats["messages_sent"], stats["batches"], stats["failures"]) == (3, 2, 0)
+    assert [rcpt for rcpt, _ in smtpd.inbox.messages] == ["a@t", "b@t", "c@t"]
+
+
+def test_dropped_session_reconnects_and_resumes(smtpd):
+    pool = SmtpSessionPool(size=1, keepalive=3600)   # reuse the dead session without a NOOP
+    email = EmailTransport()
+    email.pool = pool
+    try:
+        email.send("a@t", "before")
+        smtpd.restart()
+        assert email.send_many([("b@t", "after 1"), ("c@t", "after 2")]) == [None, None]
+    finally:
+        pool.close()
+    stats = pool.stats()
+    assert (stats["handshakes"], stats["reconnects"], stats["failures"]) == (2, 1, 0)
+    assert [rcpt for rcpt, _ in smtpd.inbox.messages] == ["a@t", "b@t", "c@t"]
+
+
+def test_stale_idle_session_is_probed_with_noop(smtpd):
+    pool = SmtpSessionPool(size=1, keepalive=0)      # probe before every reuse
+    email = EmailTransport()
+    email.pool = pool
+    try:
+        email.send("a@t", "one")
+        smtpd.restart()
+        email.send("b@t", "two")
+    finally:
+        pool.close()
+    stats = pool.stats()
+    assert stats["noops"] == 1
+    assert (stats["handshakes"], stats["reconnects"]) == (2, 0)   # replaced before sending
+    assert len(smtpd.inbox.messages) == 2
@@ -0,0 +1,45 @@
+"""
+test_spatial.py — RakshaNet
+nearby_alerts() refines R*Tree candidates by great-circle distance, in
+SQLite when it has math functions and in Python otherwise; both must agree
+with geo.haversine_km, including across the antimeridian.
+"""
+
+import random
+
+import pytest
+
+import database
+import geo
+
+
+@pytest.fixture(params=[True, False], ids=["sql", "python"])
+def distance_in(request, monkeypatch):
+    if request.param and not database._has_sql_math():
+        pytest.skip("this SQLite build has no math functions")
+    monkeypatch.setattr(database, "_sql_math", request.param)
+    return request.param
+
+
+def test_nearby_matches_haversine(db, distance_in):
+    rng = random.Random(3)
+    points = [(19.07 + rng.uniform(-0.1, 0.1), 72.87 + rng.uniform(-0.1, 0.1)) for _ in range(200)]
+    for i, (lat, lng) in enumerate(points):
+        database.insert_alert(f"u{i % 7}@rakshanet", "SOS button triggered", lat, lng)
+
+    hits = database.nearby_alerts(19.07, 72.87, 5, limit=1000)
+    expected = sorted(d for d in geo.haversine_km(19.07, 72.87, points) if d <= 5)
+    assert [h["distance_km"] for h in hits] == [round(d, 3) for d in expected]
+    assert 0 < len(hits) < len(points)
+
+    top = database.nearby_alerts(19.07, 72.87, 5, limit=10)
+    assert top == hits[:10]
+
+
+def test_nearby_across_the_antimeridian(db, distance_in):
+    database.insert_alert("east@rakshanet", "SOS button triggered", 0.0, 179.99)
+    database.insert_alert("west@rakshanet", "SOS button triggered", 0.0, -179.99)
+    database.insert_alert("far@rakshanet", "SOS button triggered", 0.0, 179.0)
+    hits = database.nearby_alerts(0.0, 180.0, 5)
+    assert sorted(h["user"] for h in hits) == ["east@rakshanet", "west@rakshanet"]
+    assert all(h["distance_km"] == pytest.approx(1.112, abs=1e-3) for h in hits)
@@ -0,0 +1,90 @@
+"""
+test_validation.py — RakshaNet
+describe() body schemas: bad fields are a 400 naming the field, numbers
+must be finite and within their range, and accepted numbers reach the
+handler as int / float.
+"""
+
+import pytest
+
+import database
+from apidocs import body_errors, coerce_body
+from config import TIMER_MAX_MINUTES
+
+SOS = {"userId": ("string", True, "a@b"),
+       "lat":    ("number", False, 19.0, (-90, 90)),
+       "lng":    ("number", False, 72.0, (-180, 180))}
+
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-inf", "1e999", "NaN", float("nan"), float("inf")])
+def test_non_finite_numbers_are_rejected(value):
+    assert body_errors(SOS, {"userId": "a@b", "lat": value}) == ["'lat' must be a number"]
+
+
+@pytest.mark.parametrize("field, value", [("lat", 90.5), ("lat", "-91"), ("lng", 180.01), ("lng", -181)])
+def test_coordinates_outside_the_globe_are_rejected(field, value):
+    assert body_errors(SOS, {"userId": "a@b", field: value}) == [f"'{field}' must be between "
+                                                                f"{SOS[field][3][0]} and {SOS[field][3][1]}"]
+
+
+@pytest.mark.parametrize("value", ["+-5", "--5", "5.5", "", "1_0", True])
+def test_integer_fields_reject_non_integers(value):
+    schema = {"n": ("integer", True, 1)}
+    assert body_errors(schema, {"n": value}) in (["'n' must be an integer"], ["'n' is required"])
+
+
+def test_numeric_strings_are_converted():
+    data = {"userId": "a@b", "lat": " 19.5 ", "lng": -72}
+    assert body_errors(SOS, data) == []
+    coerce_body(SOS, data)
+    assert data == {"userId": "a@b", "lat": 19.5, "lng": -72.0}
+    assert all(type(data[k]) is float for k in ("lat", "lng"))
+
+
+def test_sos_rejects_nan_coordinates(client):
+    r = client.post("/sos", json={"userId": "a@b", "lat": "nan", "lng": "inf"})
+    assert r.status_code == 400
+    assert "'lat' must be a number" in r.get_json()["error"]
+    assert database.fetch_alerts_page("a@b")[0] == []
+
+
+def test_sos_rejects_out_of_range_coordinates(client):
+    r = client.post("/sos", json={"userId": "a@b", "lat": 91, "lng": 72.8})
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "'lat' must be between -90 and 90"
+
+
+def test_sos_stores_string_coordinates_as_numbers(client):
+    r = client.post("/sos", json={"userId": "a@b", "lat": "19.07", "lng": "72.87"})
+    assert r.status_code == 200
+    assert r.get_json()["location"] == "https://maps.google.com/?q=19.07,72.87"
+    row = database.fetch_alerts_page("a@b", fields=["latitude", "longitude"])[0][0]
+    assert (row["latitude"], row["longitude"]) == (19.07, 72.87)
+
+
+@pytest.mark.parametrize("minutes", [0, -1, TIMER_MAX_MINUTES + 1, 10 ** 9])
+def test_timer_minutes_must_be_in_range(client, minutes):
+    r = client.post("/start-timer", json={"userId": "a@b", "minutes": minutes})
+    assert r.status_code == 400
+    assert r.get_json()["error"] == f"'minutes' must be between 1 and {TIMER_MAX_MINUTES}"
+    assert database.get_timer("a@b") is None
+
+
+def test_timer_accepts_the_longest_allowed(client):
+    r = client.post("/start-timer", json={"userId": "a@b", "minutes": str(TIMER_MAX_MINUTES)})
+    assert r.status_code == 200
+    assert database.get_timer("a@b")["minutes"] == TIMER_MAX_MINUTES
+
+
+@pytest.mark.parametrize("point", [{"lat": "nan", "lng": 72.0}, {"lat": 19.0, "lng": "inf"},
+                                   {"lat": 95, "lng": 72.0}, {"lat": 19.0, "lng": -200}])
+def test_location_ingest_rejects_bad_points(client, point):
+    r = client.post("/location/a@b", json={"points": [point]})
+    assert r.status_code == 400
+    assert database.last_position("a@b") is None
+
+
+def test_openapi_documents_the_ranges(client):
+    body = client.get("/openapi.json").get_json()["paths"]["/sos"]["post"]["requestBody"]
+    lat = body["content"]["application/json"]["schema"]["properties"]["lat"]
+    assert (lat["minimum"], lat["maximum"]) == (-90, 90)
@@ -0,0 +1,101 @@
+"""
+test_writer.py — RakshaNet
+GroupCommitWriter: writes queued while a batch commits share the next
+commit, one failing write fails only its own Future, a failed commit
+fails the whole batch, and flush() waits for everything queued.
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+import database
+from database import GroupCommitWriter, _set_state_tx
+
+
+class Gate:
+    """A write that holds its batch open until released."""
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, conn):
+        self.entered.set()
+        assert self.release.wait(5)
+        return "gate"
+
+
+def _blocked(writer):
+    gate = Gate()
+    first = writer.submit(gate)
+    assert gate.entered.wait(5)
+    return gate, first
+
+
+def test_writes_queued_behind_a_commit_share_one_batch(db):
+    w = GroupCommitWriter(batch_size=4)
+    gate, first = _blocked(w)
+    futures = [w.submit(_set_state_tx, f"k{i}", i) for i in range(10)]
+    gate.release.set()
+
+    assert first.result(5) == "gate"
+    assert [f.result(5) for f in futures] == [None] * 10
+    assert w.stats == {"writes": 11, "batches": 4}      # gate, then 4 + 4 + 2
+    assert [database.get_state(f"k{i}") for i in range(10)] == [str(i) for i in range(10)]
+
+
+def test_a_failing_write_only_fails_its_own_future(db):
+    def half_then_fail(conn):
+        _set_state_tx(conn, "half", 1)
+        raise ValueError("bad write")
+
+    w = GroupCommitWriter()
+    gate, _ = _blocked(w)
+    before = w.submit(_set_state_tx, "before", 1)
+    bad    = w.submit(half_then_fail)
+    after  = w.submit(_set_state_tx, "after", 1)
+    gate.release.set()
+
+    with pytest.raises(ValueError, match="bad write"):
+        bad.result(5)
+    assert before.result(5) is None and after.result(5) is None
+    assert w.stats["batches"] == 2
+    assert database.get_state("before") == database.get_state("after") == "1"
+    assert database.get_state("half") is None            # rolled back to its savepoint
+
+
+def test_a_failed_commit_fails_the_whole_batch(db, monkeypatch):
+    @contextmanager
+    def locked(shard=0):
+        raise sqlite3.OperationalError("database is locked")
+        yield
+
+    monkeypatch.setattr(database, "connection", locked)
+    w = GroupCommitWriter()
+    futures = [w.submit(_set_state_tx, f"k{i}", i) for i in range(3)]
+    w.flush(5)
+
+    for f in futures:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            f.result(0)
+    assert w.stats == {"writes": 0, "batches": 0}
+
+
+def test_flush_drains_everything_queued(db):
+    w = GroupCommitWriter(batch_size=8)
+    gate, _ = _blocked(w)
+    futures = [w.submit(_set_state_tx, f"k{i}", i) for i in range(50)]
+
+    w.flush(timeout=0.05)                                 # times out: still blocked
+    assert not any(f.done() for f in futures)
+
+    flushed = threading.Thread(target=w.flush)
+    flushed.start()
+    gate.release.set()
+    flushed.join(5)
+    assert not flushed.is_alive()
+    assert all(f.done() and f.exception() is None for f in futures)
+    assert database.get_state("k49") == "49"
@@ -0,0 +1,69 @@
+"""
+trail.py — RakshaNet
+Compact encoding for live-location trails.
+
+Points are (ts_ms, lat_e6, lng_e6) integers: epoch milliseconds and
+micro-degrees (~0.1 m). A time bucket stores its points as one blob of
+zigzag varints, each point delta-encoded against the previous one, so a
+walking user costs ~4–6 bytes per point instead of a ~60-byte row.
+
+Because every delta only needs the previous point, new points can be
+appended to a stored blob (SQL `points || ?`) without decoding it.
+"""
+
+from config import TRAIL_BUCKET_SECONDS
+
+SCALE = 1_000_000   # degrees → micro-degrees
+
+
+def bucket_of(ts_ms):
+    return ts_ms // (TRAIL_BUCKET_SECONDS * 1000)
+
+
+def to_point(ts_ms, lat, lng):
+    return int(ts_ms), round(lat * SCALE), round(lng * SCALE)
+
+
+def from_point(point):
+    ts_ms, lat, lng = point
+    return ts_ms, lat / SCALE, lng / SCALE
+
+
+def _put_varint(out, n):
+    n = (n << 1) ^ (n >> 63)            # zigzag: small negatives stay small
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def encode(points, prev=(0, 0, 0)):
+    """
+    Delta-encode points (already in append order) after `prev`, the last
+    point already stored in the bucket (or (bucket_start_ms, 0, 0) for a
+    new bucket). Returns the bytes to append.
+    """
+    out = bytearray()
+    pt, plat, plng = prev
+    for ts, lat, lng in points:
+        _put_varint(out, ts - pt)
+        _put_varint(out, lat - plat)
+        _put_varint(out, lng - plng)
+        pt, plat, plng = ts, lat, lng
+    return bytes(out)
+
+
+def decode(blob, start=(0, 0, 0)):
+    """Inverse of encode(): yields (ts_ms, lat_e6, lng_e6) integers."""
+    values, n, shift = [], 0, 0
+    for byte in blob:
+        n |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append((n >> 1) ^ -(n & 1))
+        n, shift = 0, 0
+    pt, plat, plng = start
+    for i in range(0, len(values) - 2, 3):
+        pt, plat, plng = pt + values[i], plat + values[i + 1], plng + values[i + 2]
+        yield pt, plat, plng